@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+EventBus.emit性能测试：模拟大量run_daily生成的Scheduler_*事件类，对比旧版遍历isinstance和当前缓存分发的耗时
+
+Usage:
+    python benchmarks/bench_bus.py
+    python benchmarks/bench_bus.py --classes 500 --emits 100000
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from jqtrade.scheduler.bus import EventBus                    # noqa: E402
+from jqtrade.scheduler.event import create_event_class          # noqa: E402
+
+
+class LegacyEventBus(EventBus):
+    """ 旧版emit：每次遍历全部事件类并排序优先级 """
+
+    def emit(self, event):
+        ret = []
+        for _event_cls in self._subscribes:
+            if not isinstance(event, _event_cls):
+                continue
+            _event_subscribes = self._subscribes.get(_event_cls, {})
+            for _priority in sorted(_event_subscribes, reverse=True):
+                for _callback in _event_subscribes[_priority]:
+                    logger.debug(f"emit event: {event}, callback: {_callback.__name__}")
+                    ret.append(_callback(event))
+        return ret
+
+
+logger = logging.getLogger("bench_bus")
+
+
+def _callback(event):
+    pass
+
+
+def _run(bus_cls, event_classes, emits):
+    bus = bus_cls()
+    for _cls in event_classes:
+        bus.register(_cls, _callback)
+    events = [_cls() for _cls in event_classes]
+
+    t0 = time.perf_counter()
+    for _i in range(emits):
+        bus.emit(events[_i % len(events)])
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--classes", type=int, default=300, help="事件类数量")
+    parser.add_argument("--emits", type=int, default=100000, help="emit次数")
+    options = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    event_classes = [create_event_class(f"Scheduler_bench_{_i}") for _i in range(options.classes)]
+
+    for _name, _cls in (("legacy", LegacyEventBus), ("cached", EventBus)):
+        cost = _run(_cls, event_classes, options.emits)
+        print(f"{_name:>8}: {cost:.3f}s ({options.emits / cost:,.0f} emits/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+EventSource性能测试：对比旧版（按天生成事件列表 + list.pop(0)）与当前的堆实现
+
+Usage:
+    python benchmarks/bench_event_source.py
+    python benchmarks/bench_event_source.py --interval 1 --days 1
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import datetime
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from jqtrade.scheduler.config import get_config   # noqa: E402
+from jqtrade.scheduler.event import Event           # noqa: E402
+from jqtrade.scheduler.event_source import EventSource   # noqa: E402
+
+
+config = get_config()
+
+
+class LegacyEventSource(object):
+    """ 旧版EventSource的核心逻辑：一次生成EVENT_DAYS_COUNT天的日期列表，每天生成并排序当天全部事件，pop(0)取事件 """
+
+    def __init__(self, start, end=None, count=config.EVENT_DAYS_COUNT):
+        self._daily = []
+        self._events = []
+        self._start = start
+        self._end = end
+        self._days = [start.date() + datetime.timedelta(days=_delta) for _delta in range(count)]
+
+    def daily(self, event_cls, time_expr):
+        self._daily.append((time_expr, event_cls))
+
+    def get_next_event(self):
+        self.gen_events()
+        if len(self._events) == 0:
+            return
+        return self._events.pop(0)
+
+    def gen_events(self):
+        if len(self._events):
+            return
+
+        while len(self._events) == 0 and self._days:
+            day = self._days.pop(0)
+            for _time_expr, _event_cls in self._daily:
+                hour, minute, second = [int(_i) for _i in _time_expr.split(":")]
+                dt = datetime.datetime.combine(day, datetime.time(hour, minute, second))
+                if dt < self._start or (self._end and dt > self._end):
+                    continue
+                self._events.append((dt, _event_cls()))
+        self._events.sort(key=lambda e: e[0])
+
+
+def _time_exprs(interval):
+    exprs = []
+    current = datetime.datetime(2023, 1, 1)
+    end = current.replace(hour=23, minute=59, second=59)
+    while current <= end:
+        exprs.append(current.strftime("%H:%M:%S"))
+        current += datetime.timedelta(seconds=interval)
+    return exprs
+
+
+def _create(es_cls, exprs, start):
+    es = es_cls(start)
+    if hasattr(es, "setup"):
+        es.setup()
+    for _expr in exprs:
+        es.daily(Event, _expr)
+    return es
+
+
+def _run(es_cls, exprs, start, count):
+    t0 = time.perf_counter()
+    es = _create(es_cls, exprs, start)
+    t1 = time.perf_counter()
+    for _ in range(count):
+        es.get_next_event()
+    t2 = time.perf_counter()
+
+    # 内存单独统计，避免tracemalloc影响耗时数据
+    es = _create(es_cls, exprs, start)
+    tracemalloc.start()
+    es.get_next_event()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return t1 - t0, t2 - t1, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interval", type=float, default=5, help="daily定时任务间隔，单位：秒")
+    parser.add_argument("--days", type=float, default=2, help="取多少天的事件")
+    options = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    config.ENABLE_HISTORY_START = True
+
+    start = datetime.datetime(2023, 1, 1)
+    exprs = _time_exprs(options.interval)
+    count = int(len(exprs) * options.days)
+    print(f"daily entries: {len(exprs)}, events: {count}")
+
+    for _name, _cls in (("legacy", LegacyEventSource), ("heap", EventSource)):
+        setup_cost, run_cost, peak = _run(_cls, exprs, start, count)
+        print(f"{_name:>8}: setup {setup_cost:.3f}s, get_next_event {run_cost:.3f}s "
+              f"({count / run_cost:,.0f} events/s), events memory {peak / 1024 / 1024:.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+事件循环性能测试：对比pyuv和asyncio(uvloop)事件循环的调度延迟和吞吐
+
+    延迟: 连续调度定时消息，统计消息实际执行时间相对于目标时间的延迟，分别测试普通定时和精确定时（precise=True）
+    吞吐: 分别在事件循环线程和其他线程中push大量到期消息，统计每秒处理的消息数
+
+Usage:
+    python benchmarks/bench_loop.py
+    python benchmarks/bench_loop.py --backends asyncio --timers 200 --messages 100000
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from jqtrade.scheduler.clock import RealClock                # noqa: E402
+from jqtrade.scheduler.loop import create_event_loop         # noqa: E402
+from jqtrade.scheduler.message import Message                # noqa: E402
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def bench_latency(backend, timers, interval, precise=False):
+    clock = RealClock()
+    loop = create_event_loop(backend, clock=clock)
+    lags = []
+
+    def _callback(target, remain):
+        lags.append(clock.time_us() / 1000.0 - target)
+        if remain:
+            target = loop.get_current_time() + interval
+            loop.push_message(Message(target, _callback, callback_data={"target": target, "remain": remain - 1},
+                                      precise=precise))
+
+    target = loop.get_current_time() + interval
+    loop.push_message(Message(target, _callback, callback_data={"target": target, "remain": timers - 1},
+                              precise=precise))
+    loop.run()
+    return lags
+
+
+def bench_throughput(backend, messages, cross_thread):
+    loop = create_event_loop(backend, clock=RealClock())
+    counter = [0]
+
+    def _callback():
+        counter[0] += 1
+
+    def _producer():
+        for _ in range(messages):
+            loop.push_message(Message(loop.get_current_time(), _callback))
+
+    def _start():
+        if cross_thread:
+            threading.Thread(target=_producer).start()
+        else:
+            _producer()
+
+    def _check_done():
+        if counter[0] < messages:
+            loop.push_message(Message(loop.get_current_time() + 1, _check_done))
+
+    loop.push_message(Message(loop.get_current_time(), _start))
+    loop.push_message(Message(loop.get_current_time() + 1, _check_done))
+
+    t0 = time.perf_counter()
+    loop.run()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["pyuv", "asyncio"])
+    parser.add_argument("--timers", type=int, default=500, help="延迟测试的定时消息数量")
+    parser.add_argument("--interval", type=int, default=5, help="延迟测试的定时间隔，单位：毫秒")
+    parser.add_argument("--messages", type=int, default=200000, help="吞吐测试的消息数量")
+    options = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    for _backend in options.backends:
+        try:
+            create_event_loop(_backend)
+        except ImportError as e:
+            print(f"{_backend:>8}: skipped, {e}")
+            continue
+
+        for _precise in (False, True):
+            lags = bench_latency(_backend, options.timers, options.interval, _precise)
+            prefix = f"{'':>8}  precise latency" if _precise else f"{_backend:>8}: latency"
+            print(f"{prefix} p50 {_percentile(lags, 50):.3f}ms, p99 {_percentile(lags, 99):.3f}ms, "
+                  f"max {max(lags):.3f}ms")
+
+        for _cross_thread in (False, True):
+            cost = bench_throughput(_backend, options.messages, _cross_thread)
+            name = "other thread" if _cross_thread else "loop thread"
+            print(f"{'':>8}  throughput ({name}): {options.messages / cost:,.0f} messages/s")
+
+
+if __name__ == '__main__':
+    main()
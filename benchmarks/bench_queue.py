@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+事件队列性能测试：对比旧版Message（__dict__ + 每次入队重新生成sort_key并包装成元组）与当前的元组消息直接入堆
+
+Usage:
+    python benchmarks/bench_queue.py
+    python benchmarks/bench_queue.py --count 100000
+"""
+import os
+import sys
+import time
+import heapq
+import random
+import logging
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from jqtrade.scheduler.message import Message        # noqa: E402
+from jqtrade.scheduler.queue import PriorityQueue     # noqa: E402
+
+
+class LegacyMessage(object):
+    """ 旧版Message """
+
+    _unique_num = 0
+
+    def __init__(self, time, callback, callback_data=None, priority=0):
+        self.time = int(time)
+        self.callback = callback
+        self.callback_data = callback_data or {}
+        self.priority = priority
+
+        LegacyMessage._unique_num += 1
+        self.seq_number = LegacyMessage._unique_num
+
+    @property
+    def sort_key(self):
+        return self.time, -self.priority, self.seq_number
+
+
+class LegacyPriorityQueue(object):
+    """ 旧版PriorityQueue：(sort_key, item)元组入堆 """
+
+    def __init__(self):
+        self._queue = []
+
+    def push(self, item, sort_key):
+        heapq.heappush(self._queue, (sort_key, item))
+
+    def pop(self):
+        return heapq.heappop(self._queue)[1]
+
+
+def _callback():
+    pass
+
+
+def _run(msg_cls, queue_cls, times, legacy):
+    q = queue_cls()
+
+    t0 = time.perf_counter()
+    messages = [msg_cls(_t, _callback) for _t in times]
+    t1 = time.perf_counter()
+    if legacy:
+        for _msg in messages:
+            q.push(_msg, _msg.sort_key)
+    else:
+        for _msg in messages:
+            q.push(_msg)
+    t2 = time.perf_counter()
+    for _ in range(len(messages)):
+        q.pop()
+    t3 = time.perf_counter()
+    return t1 - t0, t2 - t1, t3 - t2
+
+
+def _memory(msg_cls, queue_cls, times, legacy):
+    tracemalloc.start()
+    q = queue_cls()
+    for _t in times:
+        msg = msg_cls(_t, _callback)
+        if legacy:
+            q.push(msg, msg.sort_key)
+        else:
+            q.push(msg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=1000000, help="消息数量")
+    options = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    random.seed(0)
+    times = [random.randint(0, 86400 * 1000) for _ in range(options.count)]
+    print(f"messages: {options.count}")
+
+    for _name, _msg_cls, _queue_cls, _legacy in (("legacy", LegacyMessage, LegacyPriorityQueue, True),
+                                                 ("tuple", Message, PriorityQueue, False)):
+        create_cost, push_cost, pop_cost = _run(_msg_cls, _queue_cls, times, _legacy)
+        peak = _memory(_msg_cls, _queue_cls, times, _legacy)
+        print(f"{_name:>8}: create {create_cost:.3f}s, push {push_cost:.3f}s "
+              f"({options.count / push_cost:,.0f}/s), pop {pop_cost:.3f}s ({options.count / pop_cost:,.0f}/s), "
+              f"memory {peak / 1024 / 1024:.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+事件队列性能测试：对比二叉堆（PriorityQueue）和分层时间轮（TimingWheelQueue）
+
+模拟实盘中的定时器分布：绝大部分定时器在一天内的整秒、整分触发
+
+参考结果（CPython 3.11）：时间轮入队比二叉堆慢约一倍；出队10万个定时器时慢约1.2倍，约30万个时持平，
+50万个时快约1.4倍，100万个时快约1.6倍
+
+Usage:
+    python benchmarks/bench_timing_wheel.py
+    python benchmarks/bench_timing_wheel.py --counts 10000 100000
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from jqtrade.scheduler.message import Message                          # noqa: E402
+from jqtrade.scheduler.queue import PriorityQueue, TimingWheelQueue     # noqa: E402
+
+
+def _callback():
+    pass
+
+
+def _messages(count, start):
+    messages = []
+    for _ in range(count):
+        if random.random() < 0.5:
+            # 整分
+            ts = start + random.randint(0, 24 * 60) * 60 * 1000
+        else:
+            # 整秒
+            ts = start + random.randint(0, 24 * 3600) * 1000
+        messages.append(Message(ts, _callback))
+    return messages
+
+
+def _run(queue_cls, messages):
+    q = queue_cls()
+    t0 = time.perf_counter()
+    for _msg in messages:
+        q.push(_msg)
+    t1 = time.perf_counter()
+    while not q.empty():
+        q.pop()
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[10000, 100000, 1000000], help="挂起的定时器数量")
+    options = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    random.seed(0)
+    start = 1698624000000   # 2023-10-30 08:00:00
+
+    for _count in options.counts:
+        messages = _messages(_count, start)
+        print(f"pending timers: {_count}")
+        for _name, _cls in (("heap", PriorityQueue), ("wheel", TimingWheelQueue)):
+            push_cost, pop_cost = _run(_cls, messages)
+            print(f"{_name:>8}: push {push_cost:.3f}s ({_count / push_cost:,.0f}/s), "
+                  f"pop {pop_cost:.3f}s ({_count / pop_cost:,.0f}/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,9 @@
 import argparse
 
 
+_REGISTRY_CONFIG_HELP = "自定义配置文件路径，任务启动时指定的配置中修改了SCHEDULER_RUNTIME_DIR时需要指定相同的配置，才能找到任务"
+
+
 def main():
     parser = argparse.ArgumentParser()
 
@@ -12,17 +15,24 @@ def main():
     # 启动实盘任务
     start_task_parser = sub_parsers.add_parser("start_task", help="创建新的实盘任务")
     start_task_parser.add_argument("-n", "--name", required=True, help="实盘任务名称，唯一标识该实盘任务，不能重复")
-    start_task_parser.add_argument("-c", "--code", required=True, help="策略代码路径")
+    start_task_parser.add_argument("-c", "--code", required=True, action="append",
+                                   help="策略代码路径，多次指定时在同一个进程中运行多个策略，共享事件循环和账户同步。"
+                                        "示例: -c strategy_a.py -c strategy_b.py")
     start_task_parser.add_argument("-o", "--out", required=False, default=None, help="日志路径，不指定时打印到标准输出/错误")
     start_task_parser.add_argument("-e", "--env", required=False, default=None,
                                    help="指定实盘策略进程运行环境变量，多个环境变量使用分号分隔。"
                                         "示例: -e PATH=./bin:/usr/bin;PYTHONPATH=./package;USER=test")
     start_task_parser.add_argument("--config", required=False, default=None, help="指定自定义配置文件路径")
     start_task_parser.add_argument("--debug", action="store_true", help="是否开启debug模式，debug模式日志更丰富些")
+    start_task_parser.add_argument("--profile-startup", action="store_true",
+                                   help="统计启动过程中各阶段和各模块导入的耗时，写入运行时目录的stats目录下")
     start_task_parser.set_defaults(func=start_task)
 
     # 查询运行中的实盘任务
     get_tasks_parser = sub_parsers.add_parser("get_tasks", help="查询当前运行中的实盘任务")
+    get_tasks_parser.add_argument("--scan", action="store_true",
+                                  help="同时遍历系统进程，查找未在任务注册表中注册的任务进程，较慢，windows下需要管理员权限")
+    get_tasks_parser.add_argument("--config", required=False, default=None, help=_REGISTRY_CONFIG_HELP)
     get_tasks_parser.set_defaults(func=get_tasks)
 
     # 停止实盘任务
@@ -32,8 +42,25 @@ def main():
     stop_task_parser.add_argument("--all", action="store_true", help="停止所有运行中的实盘任务")
     stop_task_parser.add_argument("-f", "--force", action="store_true", help="是否强制杀掉策略进程，"
                                                                              "不指定时，会等待策略进程处理完当前事务再退出")
+    stop_task_parser.add_argument("--config", required=False, default=None, help=_REGISTRY_CONFIG_HELP)
     stop_task_parser.set_defaults(func=stop_task)
 
+    # 重新加载策略代码
+    reload_task_parser = sub_parsers.add_parser("reload_task", help="重新加载运行中的实盘任务的策略代码，不重启策略进程")
+    reload_task_parser.add_argument("-n", "--name", default=None, help="通过指定实盘名称来重新加载")
+    reload_task_parser.add_argument("-p", "--pid", type=int, default=None, help="通过指定实盘进程pid来重新加载")
+    reload_task_parser.add_argument("--config", required=False, default=None, help=_REGISTRY_CONFIG_HELP)
+    reload_task_parser.set_defaults(func=reload_task)
+
+    # 向运行中的实盘任务发送控制命令
+    ctl_parser = sub_parsers.add_parser("ctl", help="向运行中的实盘任务发送控制命令，查看任务状态、统计数据等")
+    ctl_parser.add_argument("-n", "--name", default=None, help="通过指定实盘名称来选择任务")
+    ctl_parser.add_argument("-p", "--pid", type=int, default=None, help="通过指定实盘进程pid来选择任务")
+    ctl_parser.add_argument("command", help="控制命令，status: 任务状态；stats: 调度延迟、回调耗时、账户同步耗时统计；"
+                                            "sync_now: 立即同步资金持仓和订单；dump_orders: 查看当日订单；stop: 停止任务")
+    ctl_parser.add_argument("--config", required=False, default=None, help=_REGISTRY_CONFIG_HELP)
+    ctl_parser.set_defaults(func=ctl)
+
     options = parser.parse_args()
 
     if options.version:
@@ -47,30 +74,91 @@ def start_task(options):
     """
     python -m quant_engine start_task -c tests/scheduler/strategy_demo.py --debug -n demo
     """
-    from .scheduler.runner import TaskRunner
-    runner = TaskRunner(options.code, options.out, options.name, options.env, options.debug, options.config)
+    # 尽早开始统计，包含导入jqtrade各模块的耗时
+    from .scheduler.startup import StartupProfiler
+    profiler = StartupProfiler(profile_imports=options.profile_startup)
+
+    from .scheduler.runner import TaskRunner, MultiStrategyRunner
+    if len(options.code) > 1:
+        runner = MultiStrategyRunner(options.code, options.out, options.name, options.env, options.debug,
+                                     options.config, profiler)
+    else:
+        runner = TaskRunner(options.code[0], options.out, options.name, options.env, options.debug, options.config,
+                            profiler)
     runner.run()
 
 
+def _create_registry(config=None):
+    """ 任务注册表，位于config中配置的运行时目录下，需要和启动任务时使用相同的配置 """
+    import os
+    from .scheduler.registry import TaskRegistry
+    from .scheduler.config import setup_scheduler_config
+
+    if config:
+        path = os.path.abspath(os.path.expanduser(config))
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"找不到自定义配置文件: {path}")
+        setup_scheduler_config(path)
+    return TaskRegistry()
+
+
+def _find_task_processes(name=None, pid=None, all_tasks=False, config=None):
+    """ 查找运行中的任务进程，先查任务注册表，找不到时再遍历系统进程（用于查找未注册的任务进程） """
+    import psutil
+    from .scheduler.utils import get_activate_task_process, parse_task_info
+
+    processes = []
+    for _info in _create_registry(config).get_tasks():
+        if all_tasks or _info["pid"] == pid or (name and _info["name"] == name):
+            try:
+                processes.append(psutil.Process(_info["pid"]))
+            except psutil.NoSuchProcess:
+                pass
+    if processes:
+        return processes
+
+    print("任务注册表中未找到对应的任务进程，尝试遍历系统进程查找")
+    for _p in get_activate_task_process():
+        if all_tasks or _p.pid == pid or (name and parse_task_info(_p.cmdline())["name"] == name):
+            processes.append(_p)
+    return processes
+
+
 def get_tasks(options):
     """
     python -m quant_engine get_tasks
+    python -m quant_engine get_tasks --scan
     """
-    from .scheduler.utils import get_activate_task_process, parse_task_info
-
-    active_tasks = get_activate_task_process()
-    if not active_tasks:
-        print("当前没有运行中的实盘任务进程")
+    tasks = []
+    for _info in _create_registry(options.config).get_tasks():
+        _task_info = dict(_info)
+        _task_info["code"] = ",".join(_info.get("code") or [])
+        _task_info["cmd"] = " ".join(_info.get("cmd") or [])
+        tasks.append(_task_info)
+
+    if options.scan:
+        from .scheduler.utils import get_activate_task_process, parse_task_info
+
+        registered_pid = set(_task["pid"] for _task in tasks)
+        for _p in get_activate_task_process():
+            if _p.pid in registered_pid:
+                continue
+            _cmd = _p.cmdline()
+            _task_info = parse_task_info(_cmd)
+            _task_info["pid"] = _p.pid
+            _task_info["cmd"] = " ".join(_cmd)
+            _task_info["start_time"] = "未知（未注册的任务进程）"
+            tasks.append(_task_info)
+
+    if not tasks:
+        print("当前没有运行中的实盘任务进程" + ("" if options.scan else "，可以使用--scan选项遍历系统进程查找未注册的任务进程"))
         return
 
     print("当前活跃的实盘任务进程".center(30, "-"))
-    for _p in active_tasks:
-        _cmd = _p.cmdline()
-        _task_info = parse_task_info(_cmd)
-        _task_info["pid"] = _p.pid
-        _task_info["cmd"] = _cmd
+    for _task_info in tasks:
         print("名称: {name}\n"
               "pid: {pid}\n"
+              "启动时间: {start_time}\n"
               "代码路径: {code}\n"
               "日志路径: {out}\n"
               "自定义环境变量: {env}\n"
@@ -84,10 +172,6 @@ def stop_task(options):
     python -m quant_engine stop_task -p 12345
     python -m quant_engine stop_task --all
     """
-    from .scheduler.utils import get_activate_task_process, parse_task_info
-
-    active_tasks = get_activate_task_process()
-
     if not options.name and not options.pid and not options.all:
         raise ValueError("--name/--pid/--all至少指定一项")
 
@@ -103,19 +187,8 @@ def stop_task(options):
             print(f"尝试停止进程 {_p.pid}，已向该进程发送SIGTERM停止信号")
         killed_pid.append(_p.pid)
 
-    if options.all:
-        for _p in active_tasks:
-            _kill(_p, options.force)
-    elif options.pid:
-        for _p in active_tasks:
-            if _p.pid == options.pid:
-                _kill(_p, options.force)
-                break
-    else:
-        for _p in active_tasks:
-            _task_info = parse_task_info(_p.cmdline())
-            if options.name == _task_info["name"]:
-                _kill(_p, options.force)
+    for _p in _find_task_processes(options.name, options.pid, options.all, options.config):
+        _kill(_p, options.force)
 
     if not killed_pid:
         print("未找到需要停止的进程")
@@ -123,5 +196,58 @@ def stop_task(options):
         print("若您执行完stop_task命令后发现策略进程仍在运行，请尝试使用 -f 或 --force 选项强制停止进程")
 
 
+def reload_task(options):
+    """
+    python -m quant_engine reload_task -n demo1
+    python -m quant_engine reload_task -p 12345
+    """
+    import signal
+
+    if not options.name and not options.pid:
+        raise ValueError("--name/--pid至少指定一项")
+
+    if not hasattr(signal, "SIGHUP"):
+        raise RuntimeError("当前系统不支持SIGHUP信号，无法重新加载策略代码")
+
+    reloaded_pid = []
+    for _p in _find_task_processes(options.name, options.pid, config=options.config):
+        _p.send_signal(signal.SIGHUP)
+        print(f"已向进程 {_p.pid} 发送SIGHUP信号，策略进程将重新加载策略代码，结果见策略日志")
+        reloaded_pid.append(_p.pid)
+
+    if not reloaded_pid:
+        print("未找到需要重新加载的进程")
+
+
+def ctl(options):
+    """
+    python -m quant_engine ctl -n demo1 status
+    python -m quant_engine ctl -p 12345 stats
+    """
+    import json
+    from .common.exceptions import TaskError
+    from .scheduler.control import send_command
+
+    if not options.name and not options.pid:
+        raise ValueError("--name/--pid至少指定一项")
+
+    registry = _create_registry(options.config)
+    if options.name:
+        task_info = registry.get_task(options.name)
+    else:
+        task_info = next((_info for _info in registry.get_tasks() if _info["pid"] == options.pid), None)
+
+    if task_info is None:
+        print("任务注册表中未找到运行中的任务")
+        return
+
+    try:
+        result = send_command(task_info, options.command)
+    except TaskError as e:
+        print(f"执行控制命令失败：{e}")
+        return
+    print(json.dumps(result, indent=2, ensure_ascii=False, default=str))
+
+
 if __name__ == '__main__':
     main()
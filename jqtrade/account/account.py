@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
+import copy
+import time
+import functools
 import datetime
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
 
 from ..common.log import sys_logger
 from ..common.utils import generate_unique_number
+from ..scheduler.stats import Histogram
+from ..scheduler.context import ContextVar, _SimpleContextVar
 
 from .order import Order, OrderSide, OrderAction, OrderStatus
 from .position import Position
+from .shared import scheduled_sync
 from .config import get_config
 
 
@@ -15,6 +24,20 @@ config = get_config()
 logger = sys_logger.getChild("account")
 
 
+# 线程池任务固定读取的账户快照，(account, snapshot)，各任务独立
+_pinned_snapshot = ContextVar("jqtrade_account_snapshot", default=None)
+
+
+class AccountSnapshot(namedtuple("AccountSnapshot", ["balance", "long_positions", "short_positions", "orders"])):
+    """ 账户某一时刻的资金、持仓、订单，创建后不再修改
+
+    balance: (总资产, 可用资金, 锁定资金)
+    long_positions/short_positions: key: code, val: Position object
+    orders: key: order_id, val: Order object
+    """
+    __slots__ = ()
+
+
 class AbsAccount(object):
     def setup(self, options):
         """ 初始化Account依赖的运行环境
@@ -72,26 +95,21 @@ class Account(AbsAccount):
     def __init__(self, ctx):
         self._ctx = ctx
 
-        # key: order_id, val: Order object
-        self._orders = {}
-
-        # key: code, val: Position object
-        self._long_positions = {}
-        self._short_positions = {}
-
-        # 总资产
-        self._total_assert = 0
-
-        # 可用资金
-        self._available_cash = 0
-
-        # 锁定资金
-        self._locked_cash = 0
+        # 资金、持仓、订单放在同一个不可变的快照中，修改时生成新的快照再整体替换引用，
+        # 读取方（包括线程池中的用户函数）不加锁，拿到的始终是某一时刻完整一致的快照。写操作之间通过_lock互斥
+        self._lock = threading.RLock()
+        self._snapshot = AccountSnapshot((0, 0, 0), {}, {}, {})
 
         self.has_synced = False
 
         self._options = None
 
+        # 等待订单状态变化的future，key: order_id, val: [(等待的状态, future), ...]
+        self._order_waiters = {}
+
+        # 调用交易接口同步资金持仓、订单的耗时，单位：微秒
+        self._sync_stats = {"sync_balance": Histogram(), "sync_orders": Histogram()}
+
     def setup(self, options):
         logger.info("setup account")
 
@@ -123,71 +141,86 @@ class Account(AbsAccount):
     def _setup_sync_timer(self):
         logger.info("setup account sync timer")
         # 初始化定时任务事件
-        from ..scheduler.event_source import EventSource
-        from ..scheduler.event import create_event_class, EventPriority
-        event_cls = create_event_class("AccountSyncEvent", priority=EventPriority.ACCOUNT_SYNC)
-        event_source = EventSource(start=self._ctx.start, end=self._ctx.end)
-        now = datetime.datetime.now().replace(microsecond=0)
+        from ..scheduler.event_source import IntervalEventSource
+        from ..scheduler.event import create_event_class, EventPriority, CoalescePolicy
+        # 事件循环落后时，积压的账户同步事件只执行一次，没必要连续读取多次账户文件
+        event_cls = create_event_class(self._ctx.event_name("AccountSyncEvent"),
+                                       priority=EventPriority.ACCOUNT_SYNC, coalesce=CoalescePolicy.LATEST)
 
         sync_internal = float(self._options.get("sync_internal", config.SYNC_INTERNAL))
         sync_period = self._options.get("sync_period", config.SYNC_PERIOD)
-        if not sync_period:
-            current = now + datetime.timedelta(seconds=sync_internal)
-            while current <= now.replace(hour=23, minute=59, second=59):
-                event_source.daily(event_cls, current.strftime("%H:%M:%S"))
-                current += datetime.timedelta(seconds=sync_internal)
-        else:
-            for _period in sync_period:
-                if len(_period) != 2:
-                    raise ValueError(f"sync period设置错误：{_period}")
-                _start, _end = _period
-                if not (isinstance(_start, datetime.time) and isinstance(_end, datetime.time)):
-                    raise ValueError(f"sync period设置的时间类型错误，需要是datetime.time类型。")
-                _start_dt = datetime.datetime.combine(now.date(), _start)
-                _end_dt = datetime.datetime.combine(now.date(), _end)
-                current = _start_dt
-                while current <= _end_dt:
-                    event_source.daily(event_cls, current.strftime("%H:%M:%S"))
-                    current += datetime.timedelta(seconds=sync_internal)
+        for _period in sync_period or []:
+            if len(_period) != 2:
+                raise ValueError(f"sync period设置错误：{_period}")
+            _start, _end = _period
+            if not (isinstance(_start, datetime.time) and isinstance(_end, datetime.time)):
+                raise ValueError(f"sync period设置的时间类型错误，需要是datetime.time类型。")
+
+        # 不设置sync_period时，从启动时间开始每隔sync_internal秒同步一次；设置时，只在时间段内同步。
+        # 以上下文的start为起点，多策略模式下各策略的上下文共用根上下文的start，即使各策略setup的时间不同，
+        # 同步时间也是对齐的，同一时刻只读取一次交易接口
+        event_source = IntervalEventSource(event_cls, sync_internal, periods=sync_period or None,
+                                           start=self._ctx.start, end=self._ctx.end, anchor=self._ctx.start)
+        event_source.setup()
 
         if self.need_sync_balance:
-            self._ctx.event_bus.register(event_cls, self.sync_balance)
+            self._ctx.event_bus.register(event_cls, self._scheduled_sync(self.sync_balance))
 
         if self.need_sync_order:
-            self._ctx.event_bus.register(event_cls, self.sync_orders)
+            self._ctx.event_bus.register(event_cls, self._scheduled_sync(self.sync_orders))
 
         self._ctx.scheduler.schedule(event_source)
 
+    def _scheduled_sync(self, sync):
+        """ 定时同步事件的回调，以事件触发时间作为同步轮次，多策略模式下各策略同一轮的同步只读取一次交易接口 """
+        @functools.wraps(sync)
+        def _callback(event):
+            with scheduled_sync(self._ctx.loop.strategy_dt):
+                sync(event)
+        return _callback
+
     def order(self, code, amount, style, side):
         order_id = str(generate_unique_number())
         action = OrderAction.close if amount < 0 else OrderAction.open
         order_obj = Order(code=code, price=style.price, amount=abs(amount), action=action,
-                          order_id=order_id, style=style, create_time=datetime.datetime.now(),
+                          order_id=order_id, style=style, create_time=self._ctx.current_dt,
                           status=OrderStatus.new)
-        self._orders[order_id] = order_obj
-        try:
-            logger.info(f"提交订单，订单id：{order_id}，code：{code}，price：{style.price}，amount：{amount}，"
-                        f"action：{action.value}，style：{style}")
-            self._ctx.trade_gate.order(order_obj)
-            self.on_order_created(order_obj)
-            return order_id
-        except Exception as e:
-            logger.exception(f"内部下单异常，code={code}, amount={amount}, style={style}, side={side}, error={e}")
+        with self._lock:
+            snapshot = self._snapshot
+            orders = dict(snapshot.orders)
+            orders[order_id] = order_obj
+            try:
+                logger.info(f"提交订单，订单id：{order_id}，code：{code}，price：{style.price}，amount：{amount}，"
+                            f"action：{action.value}，style：{style}")
+                self._ctx.trade_gate.order(order_obj)
+                # 订单和冻结后的持仓一起生效
+                self._publish(self.on_order_created(order_obj, snapshot._replace(orders=orders)))
+                return order_id
+            except Exception as e:
+                self._publish(snapshot._replace(orders=orders))
+                logger.exception(f"内部下单异常，code={code}, amount={amount}, style={style}, side={side}, error={e}")
 
     def cancel_order(self, order_id):
-        try:
-            if order_id not in self._orders:
-                logger.error(f"发起撤单失败，本地找不到内部委托id为{order_id}的委托")
+        with self._lock:
+            try:
+                if order_id not in self._snapshot.orders:
+                    logger.error(f"发起撤单失败，本地找不到内部委托id为{order_id}的委托")
+                    return
+
+                logger.info(f"提交撤单，被撤订单id：{order_id}")
+                self._ctx.trade_gate.cancel_order(order_id)
+            except Exception as e:
+                logger.exception(f"内部撤单异常，order_id={order_id}, error={e}")
                 return
 
-            logger.info(f"提交撤单，被撤订单id：{order_id}")
-            self._ctx.trade_gate.cancel_order(order_id)
-        except Exception as e:
-            logger.exception(f"内部撤单异常，order_id={order_id}, error={e}")
-            return
-
     def sync_balance(self, *args, **kwargs):
         logger.debug("sync_balance run")
+        start = time.perf_counter()
+        with self._lock:
+            self._sync_balance()
+        self._sync_stats["sync_balance"].record((time.perf_counter() - start) * 1000000)
+
+    def _sync_balance(self):
         try:
             account_info = self._ctx.trade_gate.sync_balance()
 
@@ -198,14 +231,15 @@ class Account(AbsAccount):
                 raise ValueError("trade_gate.sync_balance未返回持仓数据")
 
             cash_info = account_info["cash"]
-            self._total_assert = cash_info.get("total_asset") or self._total_assert
-            self._available_cash = cash_info.get("available_cash") or self._available_cash
-            self._locked_cash = cash_info.get("locked_cash") or self._locked_cash
+            total_assert, available_cash, locked_cash = self._snapshot.balance
+            balance = (cash_info.get("total_asset") or total_assert,
+                       cash_info.get("available_cash") or available_cash,
+                       cash_info.get("locked_cash") or locked_cash)
 
-            # 每次全量同步持仓前，清空缓存中的持仓，然后使用交易接口同步到的持仓更新内存。由于框架是单线程，所以这样处理没问题。
+            # 每次全量同步持仓时，使用交易接口同步到的持仓生成新的持仓字典，再整体替换内存中的持仓
             # 这样的处理逻辑依赖交易接口返回正常的持仓，相较于原地更新，逻辑简单，不容易出问题。
-            self._long_positions.clear()
-            self._short_positions.clear()
+            long_positions = {}
+            short_positions = {}
 
             positions = account_info["positions"]
             for _pos_info in positions:
@@ -220,47 +254,118 @@ class Account(AbsAccount):
                 )
 
                 if _pos.side == OrderSide.long:
-                    self._long_positions[_pos.code] = _pos
+                    long_positions[_pos.code] = _pos
                 else:
-                    self._short_positions[_pos.code] = _pos
+                    short_positions[_pos.code] = _pos
+
+            self._publish(self._snapshot._replace(balance=balance, long_positions=long_positions,
+                                                  short_positions=short_positions))
         except Exception as e:
             logger.exception(f"同步资金和持仓失败，error={e}")
 
     def sync_orders(self, *args, **kwargs):
         logger.debug("sync_orders run")
+        start = time.perf_counter()
+        with self._lock:
+            self._sync_orders()
+        self._sync_stats["sync_orders"].record((time.perf_counter() - start) * 1000000)
+
+    def sync_stats(self):
+        """ 同步资金持仓、订单的耗时统计摘要，单位：毫秒，字段见scheduler.stats.Histogram.summary """
+        return {_name: _hist.summary(0.001) for _name, _hist in self._sync_stats.items()}
+
+    def _sync_orders(self):
         try:
             orders = self._ctx.trade_gate.sync_orders()
 
+            new_orders = dict(self._snapshot.orders)
+            changed = []
             for _order_info in orders:
                 _order_id = str(_order_info["order_id"])
-                _local_order = self._orders.get(_order_id)
+                _local_order = new_orders.get(_order_id)
                 _remote_order = Order.load(**_order_info)
                 if _local_order is None:
                     if self.has_synced:
                         logger.info(f"从trade_gate同步到本地不存在的订单: {_order_info}")
                     else:
                         logger.info(f"从trade_gate同步订单: {_order_info}")
-                    self._orders[_order_id] = _remote_order
+                    new_orders[_order_id] = _remote_order
+                    changed.append(_remote_order)
                     continue
 
                 if _remote_order == _local_order:
                     continue
                 else:
-                    self._orders[_order_id] = _remote_order
+                    new_orders[_order_id] = _remote_order
                     self.on_order_updated(_local_order, _remote_order)
+                    changed.append(_remote_order)
+
+            self._publish(self._snapshot._replace(orders=new_orders))
+            for _order in changed:
+                self._notify_order_waiters(_order)
 
             self.has_synced = True
         except Exception as e:
             logger.exception(f"同步订单失败，error={e}")
 
-    def on_order_created(self, order):
-        if order.side == OrderSide.long:
-            pos = self._long_positions.get(order.code)
-        else:
-            pos = self._short_positions.get(order.code)
+    def wait_order(self, order_id, statuses=None):
+        """ 等待订单状态变化，需要使用asyncio事件循环
 
-        if pos:
-            pos.on_order_created(order)
+        Args:
+            order_id: 内部委托id
+            statuses: 等待的订单状态列表，默认等待订单完结
+
+        Return:
+            asyncio.Future，订单状态变为statuses中的任一状态时完成，结果为订单对象
+        """
+        statuses = tuple(statuses or OrderStatus.finished_status())
+        future = self._ctx.loop.aio_loop.create_future()
+
+        with self._lock:
+            order = self._snapshot.orders.get(order_id)
+            if order is not None and order.status in statuses:
+                future.set_result(order)
+            else:
+                self._order_waiters.setdefault(order_id, []).append((statuses, future))
+        return future
+
+    def _notify_order_waiters(self, order):
+        waiters = self._order_waiters.pop(order.order_id, None)
+        if not waiters:
+            return
+
+        remain = []
+        for _statuses, _future in waiters:
+            if order.status in _statuses:
+                # sync_orders可能在线程池中调用，future只能在事件循环线程中设置结果
+                self._ctx.loop.aio_loop.call_soon_threadsafe(self._set_future_result, _future, order)
+            else:
+                remain.append((_statuses, _future))
+        if remain:
+            self._order_waiters[order.order_id] = remain
+
+    @staticmethod
+    def _set_future_result(future, result):
+        # 等待方已超时或取消时不再设置结果
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def on_order_created(order, snapshot):
+        """ 返回下单后的账户快照，平仓单冻结对应持仓的可用数量 """
+        positions = snapshot.long_positions if order.side == OrderSide.long else snapshot.short_positions
+        pos = positions.get(order.code)
+        if not pos:
+            return snapshot
+
+        # 复制一份持仓再修改，不影响读取方已经拿到的持仓快照
+        pos = copy.copy(pos)
+        pos.on_order_created(order)
+        positions = dict(positions)
+        positions[order.code] = pos
+        if order.side == OrderSide.long:
+            return snapshot._replace(long_positions=positions)
+        return snapshot._replace(short_positions=positions)
 
     def on_order_updated(self, local_order, remote_order):
         self._notify_changed(local_order, remote_order)
@@ -331,26 +436,64 @@ class Account(AbsAccount):
                     f"委托数量：{remote_order.amount}，委托价格：{remote_order.price}，"
                     f"action: {remote_order.action.value}，废单原因：{remote_order.err_msg}")
 
+    def _publish(self, snapshot):
+        """ 发布新的快照，在pin_snapshot块中时，块内固定的快照也更新为新的快照，用户能读到自己的下单、同步结果 """
+        self._snapshot = snapshot
+        pinned = _pinned_snapshot.get()
+        if pinned is not None and pinned[0] is self:
+            _pinned_snapshot.set((self, snapshot))
+
+    @contextmanager
+    def pin_snapshot(self, snapshot=None):
+        """ with语句块中读取的资金、持仓、订单固定为同一个快照，不受事件循环线程中账户同步的影响
+
+        Args:
+            snapshot: 固定的快照，默认为当前快照
+        """
+        if isinstance(_pinned_snapshot, _SimpleContextVar):
+            # python3.6没有contextvars，固定快照会影响所有线程的读取，不固定
+            yield
+            return
+
+        token = _pinned_snapshot.set((self, snapshot or self._snapshot))
+        try:
+            yield
+        finally:
+            _pinned_snapshot.reset(token)
+
+    @property
+    def snapshot(self):
+        """ 当前的资金、持仓、订单快照，需要同时读取多项数据时使用，保证数据来自同一时刻；在pin_snapshot块中返回固定的快照 """
+        pinned = _pinned_snapshot.get()
+        if pinned is not None and pinned[0] is self:
+            return pinned[1]
+        return self._snapshot
+
     @property
     def orders(self):
-        return self._orders
+        return self.snapshot.orders
 
     @property
     def long_positions(self):
-        return self._long_positions
+        return self.snapshot.long_positions
 
     @property
     def short_positions(self):
-        return self._short_positions
+        return self.snapshot.short_positions
 
     @property
     def total_assert(self):
-        return self._total_assert
+        return self.snapshot.balance[0]
 
     @property
     def available_cash(self):
-        return self._available_cash
+        return self.snapshot.balance[1]
 
     @property
     def locked_cash(self):
-        return self._locked_cash
+        return self.snapshot.balance[2]
+
+    @property
+    def balance(self):
+        """ (总资产, 可用资金, 锁定资金)快照 """
+        return self.snapshot.balance
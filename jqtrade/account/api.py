@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import asyncio
+
 from ..common.exceptions import InvalidParam
 from ..common.log import sys_logger
 from ..scheduler.context import Context
@@ -121,6 +123,37 @@ def get_orders(order_id=None, code=None, status=None):
     return {_order.order_id: UserOrder(_order) for _order in orders}
 
 
+async def wait_order(order_id, status=None, timeout=None):
+    """ 等待订单状态变化，只能在async def定义的定时任务中使用（需要使用asyncio事件循环）
+
+    Args:
+        order_id: 内部委托id（order函数返回值）
+        status: 等待的订单状态字符串或字符串列表，默认等待订单完结（filled、partly_canceled、canceled、rejected）
+        timeout: 超时时间，单位：秒，超时抛出asyncio.TimeoutError，默认一直等待
+
+    Return:
+        返回状态变化后的UserOrder对象
+
+    Notice:
+        订单状态通过账户同步更新，状态变化后最晚在下一次同步订单时返回
+    """
+    order_id = str(order_id)
+
+    statuses = None
+    if status:
+        if isinstance(status, (str, OrderStatus)):
+            status = [status]
+        statuses = []
+        for _status in status:
+            if not isinstance(_status, OrderStatus):
+                _check_status(_status)
+            statuses.append(OrderStatus.get_status(_status))
+
+    future = Context.get_instance().account.wait_order(order_id, statuses)
+    order = await asyncio.wait_for(future, timeout) if timeout else await future
+    return UserOrder(order)
+
+
 def batch_submit_orders(orders):
     """ 批量下单
 
@@ -324,6 +357,6 @@ __all__ = [
     "LimitOrderStyle", "MarketOrderStyle",
     "order", "cancel_order",
     "batch_submit_orders", "batch_cancel_orders",
-    "get_orders",
+    "get_orders", "wait_order",
     "sync_balance", "sync_orders",
 ]
@@ -9,21 +9,22 @@ class Portfolio(object):
     def __init__(self, account):
         self.__account = account
 
+    @staticmethod
+    def _user_positions(side, positions):
+        user_positions = UserPositionDict(side)
+        for _code, _pos in positions.items():
+            user_positions[_code] = UserPosition(_pos)
+        return user_positions
+
     @property
     def long_positions(self):
-        positions = UserPositionDict(OrderSide.long)
-        for _code, _pos in self.__account.long_positions.items():
-            positions[_code] = UserPosition(_pos)
-        return positions
+        return self._user_positions(OrderSide.long, self.__account.long_positions)
 
     positions = long_positions
 
     @property
     def short_positions(self):
-        positions = UserPositionDict(OrderSide.short)
-        for _code, _pos in self.__account.short_positions.items():
-            positions[_code] = UserPosition(_pos)
-        return positions
+        return self._user_positions(OrderSide.short, self.__account.short_positions)
 
     @property
     def total_value(self):
@@ -42,6 +43,10 @@ class Portfolio(object):
         return sum(_pos.position_value for _pos in self.long_positions)
 
     def __str__(self):
-        return f"Portfolio(total_assert={self.total_value}, available_assert={self.available_cash}, " \
-               f"locked_cash={self.locked_cash}, long_positions={self.long_positions}, " \
-               f"short_positions={self.short_positions}"
+        # 各项数据取自同一个账户快照
+        snapshot = self.__account.snapshot
+        total_value, available_cash, locked_cash = snapshot.balance
+        return f"Portfolio(total_assert={total_value}, available_assert={available_cash}, " \
+               f"locked_cash={locked_cash}, " \
+               f"long_positions={self._user_positions(OrderSide.long, snapshot.long_positions)}, " \
+               f"short_positions={self._user_positions(OrderSide.short, snapshot.short_positions)}"
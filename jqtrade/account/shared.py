@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+import threading
+from contextlib import contextmanager
+
+from ..common.exceptions import ConfigError
+from ..common.log import sys_logger
+from ..scheduler.config import get_config as get_scheduler_config
+from ..scheduler.context import ContextVar
+
+from .trade_gate import AbsTradeGate
+from .config import get_config as get_account_config
+
+
+logger = sys_logger.getChild("shared_gate")
+
+
+scheduler_config = get_scheduler_config()
+
+
+# 当前正在执行的定时账户同步的轮次，只有定时同步事件设置，用户主动调用的同步为None
+_sync_round = ContextVar("jqtrade_sync_round", default=None)
+
+
+@contextmanager
+def scheduled_sync(sync_round):
+    """ with语句块中的资金持仓、订单同步属于同一轮定时同步，多策略模式下同一轮只读取一次交易接口
+
+    Args:
+        sync_round: 同步轮次，定时同步事件的触发时间
+    """
+    token = _sync_round.set(sync_round)
+    try:
+        yield
+    finally:
+        _sync_round.reset(token)
+
+
+class SharedTradeGate(object):
+    """
+    Usage:
+        多策略模式下所有策略共享的交易接口
+
+        1. 真实的trade gate只创建、初始化一次，所有策略必须使用同一个资金账号
+        2. 同一轮定时同步（各策略同一时刻触发的账户同步事件）只读取一次交易接口，结果分发给各个策略；
+           用户主动调用的同步、下单撤单后的同步总是读取交易接口
+        3. 记录每笔订单所属的策略，同步到的订单只分发给下单的策略，订单归属持久化到运行时目录，重启后可以恢复
+    """
+
+    def __init__(self, ctx, gate_factory=None):
+        """
+        Args:
+            ctx: 多策略共享的根上下文
+            gate_factory: 创建真实trade gate的函数，默认按account配置的TRADE_GATE创建
+        """
+        self._ctx = ctx
+        self._gate_factory = gate_factory
+        self._gate = None
+        self._options = None
+
+        # 下单、同步可能在线程池中调用
+        self._lock = threading.RLock()
+
+        # 订单归属，key: order_id, val: 策略名称
+        self._owners = {}
+        self._owners_file = None
+
+        # 最近一次同步的结果，(同步轮次, 数据)，同一轮定时同步内直接复用，下单、撤单后清空
+        self._balance_cache = None
+        self._orders_cache = None
+
+    def create_gate(self, name):
+        """ 创建策略使用的trade gate """
+        return StrategyTradeGate(self, name)
+
+    @property
+    def gate(self):
+        return self._gate
+
+    def setup(self, name, options):
+        with self._lock:
+            if self._gate is not None:
+                if str(options.get("account_no")) != str(self._options.get("account_no")):
+                    raise ConfigError(f"多策略模式下所有策略必须使用同一个资金账号，策略{name}的资金账号"
+                                      f"{options.get('account_no')}与{self._options.get('account_no')}不一致")
+                logger.info(f"策略{name}使用共享的trade gate")
+                return
+
+            if self._gate_factory:
+                gate = self._gate_factory()
+            else:
+                account_config = get_account_config()
+                if not account_config.TRADE_GATE:
+                    raise ConfigError("未配置trade gate")
+                from ..scheduler.strategy import create_trade_gate
+                gate = create_trade_gate(account_config.TRADE_GATE)
+
+            logger.info(f"初始化多策略共享的trade gate：{gate.__class__.__name__}")
+            # 以根上下文初始化，trade gate的缓存文件等按任务名称而不是策略名称命名
+            with self._ctx.activate():
+                gate.setup(options)
+            self._gate = gate
+            self._options = options
+
+            runtime_dir = options.get("runtime_dir", scheduler_config.RUNTIME_DIR)
+            data_dir = os.path.join(os.path.abspath(os.path.expanduser(runtime_dir)), "data")
+            if not os.path.exists(data_dir):
+                os.makedirs(data_dir)
+            date = self._ctx.current_dt.strftime("%Y%m%d")
+            self._owners_file = os.path.join(data_dir, f"{self._ctx.task_name}_{date}_strategy_orders.json")
+            self._load_owners()
+
+    def _load_owners(self):
+        if not os.path.exists(self._owners_file):
+            return
+        try:
+            with open(self._owners_file, "r") as rf:
+                self._owners = json.load(rf)
+            logger.info(f"从本地缓存文件恢复订单归属，订单数：{len(self._owners)}，file：{self._owners_file}")
+        except Exception as e:
+            logger.exception(f"从本地缓存文件恢复订单归属失败，file：{self._owners_file}，error={e}")
+
+    def _save_owners(self):
+        tmp_file = self._owners_file + ".tmp"
+        with open(tmp_file, "w") as wf:
+            json.dump(self._owners, wf)
+        shutil.move(tmp_file, self._owners_file)
+
+    def owner(self, order_id):
+        """ 订单所属的策略名称，不是通过jqtrade下的订单返回None """
+        return self._owners.get(str(order_id))
+
+    def order(self, name, sys_order):
+        with self._lock:
+            # 先记录归属再下单，避免下单后、记录前的同步丢失这笔订单
+            self._owners[sys_order.order_id] = name
+            try:
+                self._gate.order(sys_order)
+            except Exception:
+                self._owners.pop(sys_order.order_id, None)
+                raise
+            finally:
+                self._save_owners()
+                self._clear_cache()
+
+    def cancel_order(self, order_id):
+        with self._lock:
+            try:
+                self._gate.cancel_order(order_id)
+            finally:
+                self._clear_cache()
+
+    def _clear_cache(self):
+        # 下单、撤单后资金持仓、订单已经变化，同一轮后续的同步需要重新读取交易接口
+        self._balance_cache = None
+        self._orders_cache = None
+
+    @staticmethod
+    def _cached(cache, read):
+        """ 定时同步在同一轮内复用缓存，用户主动调用的同步总是读取交易接口，返回(缓存, 数据) """
+        sync_round = _sync_round.get()
+        if sync_round is not None and cache is not None and cache[0] == sync_round:
+            return cache, cache[1]
+        data = read()
+        if sync_round is None:
+            # 主动同步读到的数据更新，所在轮次未结束时后续的定时同步直接复用
+            sync_round = cache[0] if cache is not None else None
+        return (sync_round, data), data
+
+    def sync_balance(self):
+        with self._lock:
+            self._balance_cache, data = self._cached(self._balance_cache, self._gate.sync_balance)
+
+        # Account会修改持仓字典，每个策略返回一份副本
+        data = dict(data)
+        if "cash" in data:
+            data["cash"] = dict(data["cash"])
+        if "positions" in data:
+            data["positions"] = [dict(_pos) for _pos in data["positions"]]
+        return data
+
+    def sync_orders(self):
+        with self._lock:
+            self._orders_cache, data = self._cached(self._orders_cache, self._gate.sync_orders)
+            return data
+
+
+class StrategyTradeGate(AbsTradeGate):
+    """
+    Usage:
+        多策略模式下单个策略使用的trade gate，所有操作转发到SharedTradeGate，同步订单时只返回本策略的订单
+    """
+
+    def __init__(self, shared, name):
+        super(StrategyTradeGate, self).__init__()
+        self._shared = shared
+        self._name = name
+
+    def setup(self, options):
+        self._options = options
+        self._shared.setup(self._name, options)
+
+    def order(self, sys_order):
+        self._shared.order(self._name, sys_order)
+
+    def cancel_order(self, order_id):
+        self._shared.cancel_order(order_id)
+
+    def sync_balance(self):
+        return self._shared.sync_balance()
+
+    def sync_orders(self):
+        return [_order for _order in self._shared.sync_orders()
+                if self._shared.owner(_order["order_id"]) == self._name]
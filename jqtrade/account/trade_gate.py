@@ -9,8 +9,6 @@ import portalocker
 
 from collections import namedtuple
 
-import pandas as pd
-from pandas.errors import ParserError
 
 from ..common.exceptions import InvalidParam, TimeOut
 from ..common.log import sys_logger
@@ -302,6 +300,9 @@ class AnXinDMATradeGate(AbsTradeGate):
                     portalocker.unlock(fp)
 
     def sync_balance(self):
+        # pandas导入耗时较长，用到时再导入，不拖慢策略进程启动
+        import pandas as pd
+
         data = {}
 
         self.check_file_exists(self._assert_info_csv)
@@ -366,6 +367,8 @@ class AnXinDMATradeGate(AbsTradeGate):
         path = args[1]
         if not os.path.exists(path):
             raise FileNotFoundError(path)
+
+        import pandas as pd
         df = pd.read_csv(*args[1:], **kwargs)
         if not df.loc[len(df)-1].isna().all():
             raise OSError(f"检测到文件不完整：{path}")
@@ -513,6 +516,7 @@ class AnXinDMATradeGate(AbsTradeGate):
 
     def _parse_status(self, status):
         if status not in self.STATUS_MAP:
+            from pandas.errors import ParserError
             raise ParserError(f"无效订单状态：{status}")
         return self.STATUS_MAP[status]
 
@@ -36,3 +36,8 @@ class InvalidParam(UserError):
     pass
 
 
+class DeadlineExceeded(UserError):
+    """ 定时任务超过截止时间 """
+    pass
+
+
@@ -55,7 +55,8 @@ def parse_time(t):
 
 
 def dt_to_milliseconds(dt):
-    return int(dt.timestamp() * 1000 + dt.microsecond / 1000)
+    # timestamp()已包含微秒部分，不能重复累加
+    return int(dt.timestamp() * 1000)
 
 
 def milliseconds_to_dt(milliseconds):
@@ -17,6 +17,9 @@ class EventBus(object):
     def __init__(self):
         self._subscribes = OrderedDict()
 
+        # 事件具体类型 -> 按优先级排好序的回调函数列表，emit时按需生成，register/unregister时清空
+        self._dispatch_cache = {}
+
     def register(self, event_cls, callback, priority=0):
         """ 注册事件类的回调函数
 
@@ -28,6 +31,7 @@ class EventBus(object):
         """
         logger.debug(f"register callback: {callback.__name__}, event_cls: {event_cls}, priority: {priority}")
         self._subscribes.setdefault(event_cls, {}).setdefault(priority, []).append(callback)
+        self._dispatch_cache.clear()
 
     def unregister(self, event_cls, callback):
         """ 取消注册事件类的某个回调函数
@@ -43,6 +47,22 @@ class EventBus(object):
                 event_subscribes[_priority].remove(callback)
             except ValueError:
                 logger.error(f"already unregister callback: {callback.__name__} of event_cls: {event_cls}")
+        self._dispatch_cache.clear()
+
+    def _resolve(self, event_type):
+        """ 根据事件类型的MRO找出所有需要触发的回调函数，按优先级从高到低排序，同优先级按注册顺序 """
+        mro = set(event_type.__mro__)
+        subscribes = []
+        for _event_cls, _event_subscribes in self._subscribes.items():
+            if _event_cls not in mro:
+                continue
+            for _priority in sorted(_event_subscribes, reverse=True):
+                for _callback in _event_subscribes[_priority]:
+                    subscribes.append((_priority, _callback))
+        subscribes.sort(key=lambda _item: _item[0], reverse=True)
+        callbacks = tuple(_callback for _, _callback in subscribes)
+        self._dispatch_cache[event_type] = callbacks
+        return callbacks
 
     def emit(self, event):
         """ 触发事件绑定的回调函数
@@ -50,13 +70,11 @@ class EventBus(object):
         Args:
             event: event_class实例
         """
-        ret = []
-        for _event_cls in self._subscribes:
-            if not isinstance(event, _event_cls):
-                continue
-            _event_subscribes = self._subscribes.get(_event_cls, {})
-            for _priority in sorted(_event_subscribes, reverse=True):
-                for _callback in _event_subscribes[_priority]:
-                    logger.debug(f"emit event: {event}, callback: {_callback.__name__}")
-                    ret.append(_callback(event))
-        return ret
+        event_type = type(event)
+        callbacks = self._dispatch_cache.get(event_type)
+        if callbacks is None:
+            callbacks = self._resolve(event_type)
+
+        for _callback in callbacks:
+            logger.debug("emit event: %s, callback: %s", event, _callback.__name__)
+            _callback(event)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import time
+import datetime
+
+from ..common.exceptions import ConfigError
+from ..common.utils import dt_to_milliseconds, milliseconds_to_dt
+
+
+# time.monotonic_ns、time.time_ns需要python3.7+，低版本使用浮点数版本，精度同样在微秒级
+_monotonic_ns = getattr(time, "monotonic_ns", lambda: int(time.monotonic() * 1000000000))
+_time_ns = getattr(time, "time_ns", lambda: int(time.time() * 1000000000))
+
+
+class Clock(object):
+    """
+    Usage:
+        时钟基类，EventLoop、EventSource、Context、trade gate共用同一个时钟获取当前时间
+    """
+
+    # 是否是模拟时钟，模拟时钟下事件循环不会真实等待，而是直接跳到下一条消息的时间
+    simulated = False
+
+    def time(self):
+        """ 当前时间戳，单位：毫秒 """
+        raise NotImplementedError
+
+    def time_us(self):
+        """ 当前时间戳，单位：微秒，用于统计调度延迟 """
+        return self.time() * 1000
+
+    def time_ns(self):
+        """ 当前时间戳，单位：纳秒，用于精确定时 """
+        return self.time() * 1000000
+
+    def now(self):
+        return milliseconds_to_dt(self.time())
+
+    def today(self):
+        return self.now().date()
+
+
+class RealClock(Clock):
+    """ 真实物理时钟
+
+    time_ns/time_us基于单调时钟计算，并锚定到系统时间：time.time()的精度受系统影响，且系统时间可能被校时回拨，
+    单调时钟的增量更精确；每隔ANCHOR_INTERVAL秒重新锚定一次，跟上系统校时
+    """
+
+    ANCHOR_INTERVAL = 60
+
+    def __init__(self):
+        self._anchor()
+
+    def _anchor(self):
+        self._anchor_mono = _monotonic_ns()
+        self._anchor_wall = _time_ns()
+
+    def time(self):
+        return int(time.time() * 1000)
+
+    def time_ns(self):
+        mono = _monotonic_ns()
+        elapsed = mono - self._anchor_mono
+        if elapsed > self.ANCHOR_INTERVAL * 1000000000:
+            self._anchor()
+            return self._anchor_wall
+        return self._anchor_wall + elapsed
+
+    def time_us(self):
+        return self.time_ns() // 1000
+
+    def now(self):
+        return datetime.datetime.now()
+
+
+class SimulatedClock(Clock):
+    """ 模拟时钟，时间只会被事件循环推进，用于快速回放历史事件、压测策略和调度逻辑 """
+
+    simulated = True
+
+    def __init__(self, start=None):
+        """
+        Args:
+            start: 模拟时钟起始时间，datetime.datetime类型，默认从当前时间开始
+        """
+        self._time = dt_to_milliseconds(start) if start else RealClock().time()
+
+    def time(self):
+        return self._time
+
+    def advance_to(self, ts):
+        """ 推进时钟到指定时间戳（毫秒），时钟不会回退 """
+        if ts > self._time:
+            self._time = int(ts)
+
+
+_clock = RealClock()
+
+
+def get_clock():
+    """ 获取当前进程使用的时钟 """
+    return _clock
+
+
+def set_clock(clock):
+    global _clock
+    _clock = clock
+
+
+def setup_clock(mode="real", start=None):
+    """ 根据时钟模式创建并设置当前进程使用的时钟
+
+    Args:
+        mode: "real" 真实时钟，"simulated" 模拟时钟
+        start: 模拟时钟的起始时间
+    """
+    if mode == "real":
+        clock = RealClock()
+    elif mode == "simulated":
+        clock = SimulatedClock(start)
+    else:
+        raise ConfigError(f"不支持的时钟模式：{mode}，只支持'real'、'simulated'")
+    set_clock(clock)
+    return clock
@@ -18,12 +18,49 @@ class SchedulerConfig(object):
         # 支持从历史时间开始生成事件，用于跑测试用例，实盘中请勿开启
         self.ENABLE_HISTORY_START = False
 
+        # 时钟模式，"real": 真实物理时钟；"simulated": 模拟时钟，事件循环不等待，直接跳到下一条消息的时间，
+        # 配合ENABLE_HISTORY_START可以在数秒内回放长时间的定时任务，用于压测策略和调度逻辑，实盘中请勿开启
+        self.CLOCK = "real"
+
+        # 事件循环类型，"pyuv": 基于pyuv的事件循环；"asyncio": 基于asyncio的事件循环，安装了uvloop时自动使用uvloop
+        self.LOOP_BACKEND = "pyuv"
+
+        # 事件队列类型，"heap": 二叉堆（默认）；"timing_wheel": 分层时间轮，入队比二叉堆慢约一倍，
+        # 挂起的定时器达到约50万以上时出队才明显更快，见benchmarks/bench_timing_wheel.py
+        self.QUEUE_BACKEND = "heap"
+
+        # run_daily(..., executor="thread")定时任务所用线程池的最大线程数
+        self.THREAD_POOL_SIZE = 4
+
+        # submit_compute所用进程池的最大进程数，None表示使用CPU核数
+        self.PROCESS_POOL_SIZE = None
+
+        # run_daily(..., precise=True)精确定时任务的定时器提前唤醒的时间，单位：秒，用于抵消定时器触发的误差
+        self.PRECISE_TIMER_MARGIN = 0.005
+
+        # 精确定时任务最后这段时间内不再sleep，而是自旋等待（期间让出GIL），单位：秒
+        self.PRECISE_SPIN_WINDOW = 0.0005
+
+        # background车道的消息只在这段时间内没有critical消息到期时才处理，单位：秒，见scheduler.message.Lane
+        self.BACKGROUND_LANE_HORIZON = 1.0
+
+        # 策略进程启动耗时预算，单位：秒，从启动到首个定时任务就绪的耗时超出预算时记录告警日志
+        self.STARTUP_BUDGET = 1.0
+
+        # 是否开启任务控制通道（jqtrade ctl命令），unix域套接字/windows命名管道，只接受本机连接
+        self.CONTROL_SERVER = True
+
         # 交易时间段设置
         self.MARKET_PERIOD = [
             (datetime.time(9, 30), datetime.time(11, 30)),
             (datetime.time(13, 0), datetime.time(15, 0)),
         ]
 
+        # 交易日历，非交易日不会生成任何定时任务事件（包括账户同步）
+        #   None: 每天都是交易日；"weekdays": 周一到周五是交易日；其他字符串：本地交易日历文件路径，
+        #   文件格式参考 scheduler.trade_calendar.FileTradingCalendar
+        self.TRADING_CALENDAR = None
+
         # 是否加载内置account模块，默认加载
         self.SETUP_ACCOUNT = True
 
@@ -44,7 +81,7 @@ def _load_config(path):
     scheduler_configs = {}
     for _name in configs:
         if _name.startswith("SCHEDULER_"):
-            scheduler_configs[_name.lstrip("SCHEDULER_")] = configs[_name]
+            scheduler_configs[_name[len("SCHEDULER_"):]] = configs[_name]
     return scheduler_configs
 
 
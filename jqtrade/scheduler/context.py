@@ -1,18 +1,50 @@
 # -*- coding: utf-8 -*-
-import datetime
+from contextlib import contextmanager
 
 from ..common.exceptions import InternalError, InvalidCall
 
 
+class _SimpleContextVar(object):
+    """ python3.6没有contextvars，退化为进程级变量：事件循环线程中切换策略没有问题，
+    但多策略模式下线程池任务、协程任务中无法区分所属策略 """
+
+    def __init__(self, name, default=None):
+        self._value = default
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        token, self._value = self._value, value
+        return token
+
+    def reset(self, token):
+        self._value = token
+
+
+try:
+    from contextvars import ContextVar
+except ImportError:     # pragma: no cover
+    ContextVar = _SimpleContextVar
+
+
+# 当前正在执行的策略的上下文，多策略模式下，执行某个策略的回调前切换到该策略的上下文
+_current_context = ContextVar("jqtrade_context", default=None)
+
+
 class Context(object):
     """
     Usage:
         上下文对象，方便各对象之间调用
+
+        多策略模式下，所有策略共享一个根上下文（事件循环、事件总线、调度器、线程池/进程池），每个策略有自己的上下文
+        （策略代码、账户、trade gate），通过activate切换当前生效的上下文，get_instance返回当前生效的上下文
     """
 
     _instance = None
 
-    def __init__(self, task_name, event_bus, loop, scheduler, loader, debug, config, out, start=None, end=None):
+    def __init__(self, task_name, event_bus, loop, scheduler, loader, debug, config, out, start=None, end=None,
+                 parent=None, strategy_name=None):
         self._task_name = task_name
         self._event_bus = event_bus
         self._event_loop = loop
@@ -22,7 +54,7 @@ class Context(object):
         self._config = config
         self._out = out
 
-        self._start = start or datetime.datetime.now()
+        self._start = start or loop.clock.now()
         self._end = end
 
         self._account = None
@@ -32,6 +64,16 @@ class Context(object):
 
         self._use_account = None
 
+        self._executor = None
+        self._compute_executor = None
+
+        # 多策略模式下的根上下文和策略名称
+        self._parent = parent
+        self._strategy_name = strategy_name
+
+        # 创建trade gate的函数，多策略模式下由根上下文提供共享的trade gate，为None时按配置创建
+        self.trade_gate_factory = None
+
         self.__class__._instance = self
 
     @property
@@ -60,9 +102,38 @@ class Context(object):
 
     @classmethod
     def get_instance(cls):
-        if not cls._instance:
+        ctx = _current_context.get() or cls._instance
+        if not ctx:
             raise InternalError("Context not initialized")
-        return cls._instance
+        return ctx
+
+    @classmethod
+    def set_instance(cls, ctx):
+        """ 设置默认上下文，没有通过activate切换上下文时，get_instance返回默认上下文 """
+        cls._instance = ctx
+
+    @contextmanager
+    def activate(self):
+        """ 切换当前生效的上下文，with语句结束后恢复 """
+        token = _current_context.set(self)
+        try:
+            yield self
+        finally:
+            _current_context.reset(token)
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def strategy_name(self):
+        return self._strategy_name
+
+    def event_name(self, name):
+        """ 事件类名，多策略模式下加上策略名前缀，避免不同策略的定时任务共用同一个事件类 """
+        if self._strategy_name:
+            return f"{self._strategy_name}.{name}"
+        return name
 
     @property
     def start(self):
@@ -144,3 +215,34 @@ class Context(object):
     @property
     def out(self):
         return self._out
+
+    @property
+    def executor(self):
+        """ 运行阻塞任务的线程池，第一次使用时创建，多策略共享同一个线程池 """
+        if self._parent is not None:
+            return self._parent.executor
+        if self._executor is None:
+            from .executor import ThreadExecutor
+            from .config import get_config
+            self._executor = ThreadExecutor(self._event_loop, get_config().THREAD_POOL_SIZE)
+        return self._executor
+
+    @property
+    def compute_executor(self):
+        """ 运行CPU密集计算的进程池，第一次使用时创建，多策略共享同一个进程池 """
+        if self._parent is not None:
+            return self._parent.compute_executor
+        if self._compute_executor is None:
+            from .executor import ProcessExecutor
+            from .config import get_config
+            self._compute_executor = ProcessExecutor(self._event_loop, get_config().PROCESS_POOL_SIZE)
+        return self._compute_executor
+
+    def close(self):
+        """ 事件循环退出后，释放上下文持有的资源 """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._compute_executor is not None:
+            self._compute_executor.shutdown()
+            self._compute_executor = None
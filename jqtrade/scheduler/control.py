@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import hmac
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from multiprocessing.connection import Listener, Client
+from urllib.parse import quote
+
+from ..common.exceptions import TaskError
+from ..common.log import sys_logger
+
+from .message import Message, Lane
+
+
+logger = sys_logger.getChild("control")
+
+
+# unix域套接字路径的最大长度（linux为108，macOS为104，保留余量）
+_MAX_UNIX_PATH = 100
+
+
+def get_control_address(registry_dir, task_name):
+    """ 任务控制通道的地址，windows下使用命名管道，其他系统使用unix域套接字
+
+    Returns:
+        (address, family)
+    """
+    if sys.platform == "win32":
+        return r"\\.\pipe\jqtrade_" + quote(task_name, safe=""), "AF_PIPE"
+
+    path = os.path.join(registry_dir, quote(task_name, safe="") + ".sock")
+    if len(path) > _MAX_UNIX_PATH:
+        path = os.path.join(tempfile.gettempdir(), f"jqtrade_{os.getpid()}.sock")
+    return path, "AF_UNIX"
+
+
+class ControlServer(object):
+    """
+    Usage:
+        运行中任务的本地控制通道，运维人员通过 `jqtrade ctl -n <任务名称> <命令>` 查看任务状态、触发同步、停止任务等
+
+        1. 后台线程监听unix域套接字（windows下为命名管道），使用随机authkey做challenge-response认证，地址和authkey
+            写入任务注册信息，注册表目录和文件只有任务所属用户可以读取
+        2. 请求和结果都是json，不使用pickle，连接方无法借控制通道在策略进程中执行代码；等待客户端发送数据有超时，
+            只连接不发送数据的客户端不会阻塞控制通道
+        3. 收到的命令通过push_message转到事件循环线程中执行，和定时任务串行，读取的状态是一致的，执行结果再发回客户端；
+            命令在background车道执行，不会推迟即将到期的critical定时任务。等待超时时，还未开始执行的命令被取消
+
+        支持的命令：
+            status: 任务基本信息、事件循环时间、队列积压、各策略账户概况
+            stats: 各事件类的调度延迟和回调耗时、定时任务超时统计、账户同步耗时
+            sync_now: 立即同步一次资金持仓和订单
+            dump_orders: 各策略当日的订单
+            stop: 停止任务，和stop_task一样处理完当前事务后退出
+    """
+
+    COMMANDS = ("status", "stats", "sync_now", "dump_orders", "stop")
+
+    # 等待事件循环执行命令的超时时间，单位：秒
+    TIMEOUT = 30
+
+    # 等待客户端发送认证结果和命令的超时时间，单位：秒
+    RECV_TIMEOUT = 5
+
+    # 请求的最大字节数
+    MAX_REQUEST_SIZE = 4096
+
+    def __init__(self, ctx, strategies, task_handle, registry_dir):
+        """
+        Args:
+            ctx: 任务的（根）上下文
+            strategies: 任务中运行的策略列表
+            task_handle: 任务注册句柄，用于写入控制通道地址
+            registry_dir: 任务注册表目录
+        """
+        self._ctx = ctx
+        self._strategies = strategies
+        self._task_handle = task_handle
+        self._address, self._family = get_control_address(registry_dir, ctx.task_name)
+        self._authkey = os.urandom(16)
+        self._listener = None
+        self._thread = None
+        self._closed = False
+        self._start_time = time.time()
+
+    @property
+    def address(self):
+        return self._address
+
+    def start(self):
+        if self._family == "AF_UNIX" and os.path.exists(self._address):
+            # 同名任务已经退出，残留的套接字文件
+            os.remove(self._address)
+        # 不使用Listener自带的认证，它在accept中等待客户端应答，没有超时
+        self._listener = Listener(self._address, self._family)
+        if self._family == "AF_UNIX":
+            os.chmod(self._address, 0o600)
+        self._task_handle.update(ctl_address=self._address, ctl_family=self._family, ctl_authkey=self._authkey.hex())
+
+        self._thread = threading.Thread(target=self._serve, name="jqtrade_control", daemon=True)
+        self._thread.start()
+        logger.info(f"任务控制通道已启动，address={self._address}")
+
+    def close(self):
+        if self._closed or self._listener is None:
+            return
+        self._closed = True
+        logger.info("关闭任务控制通道")
+        # 后台线程是daemon线程，可能仍阻塞在accept，不等待其退出
+        self._listener.close()
+
+    def _serve(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if not self._closed:
+                    logger.error(f"任务控制通道接受连接失败，error={e}")
+                continue
+
+            try:
+                with conn:
+                    if self._closed:
+                        return
+                    challenge = os.urandom(16)
+                    _send_json(conn, {"challenge": challenge.hex()})
+                    request = _recv_json(conn, self.RECV_TIMEOUT, self.MAX_REQUEST_SIZE)
+                    if not hmac.compare_digest(str(request.get("digest")), _digest(self._authkey, challenge)):
+                        logger.warning("控制通道连接认证失败")
+                        _send_json(conn, {"ok": False, "error": "认证失败"})
+                        continue
+                    _send_json(conn, self._handle_request(request))
+            except Exception as e:
+                logger.error(f"处理控制命令失败，error={e}")
+
+    def _handle_request(self, request):
+        command = request.get("command")
+        if command not in self.COMMANDS:
+            return {"ok": False, "error": f"不支持的命令：{command}，支持的命令：{self.COMMANDS}"}
+
+        logger.info(f"收到控制命令：{command}")
+        done = threading.Event()
+        reply = {}
+        # 等待超时后还未开始执行的命令不再执行，避免返回失败的stop、sync_now等命令之后又被执行
+        state = {"started": False, "cancelled": False}
+        lock = threading.Lock()
+
+        def _run():
+            with lock:
+                if state["cancelled"]:
+                    logger.warning(f"控制命令等待超时已取消，不再执行：{command}")
+                    return
+                state["started"] = True
+            try:
+                reply["result"] = getattr(self, f"_cmd_{command}")()
+                reply["ok"] = True
+            except Exception as e:
+                logger.exception(f"执行控制命令失败，command={command}, error={e}")
+                reply.update(ok=False, error=str(e))
+            finally:
+                done.set()
+
+        loop = self._ctx.loop
+        loop.push_message(Message(loop.get_current_time(), _run, label="ControlCommand", lane=Lane.BACKGROUND))
+        if not done.wait(self.TIMEOUT):
+            with lock:
+                if not state["started"]:
+                    state["cancelled"] = True
+                    return {"ok": False, "error": f"事件循环{self.TIMEOUT}秒内未执行命令，可能正在执行耗时的定时任务，"
+                                                  f"命令已取消"}
+            return {"ok": False, "error": f"命令{self.TIMEOUT}秒内未执行完成，命令会继续执行，请稍后确认结果"}
+        return reply
+
+    def _accounts(self):
+        """ 加载了账户模块的策略，(策略名称, 策略上下文, 账户) """
+        for _strategy in self._strategies:
+            _ctx = _strategy.context
+            if _ctx.use_account and _ctx.account is not None:
+                yield _strategy.name or self._ctx.task_name, _ctx, _ctx.account
+
+    def _cmd_status(self):
+        loop = self._ctx.loop
+        return {
+            "name": self._ctx.task_name,
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self._start_time, 3),
+            "current_dt": self._ctx.current_dt,
+            "strategy_dt": loop.strategy_dt,
+            "queue_size": loop.queue_size,
+            "pending_jobs": loop.pending_jobs,
+            "strategies": [_strategy.name or self._ctx.task_name for _strategy in self._strategies],
+            "accounts": {_name: self._account_summary(_account.snapshot) for _name, _, _account in self._accounts()},
+        }
+
+    @staticmethod
+    def _account_summary(snapshot):
+        total_assert, available_cash, locked_cash = snapshot.balance
+        return {"total_assert": total_assert,
+                "available_cash": available_cash,
+                "locked_cash": locked_cash,
+                "positions": len(snapshot.long_positions) + len(snapshot.short_positions),
+                "orders": len(snapshot.orders)}
+
+    def _cmd_stats(self):
+        return {
+            "unit": "ms",
+            "queue_size": self._ctx.loop.queue_size,
+            "loop": self._ctx.loop.stats.snapshot(),
+            "lanes": self._ctx.loop.stats.lane_snapshot(),
+            "lane_queue_size": self._ctx.loop.lane_sizes,
+            "overruns": self._ctx.loop.stats.overrun_snapshot(),
+            "sync": {_name: _account.sync_stats() for _name, _, _account in self._accounts()},
+        }
+
+    def _cmd_sync_now(self):
+        synced = []
+        for _name, _ctx, _account in self._accounts():
+            with _ctx.activate():
+                _account.sync_balance()
+                _account.sync_orders()
+            synced.append(_name)
+        if not synced:
+            raise TaskError("任务没有加载账户模块，无法同步")
+        return {"synced": synced}
+
+    def _cmd_dump_orders(self):
+        return {_name: [_order.json() for _order in _account.orders.values()]
+                for _name, _, _account in self._accounts()}
+
+    def _cmd_stop(self):
+        self._ctx.loop.stop()
+        return {"stopping": True}
+
+
+def _digest(authkey, challenge):
+    return hmac.new(authkey, challenge, hashlib.sha256).hexdigest()
+
+
+def _send_json(conn, data):
+    conn.send_bytes(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def _recv_json(conn, timeout, maxlength=None):
+    """ 等待timeout秒接收一个json消息，超时抛出TaskError """
+    if not conn.poll(timeout):
+        raise TaskError(f"{timeout}秒内未收到数据")
+    return json.loads(conn.recv_bytes(maxlength).decode("utf-8"))
+
+
+def send_command(task_info, command, timeout=None):
+    """ 向运行中的任务发送控制命令
+
+    Args:
+        task_info: 任务注册信息，见TaskRegistry.get_task
+        command: 命令名称，见ControlServer.COMMANDS
+        timeout: 等待结果的超时时间，单位：秒，默认比服务端的超时时间略长
+
+    Returns:
+        命令执行结果，json格式，datetime等类型转换为字符串
+    """
+    if not task_info.get("ctl_address"):
+        raise TaskError(f"任务{task_info.get('name')}未开启控制通道")
+
+    conn = Client(task_info["ctl_address"], task_info["ctl_family"])
+    with conn:
+        challenge = bytes.fromhex(_recv_json(conn, ControlServer.RECV_TIMEOUT)["challenge"])
+        _send_json(conn, {"command": command, "digest": _digest(bytes.fromhex(task_info["ctl_authkey"]), challenge)})
+        try:
+            reply = _recv_json(conn, timeout or ControlServer.TIMEOUT + 5)
+        except TaskError:
+            raise TaskError(f"等待任务{task_info.get('name')}执行命令{command}超时")
+
+    if not reply.get("ok"):
+        raise TaskError(reply.get("error"))
+    return reply["result"]
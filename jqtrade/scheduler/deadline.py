@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import time
+from contextlib import contextmanager
+
+from ..common.exceptions import DeadlineExceeded
+
+from .context import ContextVar
+
+
+# 当前正在执行的定时任务的截止时间，线程池任务、协程任务中各自独立
+_current_deadline = ContextVar("jqtrade_deadline", default=None)
+
+
+class CallbackDeadline(object):
+    """
+    Usage:
+        定时任务单次执行的截止时间，从定时任务的计划触发时间开始计算，包含开始执行前已经落后的时间
+
+        超时不会强制中断回调：回调中通过check_deadline、deadline_remaining检查，超时后由回调自行结束（协作式取消），
+        回调结束后根据实际耗时记录超时告警和统计
+    """
+
+    def __init__(self, name, label, deadline, lag=0.0, scheduled=None):
+        """
+        Args:
+            name: 定时任务函数名
+            label: 定时任务的事件类名，用于统计
+            deadline: 允许的最长执行时间，单位：秒
+            lag: 开始执行时已经落后计划触发时间的秒数
+            scheduled: 计划触发时间，datetime.datetime，用于日志
+        """
+        self.name = name
+        self.label = label
+        self.deadline = deadline
+        self.scheduled = scheduled
+        self._start = time.perf_counter() - max(lag, 0.0)
+        self._end = None
+
+    @property
+    def elapsed(self):
+        """ 从计划触发时间到回调结束（未结束时到当前）的秒数 """
+        end = self._end if self._end is not None else time.perf_counter()
+        return end - self._start
+
+    @property
+    def overrun(self):
+        """ 超出截止时间的秒数，未超时为0 """
+        return max(self.elapsed - self.deadline, 0.0)
+
+    def remaining(self):
+        return self.deadline - self.elapsed
+
+    def exceeded(self):
+        return self.remaining() <= 0
+
+    def finish(self):
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    @contextmanager
+    def activate(self):
+        """ 在with语句块中作为当前定时任务的截止时间 """
+        token = _current_deadline.set(self)
+        try:
+            yield self
+        finally:
+            _current_deadline.reset(token)
+
+
+def current_deadline():
+    """ 当前正在执行的定时任务的截止时间，没有设置deadline时返回None """
+    return _current_deadline.get()
+
+
+def deadline_remaining():
+    """ 当前定时任务距离截止时间的剩余秒数，超时后为负数，定时任务没有设置deadline时返回None """
+    deadline = current_deadline()
+    if deadline is None:
+        return None
+    return deadline.remaining()
+
+
+def check_deadline():
+    """ 协作式取消点：当前定时任务已超过截止时间时抛出DeadlineExceeded，定时任务没有设置deadline时不做任何事
+
+    DeadlineExceeded由框架捕获，只记录日志，不会导致策略进程退出
+    """
+    deadline = current_deadline()
+    if deadline is not None and deadline.exceeded():
+        raise DeadlineExceeded(f"定时任务{deadline.name}超过截止时间{deadline.deadline}秒，"
+                               f"已执行{deadline.elapsed:.3f}秒")
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+from ..common.exceptions import InvalidParam, InternalError
+
+from .message import Lane
 
 
 class EventPriority:
@@ -7,6 +10,21 @@ class EventPriority:
     ACCOUNT_SYNC = 2
 
 
+class CoalescePolicy:
+    """ 事件循环落后（比如某个回调执行太久）导致同一类事件积压时的处理策略 """
+
+    # 积压的事件逐个补执行
+    ALWAYS = "always"
+
+    # 积压的事件只执行最新的一个
+    LATEST = "latest"
+
+    # 超过触发时间max_delay秒的事件直接跳过
+    SKIP_OVERDUE = "skip_overdue"
+
+    ALL = (ALWAYS, LATEST, SKIP_OVERDUE)
+
+
 class Event(object):
     """
     Usage:
@@ -16,6 +34,18 @@ class Event(object):
     # 时间优先级，值越大优先级越高
     priority = EventPriority.DEFAULT
 
+    # 积压时的处理策略，见CoalescePolicy
+    coalesce = CoalescePolicy.ALWAYS
+
+    # coalesce为SKIP_OVERDUE时，事件最多允许延迟多少秒执行
+    max_delay = None
+
+    # 是否精确定时，见Message.precise
+    precise = False
+
+    # 事件消息所在的车道，见Lane
+    lane = Lane.NORMAL
+
     def __repr__(self):
         return f'{self.__class__.__name__}(priority={self.priority})'
 
@@ -23,7 +53,33 @@ class Event(object):
 _event_classes = {}
 
 
-def create_event_class(name, priority=EventPriority.DEFAULT):
-    if name not in _event_classes:
-        _event_classes[name] = type(name, (Event, ), {"priority": priority})
-    return _event_classes[name]
+def check_coalesce(coalesce, max_delay):
+    if coalesce not in CoalescePolicy.ALL:
+        raise InvalidParam(f"coalesce参数错误，只支持{CoalescePolicy.ALL}: {coalesce}")
+    if coalesce == CoalescePolicy.SKIP_OVERDUE and (max_delay is None or max_delay < 0):
+        raise InvalidParam(f"coalesce为{coalesce}时需要设置max_delay，且max_delay不能小于0: {max_delay}")
+
+
+def check_lane(lane):
+    if lane not in Lane.ALL:
+        raise InvalidParam(f"lane参数错误，只支持{Lane.ALL}: {lane}")
+
+
+def create_event_class(name, priority=EventPriority.DEFAULT, coalesce=CoalescePolicy.ALWAYS, max_delay=None,
+                       precise=False, lane=Lane.NORMAL):
+    check_coalesce(coalesce, max_delay)
+    check_lane(lane)
+
+    options = {"priority": priority, "coalesce": coalesce, "max_delay": max_delay, "precise": bool(precise),
+               "lane": lane}
+    event_cls = _event_classes.get(name)
+    if event_cls is None:
+        event_cls = _event_classes[name] = type(name, (Event, ), options)
+        return event_cls
+
+    # 同名事件类只创建一次，选项不同时不能直接返回已有的事件类，否则新的选项被静默忽略
+    cached = {_key: getattr(event_cls, _key) for _key in options}
+    if cached != options:
+        raise InternalError(f"事件类{name}已经存在，且选项不同，"
+                            f"已有选项：{cached}，新选项：{options}")
+    return event_cls
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 import re
+import heapq
+import bisect
 import datetime
 
 from ..common.exceptions import InvalidParam
@@ -7,44 +9,268 @@ from ..common.log import sys_logger
 from ..common.utils import dt_to_milliseconds, parse_time
 
 from .message import Message
+from .event import CoalescePolicy
 from .context import Context
+from .clock import get_clock
+from .trade_calendar import get_calendar
 from .config import get_config
 
 
 config = get_config()
 
 
+_MIDNIGHT = datetime.time()
+_ONE_DAY = datetime.timedelta(days=1)
+
+# 每周、每月、cron定时任务向后查找触发日的最大天数，超出时视为不再触发，避免表达式永远无法匹配时死循环
+_MAX_SEARCH_DAYS = 366 * 8
+
+
 logger = sys_logger.getChild("event_source")
 
 
+class _Entry(object):
+    """ 事件源中的定时任务条目，负责计算自身的下一次触发时间 """
+
+    def __init__(self, event_cls):
+        self.event_cls = event_cls
+
+    def next_fire(self, es, dt):
+        """ 返回 >=dt 的下一次触发时间，没有下一次触发时返回None
+
+        Args:
+            es: 条目所属的EventSource
+            dt: datetime.datetime
+        """
+        raise NotImplementedError
+
+
+class _DailyEntry(_Entry):
+    """ 每日定时任务，time_expr支持 'HH:MM:SS' 以及 'open+30m' 这类表达式
+
+    注册时将时间表达式编译为相对当天0点的偏移，每天生成事件时只需要做一次日期与偏移的加法
+    """
+
+    def __init__(self, event_cls, time_expr, market_period=None):
+        super(_DailyEntry, self).__init__(event_cls)
+        self.time_expr = time_expr
+        self.offset = TimeExprParser.compile(time_expr, market_period)
+
+    def get_dt(self, day):
+        return datetime.datetime.combine(day, _MIDNIGHT) + self.offset
+
+    def next_fire(self, es, dt):
+        # get_dt(day) >= dt  <=>  day >= (dt - offset)，直接定位到第一个可能触发的日期
+        day = (dt - self.offset).date()
+        if self.get_dt(day) < dt:
+            day += _ONE_DAY
+        day = es.next_valid_day(day)
+        if day is not None:
+            return self.get_dt(day)
+
+
+class _IntervalEntry(_Entry):
+    """ 固定间隔定时任务，下一次触发时间直接计算得到 """
+
+    def __init__(self, event_cls, step, periods=None, anchor=None):
+        super(_IntervalEntry, self).__init__(event_cls)
+        if not isinstance(step, datetime.timedelta):
+            step = datetime.timedelta(seconds=float(step))
+        if step <= datetime.timedelta():
+            raise InvalidParam(f"间隔时间必须大于0：{step}")
+        self.step = step
+        self.periods = periods
+        self.anchor = anchor
+
+    def _ceil(self, base, dt):
+        """ 返回 base + k * step (k >= 0) 中 >= dt 的最小值 """
+        if dt <= base:
+            return base
+        k = -(-(dt - base) // self.step)
+        return base + k * self.step
+
+    def next_fire(self, es, dt):
+        if not self.periods:
+            # 未指定时间段时，从anchor（默认为事件源的start）开始，每隔step触发一次，anchor本身不触发，非交易日不触发
+            base = (self.anchor or es.start) + self.step
+            _dt = self._ceil(base, dt)
+            while True:
+                day = es.next_valid_day(_dt.date())
+                if day is None:
+                    return
+                if day == _dt.date():
+                    return _dt
+                _dt = self._ceil(base, datetime.datetime.combine(day, _MIDNIGHT))
+
+        day = es.next_valid_day(dt.date())
+        while day is not None:
+            for _start, _end in self.periods:
+                _end_dt = datetime.datetime.combine(day, _end)
+                if dt > _end_dt:
+                    continue
+                _dt = self._ceil(datetime.datetime.combine(day, _start), dt)
+                if _dt <= _end_dt:
+                    return _dt
+            day = es.next_valid_day(day + _ONE_DAY)
+
+
+class _PeriodEntry(_DailyEntry):
+    """ 每周、每月第nth个交易日触发的定时任务，nth为负数时表示倒数第nth个交易日
+
+    一个周期最多31天，直接取出周期内的交易日按下标定位触发日，不需要逐日判断是否触发；
+    周期内的交易日不足nth个时，force为True则在最后一个（nth为负数时是第一个）交易日触发，否则该周期不触发
+    """
+
+    # nth的最大绝对值
+    MAX_NTH = None
+
+    def __init__(self, event_cls, nth, time_expr, force=True, market_period=None):
+        super(_PeriodEntry, self).__init__(event_cls, time_expr, market_period)
+        if not isinstance(nth, int) or isinstance(nth, bool) or nth == 0 or abs(nth) > self.MAX_NTH:
+            raise InvalidParam(f"{self.__class__.__name__}的交易日序号错误，需要是[-{self.MAX_NTH}, {self.MAX_NTH}]"
+                               f"之间的非0整数：{nth}")
+        self.nth = nth
+        self.force = force
+
+    def period(self, day):
+        """ 返回day所在周期的 (第一天, 最后一天) """
+        raise NotImplementedError
+
+    def pick(self, days):
+        """ 从周期内的交易日中选出触发日，没有时返回None """
+        if not days:
+            return
+        idx = self.nth - 1 if self.nth > 0 else self.nth
+        if -len(days) <= idx < len(days):
+            return days[idx]
+        if self.force:
+            return days[-1] if self.nth > 0 else days[0]
+
+    def next_fire(self, es, dt):
+        day = (dt - self.offset).date()
+        if self.get_dt(day) < dt:
+            day += _ONE_DAY
+
+        limit = day + datetime.timedelta(days=_MAX_SEARCH_DAYS)
+        while day <= limit:
+            if es.next_valid_day(day) is None:
+                return
+            first, last = self.period(day)
+            target = self.pick(es.trading_days(first, last))
+            if target is not None and target >= day:
+                # 触发日超出事件源的生成范围时，之后的周期也不会触发
+                return self.get_dt(target) if es.next_valid_day(target) == target else None
+            day = last + _ONE_DAY
+        logger.warning(f"{_MAX_SEARCH_DAYS}天内没有找到定时任务{self.event_cls.__name__}的触发日，"
+                       f"nth={self.nth}, force={self.force}")
+
+
+class _WeeklyEntry(_PeriodEntry):
+    """ 每周第nth个交易日触发的定时任务 """
+
+    MAX_NTH = 7
+
+    def period(self, day):
+        first = day - datetime.timedelta(days=day.weekday())
+        return first, first + datetime.timedelta(days=6)
+
+
+class _MonthlyEntry(_PeriodEntry):
+    """ 每月第nth个交易日触发的定时任务 """
+
+    MAX_NTH = 31
+
+    def period(self, day):
+        first = day.replace(day=1)
+        return first, (first + datetime.timedelta(days=32)).replace(day=1) - _ONE_DAY
+
+
+class _CronEntry(_Entry):
+    """ cron表达式定时任务，'分 时 日 月 周'，只在交易日触发
+
+    注册时把各字段展开为有序集合，当天的触发时刻通过二分查找定位，不匹配的月份整月跳过，不需要逐分钟试探
+    """
+
+    def __init__(self, event_cls, expr):
+        super(_CronEntry, self).__init__(event_cls)
+        self.expr = expr
+        minutes, hours, self.days, self.months, self.weekdays, self.day_or_weekday = CronExprParser.parse(expr)
+        # 当天所有触发时刻相对0点的偏移，hours、minutes有序，组合后仍然有序
+        self.offsets = [datetime.timedelta(hours=_h, minutes=_m) for _h in hours for _m in minutes]
+
+    def match_day(self, day):
+        day_matched = day.day in self.days
+        weekday_matched = day.isoweekday() % 7 in self.weekdays
+        if self.day_or_weekday:
+            return day_matched or weekday_matched
+        return day_matched and weekday_matched
+
+    def next_fire(self, es, dt):
+        start_day = dt.date()
+        start_idx = bisect.bisect_left(self.offsets, dt - datetime.datetime.combine(start_day, _MIDNIGHT))
+
+        day = start_day
+        limit = start_day + datetime.timedelta(days=_MAX_SEARCH_DAYS)
+        while day <= limit:
+            if day.month not in self.months:
+                # 跳到下个月1日
+                day = (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+                continue
+            valid_day = es.next_valid_day(day)
+            if valid_day is None:
+                return
+            if valid_day != day:
+                day = valid_day
+                continue
+
+            idx = start_idx if day == start_day else 0
+            if idx < len(self.offsets) and self.match_day(day):
+                return datetime.datetime.combine(day, _MIDNIGHT) + self.offsets[idx]
+            day += _ONE_DAY
+        logger.warning(f"{_MAX_SEARCH_DAYS}天内没有找到定时任务{self.event_cls.__name__}的触发日，expr={self.expr}")
+
+
 class EventSource(object):
     """
     Usage:
         事件源类，用于根据用户设置的定时任务生成对应事件
+
+        事件按需惰性生成：每个定时任务在堆中只保留下一次触发的事件，取出后再计算该任务的下一次触发时间，
+        每次取事件的复杂度为O(log n)，n为定时任务数量，内存占用与生成天数无关
     """
 
-    def __init__(self, start=None, end=None):
+    # 计算下一次触发时间时，跳过当前触发时间
+    _RESOLUTION = datetime.timedelta(microseconds=1)
+
+    def __init__(self, start=None, end=None, clock=None, calendar=None):
         """
         Args:
             start: 生成事件的起始时间，默认从当前时间点开始
             end: 生成事件的结束时间，不会生成 '时间>end' 的事件
+            clock: 获取当前时间使用的时钟，默认使用进程当前时钟
+            calendar: 交易日历，非交易日不生成事件，默认使用进程当前交易日历
         """
-        self._daily = []
+        self._clock = clock or get_clock()
+        self._calendar = calendar or get_calendar()
+
+        self._entries = []
+
+        # 小顶堆，元素为 (触发时间, 定时任务下标, 事件对象)，每个定时任务最多只有一个元素
         self._events = []
-        self._days = []
 
         self._start = start
         self._end = end
 
+        # 生成事件的最后一天，None表示不限制
+        self._last_day = None
+
         self._need_regenerate_events = True
 
         self._event_changed_callback = []
 
-        self._has_gen_his_days = False
-
     def setup(self):
         if self._start is None or not config.ENABLE_HISTORY_START:
-            self._start = datetime.datetime.now()
+            self._start = self._clock.now()
 
         logger.debug(f"setup event_source，start: {self._start}, end: {self._end}")
 
@@ -54,36 +280,115 @@ class EventSource(object):
         if not self._need_regenerate_events:
             return
 
+        self._last_day = self._get_last_day()
         self._events = []
-        self._has_gen_his_days = False
-        self._days = self._get_days()
+        for _idx in range(len(self._entries)):
+            self._push_event(_idx, self._start)
         self._need_regenerate_events = False
 
-    def _get_days(self, count=config.EVENT_DAYS_COUNT):
-        days = []
+    def _get_last_day(self, count=config.EVENT_DAYS_COUNT):
+        if self._end:
+            return self._end.date()
 
-        if config.ENABLE_HISTORY_START or self._end:
-            # 历史模式下，日期只有效生成一次
-            if self._has_gen_his_days:
-                return []
-            start = self._start.date()
-            end = self._end.date() if self._end else None
-            count = (end - start).days + 1 if end else count
-        else:
-            start = datetime.date.today()
+        if config.ENABLE_HISTORY_START:
+            # 历史模式下，只生成从start开始count天的事件
+            return self._start.date() + datetime.timedelta(days=count - 1)
 
-        for _delta in range(count):
-            days.append(start + datetime.timedelta(days=_delta))
+        return None
 
-        self._has_gen_his_days = True
+    def next_valid_day(self, day):
+        """ 返回 >=day 的第一个可以生成事件的交易日，没有时返回None """
+        day = self._calendar.next_trading_day(day)
+        if day is None or (self._last_day is not None and day > self._last_day):
+            return
+        return day
 
+    def trading_days(self, first, last):
+        """ 返回 [first, last] 之间的所有交易日，不受事件源生成范围的限制 """
+        days = []
+        day = self._calendar.next_trading_day(first)
+        while day is not None and day <= last:
+            days.append(day)
+            day = self._calendar.next_trading_day(day + _ONE_DAY)
         return days
 
-    def daily(self, event_cls, time_expr):
-        logger.debug(f"add daily task. event_cls: {event_cls}, time_expr: {time_expr}")
-        self._daily.append((time_expr, event_cls))
+    def _push_event(self, idx, dt):
+        """ 计算第idx个定时任务 >=dt 的下一次触发时间，并放入堆中 """
+        entry = self._entries[idx]
+        next_dt = entry.next_fire(self, dt)
+        if next_dt is None:
+            return
+
+        if self._end and next_dt > self._end:
+            return
+
+        heapq.heappush(self._events, (next_dt, idx, entry.event_cls()))
+
+    def _add_entry(self, entry):
+        self._entries.append(entry)
         self.on_events_changed()
 
+    def daily(self, event_cls, time_expr, market_period=None):
+        """ 添加每日定时任务
+
+        Args:
+            event_cls: 事件类
+            time_expr: 'HH:MM:SS' 或 'open+30m' 这类表达式，注册时即完成解析，表达式错误时抛出InvalidParam
+            market_period: 解析open、close使用的交易时间段，默认使用策略的market_period选项
+        """
+        logger.debug(f"add daily task. event_cls: {event_cls}, time_expr: {time_expr}")
+        self._add_entry(_DailyEntry(event_cls, time_expr, market_period))
+
+    def weekly(self, event_cls, weekday, time_expr, force=True, market_period=None):
+        """ 添加每周定时任务
+
+        Args:
+            event_cls: 事件类
+            weekday: 每周的第几个交易日，1表示第一个交易日，-1表示最后一个交易日
+            time_expr: 触发时间，参考daily
+            force: 当周交易日不足weekday个时，是否在最后一个（weekday为负数时是第一个）交易日触发
+            market_period: 解析open、close使用的交易时间段，默认使用策略的market_period选项
+        """
+        logger.debug(f"add weekly task. event_cls: {event_cls}, weekday: {weekday}, time_expr: {time_expr}")
+        self._add_entry(_WeeklyEntry(event_cls, weekday, time_expr, force, market_period))
+
+    def monthly(self, event_cls, monthday, time_expr, force=True, market_period=None):
+        """ 添加每月定时任务
+
+        Args:
+            event_cls: 事件类
+            monthday: 每月的第几个交易日，1表示第一个交易日，-1表示最后一个交易日
+            time_expr: 触发时间，参考daily
+            force: 当月交易日不足monthday个时，是否在最后一个（monthday为负数时是第一个）交易日触发
+            market_period: 解析open、close使用的交易时间段，默认使用策略的market_period选项
+        """
+        logger.debug(f"add monthly task. event_cls: {event_cls}, monthday: {monthday}, time_expr: {time_expr}")
+        self._add_entry(_MonthlyEntry(event_cls, monthday, time_expr, force, market_period))
+
+    def cron(self, event_cls, expr):
+        """ 添加cron表达式定时任务，只在交易日触发
+
+        Args:
+            event_cls: 事件类
+            expr: '分 时 日 月 周' 格式的cron表达式，参考CronExprParser，注册时即完成解析，表达式错误时抛出InvalidParam
+        """
+        logger.debug(f"add cron task. event_cls: {event_cls}, expr: {expr}")
+        self._add_entry(_CronEntry(event_cls, expr))
+
+    def interval(self, event_cls, step, periods=None, anchor=None):
+        """ 添加固定间隔触发的定时任务
+
+        Args:
+            event_cls: 事件类
+            step: 间隔时间，单位：秒，也可以是datetime.timedelta
+            periods: 触发的时间段，list of tuple，元素为(datetime.time, datetime.time)，每天只在时间段内（包含两端）
+                从时间段开始时间起每隔step触发一次。不设置时，从anchor开始每隔step触发一次
+            anchor: 不设置periods时触发时间的起点，datetime.datetime，默认为事件源的start（实盘中为setup时的当前时间）。
+                多个事件源使用相同的anchor时，不论何时setup，触发时间都对齐
+        """
+        logger.debug(f"add interval task. event_cls: {event_cls}, step: {step}, periods: {periods}, anchor: {anchor}")
+        self._add_entry(_IntervalEntry(event_cls, step, periods, anchor))
+
     def on_events_changed(self):
         self._need_regenerate_events = True
 
@@ -99,9 +404,10 @@ class EventSource(object):
             logger.debug("peek_next_event. events empty")
             return
 
-        evt_dt = self._events[0]
-        logger.debug(f"peek_next_event. event: {evt_dt[1]} dt: {evt_dt[0]}")
-        return evt_dt
+        dt, _, evt = self._events[0]
+        # 热点路径，使用logging的惰性格式化，避免关闭debug日志时仍然拼接字符串
+        logger.debug("peek_next_event. event: %s dt: %s", evt, dt)
+        return dt, evt
 
     def get_next_event(self):
         self.gen_events()
@@ -109,74 +415,41 @@ class EventSource(object):
             logger.debug("get_next_event. events empty")
             return
 
-        evt_dt = self._events.pop(0)
-        logger.debug(f"get_next_event. event: {evt_dt[1]}m dt: {evt_dt[0]}")
-        return evt_dt
+        dt, idx, evt = heapq.heappop(self._events)
+        self._push_event(idx, dt + self._RESOLUTION)
+        logger.debug("get_next_event. event: %s dt: %s", evt, dt)
+        return dt, evt
 
     def gen_events(self):
-        self._reset_events_if_needed()
-        if len(self._events):
-            return
-
-        while len(self._events) == 0:
-            if len(self._days) == 0:
-                self._days = self._get_days()
-
-            if not self._days:
-                break
-
-            day = self._days.pop(0)
-            self.add_daily_events(day)
-
-        self._events.sort(key=lambda e: e[0])
+        if self._need_regenerate_events:
+            self._reset_events_if_needed()
 
-    def add_daily_events(self, day):
-        for _time_expr, _event_cls in self._daily:
-            self.add_event(day, _time_expr, _event_cls)
+    @property
+    def start(self):
+        return self._start
 
-    def add_event(self, day, time_expr, event_cls):
-        if ':' in time_expr:
-            time_info = time_expr.split(':')
-            hour, minute = time_info[:2]
-            try:
-                second = time_info[2]
-            except IndexError:
-                second = 0
-
-            hour = int(hour)
-            minute = int(minute)
-            second = int(second)
-            dt = datetime.datetime.combine(day, datetime.time(hour, minute, second))
-        else:
-            dt = self.expr_to_time(day, time_expr)
-
-        if dt < self._start:
-            return
-
-        if self._end and dt > self._end:
-            return
-
-        self._events.append((dt, event_cls()))
-
-    @staticmethod
-    def expr_to_time(day, time_expr):
-        ctx = Context.get_instance()
-        market_period = ctx.strategy.options.get("market_period", config.MARKET_PERIOD)
-        open_time = parse_time(market_period[0][0])
-        close_time = parse_time(market_period[-1][-1])
 
-        bases = {
-            'open': datetime.datetime.combine(day, open_time),
-            'close': datetime.datetime.combine(day, close_time),
-        }
-        base, op, offset = TimeExprParser.parse(time_expr)
+class IntervalEventSource(EventSource):
+    """
+    Usage:
+        固定间隔事件源，下一次触发时间通过计算得到，启动耗时和内存占用不随间隔缩短而增长。
+        用于账户定时同步、"every_minute"、"every_5s"这类高频定时任务
+    """
 
-        dt = bases[base]
-        if op == '+':
-            dt += offset
-        else:
-            dt -= offset
-        return dt
+    def __init__(self, event_cls, step, periods=None, start=None, end=None, clock=None, calendar=None, anchor=None):
+        """
+        Args:
+            event_cls: 事件类
+            step: 间隔时间，单位：秒，也可以是datetime.timedelta
+            periods: 触发的时间段，参考EventSource.interval
+            start: 生成事件的起始时间，默认从当前时间点开始
+            end: 生成事件的结束时间，不会生成 '时间>end' 的事件
+            clock: 获取当前时间使用的时钟，默认使用进程当前时钟
+            calendar: 交易日历，非交易日不生成事件，默认使用进程当前交易日历
+            anchor: 不设置periods时触发时间的起点，参考EventSource.interval
+        """
+        super(IntervalEventSource, self).__init__(start=start, end=end, clock=clock, calendar=calendar)
+        self.interval(event_cls, step, periods, anchor)
 
 
 class EventSourceScheduler(object):
@@ -211,8 +484,11 @@ class EventSourceScheduler(object):
             if not dt_evt:
                 logger.debug("event not found")
                 return
-            dt, evt = dt_evt
-            ctx.event_bus.emit(evt)
+            if dt_evt[1].coalesce != CoalescePolicy.ALWAYS:
+                dt_evt = self._coalesce(event_source, dt_evt, ctx.loop.get_current_time())
+            if dt_evt:
+                dt, evt = dt_evt
+                ctx.event_bus.emit(evt)
             push_next_msg()
 
         def push_next_msg():
@@ -223,7 +499,10 @@ class EventSourceScheduler(object):
             ctx.loop.push_message(Message(
                 time=dt_to_milliseconds(dt),
                 callback=callback,
-                priority=evt.priority))
+                priority=evt.priority,
+                label=evt.__class__.__name__,
+                precise=evt.precise,
+                lane=evt.lane))
 
         event_source.register_event_changed(reschedule)
         push_next_msg()
@@ -233,12 +512,64 @@ class EventSourceScheduler(object):
         logger.debug(f"unschedule es. schedule_id: {schedule_id}")
         self._event_sources.pop(schedule_id, None)
 
+    @staticmethod
+    def _coalesce(event_source, dt_evt, now):
+        """ 按事件类的coalesce策略处理积压的事件，返回需要执行的事件，返回None时跳过
+
+        Args:
+            event_source: 事件所属的事件源
+            dt_evt: 当前到期的事件，(dt, evt)
+            now: 事件循环当前时间，单位：毫秒
+        """
+        dt, evt = dt_evt
+        if evt.coalesce == CoalescePolicy.LATEST:
+            # 同一类事件已经有更新的到期了，丢弃旧的，只执行最新的一个
+            skipped = 0
+            while True:
+                next_dt_evt = event_source.peek_next_event()
+                if not next_dt_evt or next_dt_evt[1].__class__ is not evt.__class__ \
+                        or dt_to_milliseconds(next_dt_evt[0]) > now:
+                    break
+                dt, evt = event_source.get_next_event()
+                skipped += 1
+            if skipped:
+                logger.info(f"事件积压，合并{skipped + 1}个{evt.__class__.__name__}事件，只执行{dt}的事件")
+            return dt, evt
+
+        if evt.coalesce == CoalescePolicy.SKIP_OVERDUE:
+            delay = now - dt_to_milliseconds(dt)
+            if delay > evt.max_delay * 1000:
+                logger.warning(f"{evt.__class__.__name__}事件已延迟{delay / 1000:.3f}秒，超过max_delay={evt.max_delay}秒，"
+                               f"跳过{dt}的事件")
+                return
+        return dt, evt
+
 
 class TimeExprParser(object):
     """ 解析run_daily中的time字段 """
 
     ALLOWED_BASE = ('open', 'close')
 
+    # 交易时间段内固定间隔触发的表达式，'every_minute' 等价于 'every_1m'
+    _INTERVAL_UNITS = {'s': 1, 'm': 60}
+
+    @classmethod
+    def parse_interval(cls, expr):
+        """ 解析 'every_5s'、'every_5m'、'every_minute' 这类固定间隔表达式
+
+        Return:
+            间隔秒数，expr不是固定间隔表达式时返回None
+        """
+        if expr == "every_minute":
+            return 60
+        m = re.match(r'^every_([0-9]+)([sm])$', expr) if isinstance(expr, str) else None
+        if m is None:
+            return None
+        step = int(m.group(1)) * cls._INTERVAL_UNITS[m.group(2)]
+        if step <= 0:
+            raise InvalidParam(f'invalid time expr {expr}: 间隔必须大于0')
+        return step
+
     @staticmethod
     def _parse_offset(offset):
         m = re.match(r'^(([0-9]{1,2}[hms]){1,3})$', offset)
@@ -248,6 +579,23 @@ class TimeExprParser(object):
         ret = dict((v, int(k)) for k, v in ret)
         return datetime.timedelta(hours=ret.get('h', 0), minutes=ret.get('m', 0), seconds=ret.get('s', 0))
 
+    @classmethod
+    def parse_duration(cls, expr):
+        """ 解析时长，数字表示秒数，字符串支持 '50s'、'1m30s' 这类格式
+
+        Return:
+            秒数，float
+        """
+        if isinstance(expr, (int, float)) and not isinstance(expr, bool):
+            seconds = float(expr)
+        elif isinstance(expr, str):
+            seconds = cls._parse_offset(expr).total_seconds()
+        else:
+            raise InvalidParam(f'invalid duration {expr}')
+        if seconds <= 0:
+            raise InvalidParam(f'invalid duration {expr}: 必须大于0')
+        return seconds
+
     @classmethod
     def parse(cls, expr):
         ret = re.split(r'([+-])', expr)
@@ -261,3 +609,101 @@ class TimeExprParser(object):
         else:
             base, op, offset = ret
             return base, op, cls._parse_offset(offset)
+
+    @classmethod
+    def compile(cls, expr, market_period=None):
+        """ 将时间表达式编译为相对当天0点的偏移
+
+        Args:
+            expr: 'HH:MM:SS'、'HH:MM' 或 'open+30m' 这类表达式
+            market_period: 解析open、close使用的交易时间段，默认使用策略的market_period选项
+
+        Return:
+            datetime.timedelta
+        """
+        if ':' in expr:
+            try:
+                time_info = [int(_i) for _i in expr.split(':')]
+                hour, minute = time_info[:2]
+                second = time_info[2] if len(time_info) > 2 else 0
+                t = datetime.time(hour, minute, second)
+            except (ValueError, TypeError):
+                raise InvalidParam(f'invalid time expr {expr}')
+            return datetime.timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
+
+        base, op, offset = cls.parse(expr)
+
+        if market_period is None:
+            market_period = _get_market_period()
+        if base == 'open':
+            base_time = parse_time(market_period[0][0])
+        else:
+            base_time = parse_time(market_period[-1][-1])
+
+        base_offset = datetime.timedelta(hours=base_time.hour, minutes=base_time.minute, seconds=base_time.second)
+        if op == '+':
+            return base_offset + offset
+        else:
+            return base_offset - offset
+
+
+class CronExprParser(object):
+    """ 解析run_cron中的cron表达式
+
+    格式为 '分 时 日 月 周'，各字段支持 `*`、`5`、`1-5`、`*/15`、`0-30/10` 以及用逗号分隔的组合，
+    周字段0和7都表示周日，和标准cron一致
+    """
+
+    FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+
+    # 各月份最多的天数，用于检查日期永远无法匹配的表达式
+    _MONTH_DAYS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+    @staticmethod
+    def _parse_field(expr, field, name, low, high):
+        values = set()
+        for _part in field.split(","):
+            m = re.match(r'^(?:(\*)|([0-9]+)(?:-([0-9]+))?)(?:/([0-9]+))?$', _part)
+            if m is None:
+                raise InvalidParam(f'invalid cron expr {expr}: {name}字段格式错误：{field}')
+            star, start, end, step = m.groups()
+            if star:
+                start, end = low, high
+            else:
+                start = int(start)
+                # 'a/n' 表示从a开始到最大值，每隔n取一个
+                end = int(end) if end is not None else (high if step else start)
+            step = int(step) if step else 1
+            if not (low <= start <= end <= high) or step == 0:
+                raise InvalidParam(f'invalid cron expr {expr}: {name}字段超出范围[{low}, {high}]：{field}')
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+
+    @classmethod
+    def parse(cls, expr):
+        """ 解析cron表达式
+
+        Return:
+            (minutes, hours, days, months, weekdays, day_or_weekday)，minutes、hours为有序列表，其余为集合，
+            weekdays中0表示周日；day_or_weekday为True时日、周满足其一即可触发
+        """
+        if not isinstance(expr, str):
+            raise InvalidParam(f'invalid cron expr {expr}')
+        fields = expr.split()
+        if len(fields) != len(cls.FIELDS):
+            raise InvalidParam(f'invalid cron expr {expr}: 需要包含5个字段，分 时 日 月 周')
+
+        minutes, hours, days, months, weekdays = [cls._parse_field(expr, _field, _name, _low, _high)
+                                                  for _field, (_name, _low, _high) in zip(fields, cls.FIELDS)]
+        weekdays = set(_d % 7 for _d in weekdays)
+
+        # 和标准cron一致，日、周字段都不以'*'开头时，满足其一即可触发，否则需要同时满足
+        day_or_weekday = not fields[2].startswith("*") and not fields[4].startswith("*")
+        if not day_or_weekday and not any(_d <= cls._MONTH_DAYS[_m - 1] for _m in months for _d in days):
+            raise InvalidParam(f'invalid cron expr {expr}: 日期永远无法匹配')
+        return minutes, hours, set(days), set(months), weekdays, day_or_weekday
+
+
+def _get_market_period():
+    ctx = Context.get_instance()
+    return ctx.strategy.options.get("market_period", config.MARKET_PERIOD)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import importlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    import contextvars
+except ImportError:     # pragma: no cover
+    contextvars = None
+
+from ..common.log import sys_logger
+
+from .message import Message
+
+
+logger = sys_logger.getChild("executor")
+
+
+class _PoolExecutor(object):
+    """
+    Usage:
+        线程池、进程池的公共逻辑：在池中运行函数，事件循环不被阻塞，
+        函数执行完成（包括异常）后，通过EventLoop.push_message把结果发回事件循环线程处理
+    """
+
+    # 池类型名称，用于日志
+    kind = None
+
+    def __init__(self, loop, max_workers):
+        """
+        Args:
+            loop: 事件循环
+            max_workers: 最大线程数/进程数
+        """
+        self._loop = loop
+        self._max_workers = max_workers
+        self._pool = None
+
+    def _create_pool(self):
+        raise NotImplementedError
+
+    def _get_pool(self):
+        if self._pool is None:
+            logger.info(f"创建{self.kind}，max_workers={self._max_workers}")
+            self._pool = self._create_pool()
+        return self._pool
+
+    def submit(self, func, *args, callback=None, name=None, raise_exception=True, on_finish=None, **kwargs):
+        """ 在池中运行func，只能在事件循环线程中调用
+
+        Args:
+            func: 要运行的函数
+            callback: 执行成功后在事件循环线程中调用的回调，函数签名：callback(result) -> None
+            name: 任务名称，用于日志
+            raise_exception: 为True时，func抛出的异常在事件循环线程中重新抛出，和其他事件回调的异常一样处理
+                （记录日志并停止事件循环）；为False时只记录日志，由调用方通过返回的future处理异常
+            on_finish: 执行结束（包括异常、取消）后在事件循环线程中调用，先于callback，函数签名：on_finish(future) -> None
+
+        Returns:
+            concurrent.futures.Future
+        """
+        name = name or getattr(func, "__name__", str(func))
+        submit_time = time.time()
+        future = self._submit_to_pool(func, *args, **kwargs)
+        self._loop.job_started()
+        future.add_done_callback(lambda _future: self._loop.push_message(Message(
+            self._loop.get_current_time(), self._on_done,
+            callback_data={"future": _future, "callback": callback, "name": name, "submit_time": submit_time,
+                           "raise_exception": raise_exception, "on_finish": on_finish})))
+        return future
+
+    def _submit_to_pool(self, func, *args, **kwargs):
+        return self._get_pool().submit(func, *args, **kwargs)
+
+    def _on_done(self, future, callback, name, submit_time, raise_exception, on_finish=None):
+        self._loop.job_finished()
+        logger.debug(f"{self.kind}任务完成，task={name}, 耗时{time.time() - submit_time:.3f}秒")
+        if on_finish is not None:
+            on_finish(future)
+        if future.cancelled():
+            logger.info(f"{self.kind}任务已取消，task={name}")
+            return
+
+        exc = future.exception()
+        if exc is not None:
+            logger.error(f"{self.kind}任务执行失败，task={name}, error={exc}")
+            if raise_exception:
+                raise exc
+            return
+
+        if callback is not None:
+            callback(future.result())
+
+    def shutdown(self, wait=False):
+        if self._pool is not None:
+            logger.info(f"关闭{self.kind}")
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+class ThreadExecutor(_PoolExecutor):
+    """
+    Usage:
+        在有界线程池中运行耗时的阻塞函数（比如下载因子数据），运行期间账户同步等事件照常处理
+    """
+
+    kind = "线程池"
+
+    def _create_pool(self):
+        return ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="jqtrade_worker")
+
+    def _submit_to_pool(self, func, *args, **kwargs):
+        if contextvars is None:
+            return super(ThreadExecutor, self)._submit_to_pool(func, *args, **kwargs)
+        # 在提交方的contextvars上下文中运行，多策略模式下线程中的函数仍然能拿到所属策略的上下文
+        return self._get_pool().submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def _warm_up_worker(modules, delay):
+    for _module in modules:
+        importlib.import_module(_module)
+    # 稍作停留，让每个预热任务落在不同的工作进程上
+    time.sleep(delay)
+    return os.getpid()
+
+
+class ProcessExecutor(_PoolExecutor):
+    """
+    Usage:
+        在进程池中运行CPU密集的计算（比如全市场信号计算），利用多核且不阻塞事件循环；
+        函数、参数和返回值需要能被pickle，函数需要定义在模块顶层
+    """
+
+    kind = "进程池"
+
+    # 预热任务在工作进程中停留的时间，单位：秒
+    WARM_UP_DELAY = 0.1
+
+    def __init__(self, loop, max_workers=None):
+        super(ProcessExecutor, self).__init__(loop, max_workers or os.cpu_count() or 1)
+
+    def _create_pool(self):
+        return ProcessPoolExecutor(max_workers=self._max_workers)
+
+    def warm_up(self, modules=None):
+        """ 提前启动全部工作进程并导入modules，避免开盘时第一次计算承担创建进程、导入模块的耗时
+
+        预热在后台进行，不阻塞调用方，也不阻止事件循环退出
+
+        Args:
+            modules: 工作进程中预先导入的模块名列表，比如["numpy", "pandas"]
+        """
+        modules = list(modules or ())
+        start = time.time()
+        pool = self._get_pool()
+        futures = [pool.submit(_warm_up_worker, modules, self.WARM_UP_DELAY) for _ in range(self._max_workers)]
+
+        pending = [len(futures)]
+        pids = set()
+
+        def _on_warm_up_done(future):
+            pending[0] -= 1
+            if not future.cancelled():
+                if future.exception() is not None:
+                    logger.error(f"进程池预热失败，error={future.exception()}")
+                else:
+                    pids.add(future.result())
+            if pending[0] == 0:
+                logger.info(f"进程池预热完成，进程数：{len(pids)}，预导入模块：{modules}，耗时{time.time() - start:.3f}秒")
+
+        for _future in futures:
+            _future.add_done_callback(_on_warm_up_done)
+        return futures
@@ -28,3 +28,22 @@ class Loader(object):
         module_name = self.code_file.split(".")[0]
         module = importlib.import_module(module_name)
         return module
+
+    def reload(self, module, keep=("g",)):
+        """ 重新导入策略模块
+
+        Args:
+            module: load返回的策略模块
+            keep: 保留原值的全局变量名，重新执行模块代码时不会被重置
+
+        Returns:
+            重新导入后的策略模块
+        """
+        logger.info(f"重新加载用户策略代码，code_dir={self.code_dir}，code_file={self.code_file}")
+        kept = {_name: module.__dict__[_name] for _name in keep if _name in module.__dict__}
+        try:
+            module = importlib.reload(module)
+        finally:
+            # 模块代码执行出错时模块也已被部分更新，同样恢复保留的全局变量
+            module.__dict__.update(kept)
+        return module
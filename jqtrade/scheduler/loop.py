@@ -1,33 +1,64 @@
 # -*- coding: utf-8 -*-
 import time
-import pyuv
 import signal
+import asyncio
+import threading
 import traceback
+from collections import deque
 
+from ..common.exceptions import ConfigError
 from ..common.log import sys_logger
 from ..common.utils import milliseconds_to_dt
 
-from .queue import ThreadSafeQueue, QueueEmptyError
-from .message import Message
+from .queue import create_queue, QueueEmptyError
+from .message import Message, Lane
+from .clock import get_clock
+from .stats import LoopStats
+from .config import get_config
 
 
 logger = sys_logger.getChild("loop")
 
 
-class EventLoop(object):
+class BaseEventLoop(object):
     """
     Usage:
         1. 管理事件循环
         2. 取出事件并触发事件回调
         3. 监听并处理外部信号
+
+        事件队列、消息处理逻辑在基类中实现，子类只需要实现底层事件循环相关的几个方法：
+        _run_forever、_stop_loop、_send_wakeup、_start_timer、_stop_timer、register_signal_callback
+
+        消息按车道（见Lane）放入各自的事件队列，选取下一条消息的规则见_select
     """
 
-    def __init__(self):
-        self._queue = ThreadSafeQueue()
+    # 模拟时钟下，每连续处理这么多条消息后让出一次事件循环，以便处理外部信号
+    SIMULATED_YIELD_INTERVAL = 1000
 
-        self._uvloop = pyuv.Loop()
-        self._loop_notifier = pyuv.Async(self._uvloop, self.check_queue)
-        self._timer = pyuv.Timer(self._uvloop)
+    # 是否支持以协程的方式运行async def回调
+    supports_coroutine = False
+
+    def __init__(self, clock=None):
+        self._clock = clock or get_clock()
+
+        config = get_config()
+
+        # 事件队列只在事件循环线程中读写，不需要加锁；其他线程push的消息先放入收件箱，由事件循环线程转入事件队列。
+        # 每个车道一个事件队列，按Lane.ALL的顺序存放
+        self._lane_queues = {_lane: create_queue(config.QUEUE_BACKEND, thread_safe=False) for _lane in Lane.ALL}
+        self._queues = [self._lane_queues[_lane] for _lane in Lane.ALL]
+        self._critical_queue = self._lane_queues[Lane.CRITICAL]
+        self._background_queue = self._lane_queues[Lane.BACKGROUND]
+        self._background_horizon = int(config.BACKGROUND_LANE_HORIZON * 1000)
+        self._inbox = deque()
+        self._loop_thread_id = None
+
+        # 是否已经发送了唤醒通知且事件循环还没处理，用于合并多次唤醒
+        self._wakeup_pending = False
+
+        # 线程池等在事件循环之外运行、完成后会push消息回来的任务数，不为0时事件队列为空也不退出事件循环
+        self._pending_jobs = 0
 
         self._stop_requested = False
         self._exception = None
@@ -37,6 +68,17 @@ class EventLoop(object):
 
         self._strategy_time = None
 
+        # 按消息标签（事件类名）统计的调度延迟和回调耗时
+        self._stats = LoopStats()
+
+        # 精确定时消息：定时器提前margin唤醒，最后spin_window内自旋等待，单位：纳秒
+        self._precise_margin_ns = int(config.PRECISE_TIMER_MARGIN * 1000000000)
+        self._precise_spin_ns = int(config.PRECISE_SPIN_WINDOW * 1000000000)
+
+    @property
+    def stats(self):
+        return self._stats
+
     def setup(self):
         logger.info("setup loop")
         # stop_task
@@ -49,7 +91,8 @@ class EventLoop(object):
         logger.info("启动事件循环")
 
         self.setup()
-        self._uvloop.run()
+        self._loop_thread_id = threading.get_ident()
+        self._run_forever()
 
         if self._exception:
             raise self._exception
@@ -62,38 +105,106 @@ class EventLoop(object):
 
     def check_queue(self, *args, **kwargs):
         logger.debug("check_queue run")
+        # 先清除唤醒标记再转移收件箱，保证清除之后push的消息一定会再次唤醒事件循环
+        self._wakeup_pending = False
+        self._drain_inbox()
+
+        handled = 0
         while not self._stop_requested:
+            # 模拟时钟下连续处理一批消息后让出事件循环；有协程任务在运行时每处理一条消息就让出一次，让协程任务及时推进
+            if self._clock.simulated and handled and \
+                    (handled >= self.SIMULATED_YIELD_INTERVAL or self._has_pending_tasks()):
+                self._notify_loop()
+                break
+
+            now = self.get_current_time()
             try:
-                message = self._queue.pop()
+                queue, message = self._select(now)
             except QueueEmptyError:
+                if self._has_pending_tasks():
+                    # 还有协程任务没有执行完，任务结束时会再次唤醒事件循环
+                    break
                 logger.info("事件队列已空，退出事件循环")
                 self._stop_requested = True
                 break
 
-            now = self.get_current_time()
             if message.time > now:
                 if self.check_exit(message.time):
                     self.stop()
                     break
 
-                wait_time = (message.time - now) / 1000.0
+                if self._clock.simulated:
+                    # 模拟时钟不需要真实等待，直接推进到消息时间，再按车道重新选取同一时刻到期的消息
+                    self._clock.advance_to(message.time)
+                    continue
+
+                if message.precise:
+                    remaining_ns = message.time * 1000000 - self._clock.time_ns()
+                    if remaining_ns <= self._precise_margin_ns:
+                        # 已经进入提前唤醒的窗口，阻塞等待到点后立即处理
+                        self._wait_precisely(message.time * 1000000)
+                        self.handle_message(queue.pop())
+                        handled += 1
+                        continue
+                    wait_time = (remaining_ns - self._precise_margin_ns) / 1000000000.0
+                else:
+                    wait_time = (message.time - now) / 1000.0
                 logger.debug(f"start timer, wait {wait_time} seconds")
-                self._timer.stop()
-                self._uvloop.update_time()
-                self._timer.start(
-                    self.check_queue,
-                    timeout=wait_time,
-                    repeat=0)
-
-                self.push_message(message, notify=False)
+                self._stop_timer()
+                self._start_timer(wait_time)
                 break
             else:
-                self.handle_message(message)
+                # 收件箱只在check_queue开始时转入事件队列，top和pop之间不会插入其他消息
+                self.handle_message(queue.pop())
+                handled += 1
 
         if self._stop_requested:
-            self._uvloop.stop()
+            self._stop_loop()
+
+    def _select(self, now):
+        """ 选出下一条要处理的消息，返回(消息所在的事件队列, 消息)，所有车道都为空时抛出QueueEmptyError
+
+        1. 已到期的消息按critical、normal、background车道的顺序处理，同一车道内按(time, -priority, seq_number)
+        2. background车道的消息只在其（或当前时间，取较晚者）之后horizon内没有critical消息到期时处理，否则先处理critical消息
+        3. 都未到期时返回最早到期的消息，由调用方等待到点
+        """
+        critical = self._critical_queue.top() if self._critical_queue else None
+        earliest = None
+        for _queue in self._queues:
+            if not _queue:
+                continue
+            message = _queue.top()
+            if _queue is self._background_queue and critical is not None and \
+                    critical.time <= max(now, message.time) + self._background_horizon:
+                continue
+            if message.time <= now:
+                return _queue, message
+            if earliest is None or message < earliest[1]:
+                earliest = (_queue, message)
+
+        if earliest is None:
+            raise QueueEmptyError()
+        return earliest
+
+    def _wait_precisely(self, deadline_ns):
+        """ 等待到deadline_ns（纳秒时间戳），距离到点超过spin_window时sleep，最后spin_window内自旋，自旋时让出GIL """
+        clock = self._clock
+        spin_ns = self._precise_spin_ns
+        while True:
+            remaining_ns = deadline_ns - clock.time_ns()
+            if remaining_ns <= 0:
+                return
+            if remaining_ns > spin_ns:
+                time.sleep((remaining_ns - spin_ns) / 1000000000.0)
+            else:
+                time.sleep(0)
 
     def handle_message(self, message):
+        # 调度延迟：实际开始处理的时间与消息计划时间的差值
+        lag_us = self._clock.time_us() - message.time * 1000
+        if message.precise:
+            logger.info(f"精确定时消息触发，label={message.label}，触发误差：{lag_us}微秒")
+        start = time.perf_counter()
         try:
             logger.debug(f"handle message: {message}")
             self._strategy_time = message.time
@@ -103,19 +214,88 @@ class EventLoop(object):
             e.tb = traceback.format_exc()
             self._exception = e
             self.stop()
+        finally:
+            self._stats.record(message.label, lag_us, (time.perf_counter() - start) * 1000000, message.lane)
+
+    def _drain_inbox(self):
+        inbox = self._inbox
+        lane_queues = self._lane_queues
+        while inbox:
+            message = inbox.popleft()
+            lane_queues[message.lane].push(message)
 
     def _notify_loop(self):
-        self._loop_notifier.send()
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            self._send_wakeup()
+
+    def _run_forever(self):
+        """ 运行底层事件循环，直到_stop_loop被调用 """
+        raise NotImplementedError
+
+    def _stop_loop(self):
+        raise NotImplementedError
+
+    def _send_wakeup(self):
+        """ 唤醒底层事件循环执行check_queue，需要支持在任意线程调用 """
+        raise NotImplementedError
+
+    def _start_timer(self, wait_time):
+        """ wait_time秒之后执行check_queue """
+        raise NotImplementedError
+
+    def _stop_timer(self):
+        raise NotImplementedError
+
+    def _has_pending_tasks(self):
+        return self._pending_jobs > 0
+
+    @property
+    def queue_size(self):
+        """ 等待处理的消息数，包括其他线程push到收件箱中、还未转移到事件队列的消息 """
+        return sum(len(_queue) for _queue in self._queues) + len(self._inbox)
+
+    @property
+    def lane_sizes(self):
+        """ 各车道事件队列中等待处理的消息数，不包括收件箱中的消息 """
+        return {_lane: len(_queue) for _lane, _queue in self._lane_queues.items()}
+
+    @property
+    def pending_jobs(self):
+        return self._pending_jobs
+
+    def job_started(self):
+        """ 登记一个在事件循环之外运行的任务，只能在事件循环线程中调用 """
+        self._pending_jobs += 1
+
+    def job_finished(self):
+        """ 在事件循环之外运行的任务已完成，只能在事件循环线程中调用 """
+        self._pending_jobs -= 1
+
+    def create_task(self, coro, timeout=None, name=None):
+        """ 以任务的方式运行协程，只有supports_coroutine为True的事件循环支持 """
+        raise NotImplementedError(f"{self.__class__.__name__}不支持运行协程，请使用asyncio事件循环")
 
     def push_message(self, message, notify=True):
-        self._queue.push(message, message.sort_key)
+        """ 添加消息，可以在任意线程调用
+
+        事件循环线程中直接写入事件队列；其他线程写入收件箱（deque.append是线程安全的），
+        由事件循环线程在check_queue时转入事件队列，多次push只会唤醒一次事件循环
+        """
+        if threading.get_ident() == self._loop_thread_id:
+            self._lane_queues[message.lane].push(message)
+        else:
+            self._inbox.append(message)
 
         if notify:
             self._notify_loop()
 
-    @staticmethod
-    def get_current_time():
-        return int(time.time() * 1000)
+    def get_current_time(self):
+        return self._clock.time()
+
+    @property
+    def clock(self):
+        return self._clock
 
     def register_exit_checker(self, callback):
         logger.debug(f"register_exit_checker. callback: {callback}")
@@ -134,16 +314,13 @@ class EventLoop(object):
         self.push_message(Message(time=self.get_current_time() + int(delay), callback=lambda: callback(*args, **kws)))
 
     def register_signal_callback(self, signum, callback):
-        # import os
-        # if os.name == "nt":
-        #     import signal
-        #     signal.signal(signal.SIGTERM, self.handle_signal)
-        # else:
-        signal_handler = self._signal_handlers.get(signum, None)
-        if signal_handler is None:
-            signal_handler = self._signal_handlers[signum] = pyuv.Signal(self._uvloop)
-        signal_handler.stop()
-        signal_handler.start(lambda handle, sig: callback(sig), signum)
+        """ 注册信号回调，回调在事件循环线程中执行
+
+        Args:
+            signum: 信号
+            callback: 回调函数，函数签名：func(signum) -> None
+        """
+        raise NotImplementedError
 
     def handle_signal(self, sig):
         logger.info(f"handle signal: {sig}")
@@ -153,8 +330,195 @@ class EventLoop(object):
     def current_dt(self):
         return milliseconds_to_dt(self.get_current_time())
 
+    @property
+    def strategy_time(self):
+        """ 正在处理（或最近处理）的消息的计划时间，毫秒时间戳 """
+        return self._strategy_time
+
     @property
     def strategy_dt(self):
         if self._strategy_time:
             return milliseconds_to_dt(self._strategy_time)
         return None
+
+
+class EventLoop(BaseEventLoop):
+    """
+    Usage:
+        基于pyuv(libuv)的事件循环，默认使用
+    """
+
+    def __init__(self, clock=None):
+        import pyuv
+
+        super(EventLoop, self).__init__(clock=clock)
+
+        self._pyuv = pyuv
+        self._uvloop = pyuv.Loop()
+        self._loop_notifier = pyuv.Async(self._uvloop, self.check_queue)
+        self._timer = pyuv.Timer(self._uvloop)
+
+    def _run_forever(self):
+        self._uvloop.run()
+
+    def _stop_loop(self):
+        self._uvloop.stop()
+
+    def _send_wakeup(self):
+        self._loop_notifier.send()
+
+    def _start_timer(self, wait_time):
+        self._uvloop.update_time()
+        self._timer.start(self.check_queue, timeout=wait_time, repeat=0)
+
+    def _stop_timer(self):
+        self._timer.stop()
+
+    def register_signal_callback(self, signum, callback):
+        # import os
+        # if os.name == "nt":
+        #     import signal
+        #     signal.signal(signal.SIGTERM, self.handle_signal)
+        # else:
+        signal_handler = self._signal_handlers.get(signum, None)
+        if signal_handler is None:
+            signal_handler = self._signal_handlers[signum] = self._pyuv.Signal(self._uvloop)
+        signal_handler.stop()
+        signal_handler.start(lambda handle, sig: callback(sig), signum)
+
+
+def _new_asyncio_loop():
+    """ 创建asyncio事件循环，安装了uvloop时优先使用uvloop """
+    try:
+        import uvloop
+    except ImportError:
+        logger.info("未安装uvloop，使用asyncio默认事件循环")
+        return asyncio.new_event_loop()
+    logger.info("使用uvloop事件循环")
+    return uvloop.new_event_loop()
+
+
+class AsyncioEventLoop(BaseEventLoop):
+    """
+    Usage:
+        基于asyncio的事件循环，不依赖pyuv，安装了uvloop时自动使用uvloop；
+        策略中可以通过aio_loop属性使用asyncio原生的网络IO
+    """
+
+    supports_coroutine = True
+
+    def __init__(self, clock=None):
+        super(AsyncioEventLoop, self).__init__(clock=clock)
+
+        self._aio_loop = _new_asyncio_loop()
+        self._timer_handle = None
+
+        # 正在运行的协程任务
+        self._tasks = set()
+
+    @property
+    def aio_loop(self):
+        return self._aio_loop
+
+    def _run_forever(self):
+        asyncio.set_event_loop(self._aio_loop)
+        try:
+            self._aio_loop.run_forever()
+            self._cancel_tasks()
+        finally:
+            # 信号处理只能在主线程中移除，避免事件循环对象在其他线程中被回收时移除信号报错
+            for _signum in self._signal_handlers:
+                self._aio_loop.remove_signal_handler(_signum)
+            self._signal_handlers.clear()
+
+    def _stop_loop(self):
+        self._aio_loop.stop()
+
+    def _send_wakeup(self):
+        self._aio_loop.call_soon_threadsafe(self.check_queue)
+
+    def _start_timer(self, wait_time):
+        self._timer_handle = self._aio_loop.call_later(wait_time, self.check_queue)
+
+    def _stop_timer(self):
+        if self._timer_handle is not None:
+            self._timer_handle.cancel()
+            self._timer_handle = None
+
+    def _has_pending_tasks(self):
+        return bool(self._tasks) or super(AsyncioEventLoop, self)._has_pending_tasks()
+
+    def create_task(self, coro, timeout=None, name=None):
+        """ 以任务的方式运行协程，协程中可以await IO、sleep等，不会阻塞其他事件
+
+        Args:
+            coro: 协程对象
+            timeout: 超时时间，单位：秒，超时后任务会被取消并记录错误日志
+            name: 任务名称，用于日志
+
+        协程抛出的异常和handle_message中一样处理：记录日志并停止事件循环，异常由run抛出
+        """
+        task = self._aio_loop.create_task(self._run_task(coro, timeout, name))
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    async def _run_task(self, coro, timeout, name):
+        try:
+            if timeout:
+                return await asyncio.wait_for(coro, timeout)
+            return await coro
+        except asyncio.TimeoutError:
+            logger.error(f"协程任务执行超时，已取消。task={name}, timeout={timeout}秒")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"协程任务执行失败。task={name}, error={e}")
+            e.tb = traceback.format_exc()
+            self._exception = e
+            self.stop()
+
+    def _on_task_done(self, task):
+        self._tasks.discard(task)
+        if not self._tasks and not self._stop_requested:
+            # 事件队列可能已经为空，唤醒事件循环检查是否需要退出
+            self._notify_loop()
+
+    def _cancel_tasks(self):
+        if not self._tasks:
+            return
+        logger.info(f"事件循环已停止，取消{len(self._tasks)}个未完成的协程任务")
+        tasks = list(self._tasks)
+        for _task in tasks:
+            _task.cancel()
+        self._aio_loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+    def register_signal_callback(self, signum, callback):
+        try:
+            self._aio_loop.add_signal_handler(signum, callback, signum)
+            self._signal_handlers[signum] = callback
+        except NotImplementedError:
+            # windows下asyncio不支持add_signal_handler，使用signal模块注册，再转到事件循环线程中执行
+            signal.signal(signum, lambda sig, frame: self._aio_loop.call_soon_threadsafe(callback, sig))
+
+
+_loop_backends = {
+    "pyuv": EventLoop,
+    "asyncio": AsyncioEventLoop,
+}
+
+
+def create_event_loop(backend=None, clock=None):
+    """ 根据配置创建事件循环
+
+    Args:
+        backend: "pyuv" 基于pyuv的事件循环；"asyncio" 基于asyncio的事件循环，默认使用scheduler配置LOOP_BACKEND
+        clock: 事件循环使用的时钟，默认使用当前进程的时钟
+    """
+    backend = backend or get_config().LOOP_BACKEND
+    try:
+        loop_cls = _loop_backends[backend]
+    except KeyError:
+        raise ConfigError(f"不支持的事件循环类型：{backend}，只支持{list(_loop_backends)}")
+    logger.info(f"事件循环类型：{backend}")
+    return loop_cls(clock=clock)
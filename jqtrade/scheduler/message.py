@@ -1,27 +1,70 @@
 # -*- coding: utf-8 -*-
+import itertools
+from operator import itemgetter
 
 
-class Message(object):
+class Lane:
+    """ 事件循环的消息车道，每个车道一个独立的事件队列
+
+    已到期的消息按critical、normal、background的顺序处理；background车道的消息只在一段时间内（SchedulerConfig.
+    BACKGROUND_LANE_HORIZON）没有critical消息到期时才处理，耗时的后台任务不会推迟紧随其后的下单等关键任务
+    """
+
+    # 交易关键任务，比如开盘下单
+    CRITICAL = "critical"
+
+    # 默认车道，定时任务、账户同步、线程池/进程池任务的结果回调
+    NORMAL = "normal"
+
+    # 后台任务，比如运维命令、统计数据输出
+    BACKGROUND = "background"
+
+    ALL = (CRITICAL, NORMAL, BACKGROUND)
+
+
+class Message(tuple):
     """
     Usage:
         封装事件的消息类，事件队列中的实际对象
+
+        消息是不可变的元组：(time, -priority, seq_number, callback, callback_data, label, precise, lane)，
+        前三项即排序键，消息直接作为堆元素入队，堆比较在元组层面完成，不需要额外生成sort_key和包装元组
     """
 
-    _unique_num = 0
+    __slots__ = ()
+
+    # 消息序号生成器，保证同一时间、同一优先级的消息按创建顺序处理，序号唯一，比较不会落到callback上
+    _seq_counter = itertools.count(1)
+
+    def __new__(cls, time, callback, callback_data=None, priority=0, label=None, precise=False, lane=Lane.NORMAL):
+        """
+        Args:
+            label: 消息标签，事件循环按标签统计调度延迟和执行耗时，默认使用callback的函数名
+            precise: 是否精确定时，精确定时的消息由事件循环提前唤醒后自旋等待到点触发，会额外消耗CPU
+            lane: 消息所在的车道，见Lane
+        """
+        return tuple.__new__(cls, (int(time), -priority, next(cls._seq_counter), callback, callback_data or {},
+                                   label, precise, lane))
 
-    def __init__(self, time, callback, callback_data=None, priority=0):
-        self.time = int(time)
-        self.callback = callback
-        self.callback_data = callback_data or {}
-        self.priority = priority
+    time = property(itemgetter(0))
+    seq_number = property(itemgetter(2))
+    callback = property(itemgetter(3))
+    callback_data = property(itemgetter(4))
+    precise = property(itemgetter(6))
+    lane = property(itemgetter(7))
 
-        Message._unique_num += 1
-        self.seq_number = Message._unique_num
+    @property
+    def label(self):
+        return self[5] or getattr(self[3], "__name__", "unknown")
+
+    @property
+    def priority(self):
+        return -self[1]
 
     @property
     def sort_key(self):
-        return self.time, -self.priority, self.seq_number
+        return self[:3]
 
     def __repr__(self):
         return f"Message(time={self.time}, callback={self.callback.__name__}, " \
-               f"priority={self.priority}, seq_number={self.seq_number})"
+               f"priority={self.priority}, seq_number={self.seq_number}, lane={self.lane})"
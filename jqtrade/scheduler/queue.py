@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from ..common.log import sys_logger
+from ..common.exceptions import ConfigError
 
 import heapq
 import threading
@@ -21,53 +22,308 @@ class PriorityQueue(object):
     def __init__(self):
         self._queue = []
 
-    def push(self, item, sort_key):
-        logger.debug(f"push queue. item={item}, sort_key={sort_key}")
-        heapq.heappush(self._queue, (sort_key, item))
+    def push(self, item, sort_key=None):
+        """ 入队
+
+        Args:
+            item: 入队元素，不指定sort_key时，item自身作为堆元素比较，比如Message
+            sort_key: 排序键，值越小越先出队，指定时以(sort_key, item)元组入队
+
+        同一个队列中的元素要么都指定sort_key，要么都不指定
+        """
+        logger.debug("push queue. item=%s, sort_key=%s", item, sort_key)
+        if sort_key is not None:
+            item = (sort_key, item)
+        heapq.heappush(self._queue, item)
 
     def pop(self):
         try:
-            sort_key, msg = heapq.heappop(self._queue)
-            logger.debug(f"pop queue. msg={msg}, sort_key={sort_key}")
-            return msg
+            item = heapq.heappop(self._queue)
         except IndexError:
             raise QueueEmptyError()
+        logger.debug("pop queue. item=%s", item)
+        return item[1] if item.__class__ is tuple else item
 
     def top(self):
         try:
-            sort_key, msg = self._queue[0]
-            logger.debug(f"pop queue. item={msg}, sort_key={sort_key}")
-            return msg
+            item = self._queue[0]
         except IndexError:
             raise QueueEmptyError()
+        return item[1] if item.__class__ is tuple else item
 
     def empty(self):
         return len(self._queue) == 0
 
+    def __len__(self):
+        return len(self._queue)
 
-class ThreadSafeQueue(PriorityQueue):
+
+class TimingWheelQueue(object):
     """
     Usage:
-        线程安全的优先队列
+        分层时间轮优先队列，非线程安全，出队顺序和PriorityQueue一致：按(time, -priority, seq_number)
+
+        实盘中绝大部分消息都在整秒、整分触发（账户同步、every_minute、open/close），时间轮按时间分桶：
+            第0层: 1000个1毫秒的槽，存放和游标同一秒的消息
+            第1层: 60个1秒的槽，存放和游标同一分钟的消息
+            第2层: 60个1分钟的槽，存放和游标同一小时的消息
+            第3层: 24个1小时的槽，存放和游标同一天的消息
+            更远的消息按天存放在溢出区
+        入队时根据消息时间直接定位到槽，O(1)；出队时通过每层的占用位图找到最近的非空槽，
+        上层的槽到期时整体下放到下一层（cascade），每条消息最多下放4次。第0层每个槽内的消息时间相同，
+        按(-priority, seq_number)降序存放，从尾部O(1)出队
+
+        队列元素是Message，或者显式指定sort_key时的(sort_key, item)元组，sort_key第一项必须是毫秒时间戳
+
+        CPython的heapq是C实现，时间轮入队比二叉堆慢约一倍，出队在挂起约30万个定时器时和二叉堆持平，
+        50万时快约1.4倍，100万时快约1.6倍（benchmarks/bench_timing_wheel.py），定时器数量较少时使用默认的二叉堆即可
     """
 
+    # 每层槽的跨度（毫秒）和槽数量
+    _SPANS = (1, 1000, 60 * 1000, 3600 * 1000)
+    _SIZES = (1000, 60, 60, 24)
+    _DAY = 86400 * 1000
+
+    def __init__(self):
+        self._levels = [[None] * _size for _size in self._SIZES]
+        self._masks = [0] * len(self._SIZES)
+
+        # 早于游标的消息（游标前移后才入队的到期消息）
+        self._ready = []
+
+        # 超过游标当天的消息，天 -> 消息列表
+        self._overflow = {}
+        self._overflow_days = []
+
+        # 当前最早到期的第0层槽，及其下标
+        self._head = None
+        self._head_idx = None
+
+        self._size = 0
+        self._set_cursor(0)
+
+    def _set_cursor(self, ts):
+        self._cursor = ts
+        self._cursor_sec = ts // 1000
+        self._cursor_min = ts // 60000
+        self._cursor_hour = ts // 3600000
+        self._cursor_day = ts // self._DAY
+
+    @staticmethod
+    def _time_of(entry):
+        return entry[0][0] if entry.__class__ is tuple else entry[0]
+
+    def _place(self, entry, ts, cascading=False):
+        if ts < self._cursor:
+            heapq.heappush(self._ready, entry)
+            return
+
+        sec = ts // 1000
+        if sec == self._cursor_sec:
+            idx = ts - sec * 1000
+            bucket = self._levels[0][idx]
+            if bucket is None:
+                self._levels[0][idx] = [entry]
+                self._masks[0] |= 1 << idx
+            elif cascading or entry < bucket[-1]:
+                # 下放时第0层必然为空，下放完成后统一排序
+                bucket.append(entry)
+            else:
+                # 槽内按降序存放，从尾部出队；timsort对基本有序的列表是线性的
+                bucket.append(entry)
+                bucket.sort(reverse=True)
+            if self._head_idx is not None and idx < self._head_idx:
+                self._head = self._head_idx = None
+            return
+
+        minute = sec // 60
+        if minute == self._cursor_min:
+            level, idx = 1, sec - minute * 60
+        else:
+            hour = minute // 60
+            if hour == self._cursor_hour:
+                level, idx = 2, minute - hour * 60
+            else:
+                day = hour // 24
+                if day == self._cursor_day:
+                    level, idx = 3, hour - day * 24
+                else:
+                    bucket = self._overflow.get(day)
+                    if bucket is None:
+                        self._overflow[day] = [entry]
+                        heapq.heappush(self._overflow_days, day)
+                    else:
+                        bucket.append(entry)
+                    return
+
+        bucket = self._levels[level][idx]
+        if bucket is None:
+            self._levels[level][idx] = [entry]
+            self._masks[level] |= 1 << idx
+        else:
+            bucket.append(entry)
+
+    def _first_slot(self, level, start):
+        """ 返回该层下标>=start的第一个非空槽的下标，没有时返回None """
+        mask = self._masks[level] >> start
+        if not mask:
+            return None
+        return start + (mask & -mask).bit_length() - 1
+
+    def _cascade(self, entries):
+        """ 把上层槽中的消息重新放入时间轮，此时第0层为空 """
+        time_of = self._time_of
+        for _entry in entries:
+            self._place(_entry, time_of(_entry), cascading=True)
+
+        mask = self._masks[0]
+        while mask:
+            low = mask & -mask
+            self._levels[0][low.bit_length() - 1].sort(reverse=True)
+            mask ^= low
+
+    def _find_head(self):
+        """ 找到最早到期的第0层槽，必要时推进游标并把上层的槽下放，队列为空时返回None """
+        while True:
+            idx = self._first_slot(0, self._cursor - self._cursor_sec * 1000)
+            if idx is not None:
+                self._head_idx = idx
+                self._head = self._levels[0][idx]
+                return self._head
+
+            for _level, _start in ((1, self._cursor_sec % 60),
+                                   (2, self._cursor_min % 60),
+                                   (3, self._cursor_hour % 24)):
+                idx = self._first_slot(_level, _start)
+                if idx is None:
+                    continue
+
+                bucket = self._levels[_level][idx]
+                self._levels[_level][idx] = None
+                self._masks[_level] &= ~(1 << idx)
+
+                span, size = self._SPANS[_level], self._SIZES[_level]
+                self._set_cursor(self._cursor // (span * size) * (span * size) + idx * span)
+                self._cascade(bucket)
+                break
+            else:
+                if not self._overflow_days:
+                    return None
+
+                # 各层都为空，游标跳到溢出区中最早的那一天，并把当天的消息放回时间轮
+                day = heapq.heappop(self._overflow_days)
+                self._set_cursor(day * self._DAY)
+                self._cascade(self._overflow.pop(day))
+
+    def push(self, item, sort_key=None):
+        """ 入队
+
+        Args:
+            item: 入队元素，不指定sort_key时，item自身作为堆元素比较，比如Message
+            sort_key: 排序键，第一项是毫秒时间戳，指定时以(sort_key, item)元组入队
+        """
+        logger.debug("push queue. item=%s, sort_key=%s", item, sort_key)
+        if sort_key is not None:
+            item = (sort_key, item)
+            ts = sort_key[0]
+        else:
+            ts = item[0]
+
+        if not self._size:
+            # 队列为空时游标对齐到消息所在的那一天，当天的消息都能直接放入时间轮
+            self._set_cursor(ts - ts % self._DAY)
+        self._place(item, ts)
+        self._size += 1
+
+    def pop(self):
+        if self._ready:
+            entry = heapq.heappop(self._ready)
+        else:
+            bucket = self._head or self._find_head()
+            if bucket is None:
+                raise QueueEmptyError()
+            entry = bucket.pop()
+            if not bucket:
+                idx = self._head_idx
+                self._levels[0][idx] = None
+                self._masks[0] &= ~(1 << idx)
+                self._head = self._head_idx = None
+
+        self._size -= 1
+        logger.debug("pop queue. item=%s", entry)
+        return entry[1] if entry.__class__ is tuple else entry
+
+    def top(self):
+        if self._ready:
+            entry = self._ready[0]
+        else:
+            bucket = self._head or self._find_head()
+            if bucket is None:
+                raise QueueEmptyError()
+            entry = bucket[-1]
+        return entry[1] if entry.__class__ is tuple else entry
+
+    def empty(self):
+        return self._size == 0
+
+    def __len__(self):
+        return self._size
+
+
+class _ThreadSafeMixin(object):
+    """ 给队列的读写操作加锁 """
+
     def __init__(self):
-        super(ThreadSafeQueue, self).__init__()
+        super(_ThreadSafeMixin, self).__init__()
 
         self._lock = threading.Lock()
 
     def push(self, *args, **kwargs):
         with self._lock:
-            return super(ThreadSafeQueue, self).push(*args, **kwargs)
+            return super(_ThreadSafeMixin, self).push(*args, **kwargs)
 
     def pop(self):
         with self._lock:
-            return super(ThreadSafeQueue, self).pop()
+            return super(_ThreadSafeMixin, self).pop()
 
     def top(self):
         with self._lock:
-            return super(ThreadSafeQueue, self).top()
+            return super(_ThreadSafeMixin, self).top()
 
     def empty(self):
         with self._lock:
-            return super(ThreadSafeQueue, self).empty()
+            return super(_ThreadSafeMixin, self).empty()
+
+
+class ThreadSafeQueue(_ThreadSafeMixin, PriorityQueue):
+    """
+    Usage:
+        线程安全的优先队列
+    """
+
+
+class ThreadSafeTimingWheelQueue(_ThreadSafeMixin, TimingWheelQueue):
+    """
+    Usage:
+        线程安全的时间轮队列
+    """
+
+
+_queue_backends = {
+    "heap": (PriorityQueue, ThreadSafeQueue),
+    "timing_wheel": (TimingWheelQueue, ThreadSafeTimingWheelQueue),
+}
+
+
+def create_queue(backend="heap", thread_safe=True):
+    """ 根据配置创建事件队列
+
+    Args:
+        backend: "heap" 二叉堆；"timing_wheel" 分层时间轮
+        thread_safe: 是否需要线程安全
+    """
+    try:
+        queue_cls, thread_safe_queue_cls = _queue_backends[backend]
+    except KeyError:
+        raise ConfigError(f"不支持的事件队列类型：{backend}，只支持{list(_queue_backends)}")
+    return thread_safe_queue_cls() if thread_safe else queue_cls()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import datetime
+from urllib.parse import quote, unquote
+
+import portalocker
+
+from ..common.exceptions import TaskError
+from ..common.log import sys_logger
+
+from .config import get_config
+
+
+logger = sys_logger.getChild("registry")
+
+
+class TaskRegistry(object):
+    """
+    Usage:
+        实盘任务注册表，位于运行时目录的tasks目录下，每个任务对应两个文件：
+            <任务名称>.lock: 任务进程运行期间一直持有该文件的排他锁，进程退出（包括被强制杀掉）时由系统释放，
+                能否拿到锁即可判断同名任务是否在运行，不需要遍历机器上的所有进程，也不需要管理员权限
+            <任务名称>.json: 任务信息，包括pid、策略代码路径、日志路径、启动时间等
+
+        锁文件不会被删除，避免删除后新建的同名文件被另一个进程加锁，出现两个进程各自持有一把锁的情况；
+        进程异常退出时残留的json文件在下次读取时清理
+
+        任务信息中包含控制通道的authkey，tasks目录权限为0700、json文件权限为0600，只有任务所属用户可以读取
+    """
+
+    # 获取锁失败时的重试次数和间隔，避免其他进程检查任务状态时短暂持有锁导致误判
+    LOCK_RETRY = 3
+    LOCK_RETRY_INTERVAL = 0.05
+
+    def __init__(self, root=None):
+        """
+        Args:
+            root: 运行时目录，默认使用配置中的RUNTIME_DIR
+        """
+        root = root or get_config().RUNTIME_DIR
+        self._dir = os.path.join(os.path.abspath(os.path.expanduser(root)), "tasks")
+
+    @property
+    def dir(self):
+        return self._dir
+
+    def _path(self, name, ext):
+        return os.path.join(self._dir, quote(name, safe="") + ext)
+
+    @staticmethod
+    def _try_lock(path):
+        """ 尝试获取path的排他锁，成功时返回打开的文件对象，锁被其他进程持有时返回None """
+        fp = open(path, "a+")
+        try:
+            portalocker.lock(fp, portalocker.LOCK_EX | portalocker.LOCK_NB)
+        except (BlockingIOError, portalocker.exceptions.LockException):
+            fp.close()
+            return None
+        return fp
+
+    @staticmethod
+    def _unlock(fp):
+        try:
+            portalocker.unlock(fp)
+        finally:
+            fp.close()
+
+    def register(self, name, **info):
+        """ 注册任务，同名任务已经在运行时抛出TaskError
+
+        Args:
+            name: 任务名称
+            info: 任务信息，写入json文件
+
+        Returns:
+            TaskHandle，任务进程退出前需要一直持有
+        """
+        if not os.path.isdir(self._dir):
+            os.makedirs(self._dir, mode=0o700, exist_ok=True)
+        # 旧版本创建的目录权限可能是0755
+        os.chmod(self._dir, 0o700)
+
+        lock_path = self._path(name, ".lock")
+        for _i in range(self.LOCK_RETRY):
+            fp = self._try_lock(lock_path)
+            if fp is not None:
+                break
+            time.sleep(self.LOCK_RETRY_INTERVAL)
+        else:
+            running = self._read_info(name) or {}
+            raise TaskError(f"检测到机器上已经运行了任务：{name}（pid={running.get('pid')}），不能重复运行名称相同的任务，"
+                            f"需要停止该重复任务或修改当前任务名称避免重复")
+
+        fp.seek(0)
+        fp.truncate()
+        fp.write(str(os.getpid()))
+        fp.flush()
+
+        handle = TaskHandle(self, name, fp)
+        info.update(name=name, pid=os.getpid(), start_time=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        handle.update(**info)
+        logger.info(f"注册任务：{name}，注册表目录：{self._dir}")
+        return handle
+
+    def is_running(self, name):
+        """ 任务是否在运行 """
+        lock_path = self._path(name, ".lock")
+        if not os.path.exists(lock_path):
+            return False
+        fp = self._try_lock(lock_path)
+        if fp is None:
+            return True
+        self._unlock(fp)
+        return False
+
+    def get_task(self, name):
+        """ 获取运行中的任务信息，任务不在运行时返回None """
+        info = self._read_info(name)
+        if info is None:
+            return None
+        if not self.is_running(name):
+            logger.info(f"清理已退出任务的注册信息：{name}，pid={info.get('pid')}")
+            self._remove_info(name, info.get("pid"))
+            return None
+        return info
+
+    def get_tasks(self):
+        """ 获取所有运行中的任务信息 """
+        if not os.path.isdir(self._dir):
+            return []
+        tasks = []
+        for _file in sorted(os.listdir(self._dir)):
+            if not _file.endswith(".json"):
+                continue
+            _info = self.get_task(unquote(_file[:-len(".json")]))
+            if _info is not None:
+                tasks.append(_info)
+        return tasks
+
+    def _read_info(self, name):
+        path = self._path(name, ".json")
+        try:
+            with open(path, "r") as rf:
+                return json.load(rf)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"读取任务注册信息失败，path={path}，error={e}")
+            return None
+
+    def _write_info(self, name, info):
+        path = self._path(name, ".json")
+        tmp_path = path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        if hasattr(os, "fchmod"):
+            # 残留的临时文件权限可能不是0600
+            os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "w") as wf:
+            json.dump(info, wf, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _remove_info(self, name, pid):
+        # 只删除指定进程的注册信息，避免误删刚启动的同名任务的注册信息
+        info = self._read_info(name)
+        if info is not None and info.get("pid") == pid:
+            try:
+                os.remove(self._path(name, ".json"))
+            except FileNotFoundError:
+                pass
+
+
+class TaskHandle(object):
+    """
+    Usage:
+        已注册任务的句柄，持有任务的排他锁，release或进程退出时释放
+    """
+
+    def __init__(self, registry, name, fp):
+        self._registry = registry
+        self._name = name
+        self._fp = fp
+        self._info = {}
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def info(self):
+        return dict(self._info)
+
+    def update(self, **info):
+        """ 更新任务信息 """
+        self._info.update(info)
+        self._registry._write_info(self._name, self._info)
+
+    def release(self):
+        if self._fp is None:
+            return
+        logger.info(f"注销任务：{self._name}")
+        self._registry._remove_info(self._name, self._info.get("pid"))
+        self._registry._unlock(self._fp)
+        self._fp = None
@@ -1,36 +1,30 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
+import signal
+import functools
 
-from ..common.exceptions import TaskError
+from ..common.exceptions import TaskError, ConfigError
 from ..common.log import sys_logger, setup_file_logger, setup_logger
 
 from .loader import Loader
 from .strategy import Strategy
 from .event_source import EventSourceScheduler
-from .loop import EventLoop
+from .loop import create_event_loop
 from .bus import EventBus
 from .context import Context
-from .utils import get_activate_task_process, parse_task_info, parse_env
+from .clock import setup_clock
+from .trade_calendar import setup_calendar
+from .startup import StartupProfiler
+from .registry import TaskRegistry
+from .control import ControlServer
+from .utils import parse_env
 from .config import setup_scheduler_config, get_config as get_scheduler_config
 
 
 logger = sys_logger.getChild("runner")
 
 
-def _exist_repeated_task(task_name):
-    current_pid = os.getpid()
-    parent_pid = os.getppid()
-
-    active_tasks = get_activate_task_process()
-    for _task in active_tasks:
-        if _task.pid in (current_pid, parent_pid):
-            continue
-        _task_info = parse_task_info(_task.cmdline())
-        if task_name == _task_info["name"]:
-            return True
-
-
 class TaskRunner(object):
     """
     Usage:
@@ -39,16 +33,13 @@ class TaskRunner(object):
         3. 启动策略进程
     """
 
-    def __init__(self, code_file, out_file, task_name, env, debug=False, config=None):
+    def __init__(self, code_file, out_file, task_name, env, debug=False, config=None, profiler=None):
         if not os.path.exists(code_file):
             raise FileNotFoundError(f"未找到策略代码文件，path={code_file}")
         self._code_file = code_file
 
-        if _exist_repeated_task(task_name):
-            raise TaskError(f"检测到机器上已经运行了任务：{task_name}，不能重复运行名称相同的任务，"
-                            f"需要停止该重复任务或修改当前任务名称避免重复")
-
-        self._task_name = task_name
+        # 启动耗时统计，由命令行入口创建时包含导入jqtrade模块的耗时
+        self._profiler = profiler or StartupProfiler()
 
         self._debug = debug
         log_level = "DEBUG" if debug else "INFO"
@@ -58,37 +49,227 @@ class TaskRunner(object):
         else:
             setup_logger(log_level)
 
+        self._task_name = task_name
+
         self._env = parse_env(env) if env else {}
         os.environ.update(self._env)
         if "PYTHONPATH" in self._env:
             for _py_path in reversed(self._env["PYTHONPATH"].split(":")):
                 sys.path.insert(0, _py_path)
 
-        if config:
-            path = os.path.abspath(os.path.expanduser(config))
-            if not os.path.exists(path):
-                raise FileNotFoundError(f"找不到自定义配置文件: {path}")
-        self._config = config
+        # 注册任务前加载自定义配置，任务注册表使用配置的运行时目录
+        with self._profiler.phase("加载配置"):
+            if config:
+                path = os.path.abspath(os.path.expanduser(config))
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"找不到自定义配置文件: {path}")
+                logger.info(f"scheduler模块加载用户自定义配置：{config}")
+                setup_scheduler_config(config)
+            self._config = config
+
+        # 在任务注册表中注册任务，同名任务已经在运行时抛出TaskError，进程运行期间一直持有任务锁
+        with self._profiler.phase("注册任务"):
+            self._registry = TaskRegistry()
+            self._task_handle = self._registry.register(
+                task_name, code=[os.path.abspath(_f) for _f in getattr(self, "_code_files", [code_file])],
+                out=out_file, env=env, debug=debug, config=config, cmd=sys.argv)
+
+    def _setup_env(self):
+        scheduler_config = get_scheduler_config()
+        if scheduler_config.CLOCK != "real":
+            logger.warning(f"当前使用的时钟模式为：{scheduler_config.CLOCK}，实盘中请勿开启")
+        setup_clock(scheduler_config.CLOCK)
+        setup_calendar(scheduler_config.TRADING_CALENDAR)
+        return scheduler_config
 
     def run(self):
         logger.info(f"开始启动策略进程。策略代码路径：{self._code_file}, 日志文件：{self._out_file}, "
                     f"任务名称：{self._task_name}，环境变量：{self._env}, debug模式：{self._debug}")
 
-        if self._config:
-            logger.info(f"scheduler模块加载用户自定义配置：{self._config}")
-            setup_scheduler_config(self._config)
+        with self._profiler.phase("初始化时钟和交易日历"):
+            scheduler_config = self._setup_env()
+
+        with self._profiler.phase("创建事件循环"):
+            event_loop = create_event_loop(scheduler_config.LOOP_BACKEND)
+            context = Context(task_name=self._task_name,
+                              event_bus=EventBus(),
+                              loop=event_loop,
+                              scheduler=EventSourceScheduler(),
+                              loader=Loader(self._code_file),
+                              debug=self._debug,
+                              config=self._config,
+                              out=self._out_file)
+
+        with self._profiler.phase("加载策略代码"):
+            strategy = Strategy(context)
+
+        with self._profiler.phase("初始化策略"):
+            strategy.setup()
+            self._register_reload(event_loop, [strategy])
+
+        self._finish_startup(scheduler_config, strategy)
+        control = self._start_control_server(scheduler_config, context, [strategy])
+
+        try:
+            event_loop.run()
+        finally:
+            if control:
+                control.close()
+            context.close()
+            self._dump_loop_stats(event_loop, strategy)
+            self._task_handle.release()
+
+    @staticmethod
+    def _register_reload(event_loop, strategies):
+        """ 收到SIGHUP信号（reload_task命令）时，在事件循环线程中重新加载策略代码 """
+        if not hasattr(signal, "SIGHUP"):
+            logger.warning("当前系统不支持SIGHUP信号，不支持重新加载策略代码")
+            return
+
+        def _reload(sig):
+            for _strategy in strategies:
+                _strategy.reload()
+
+        event_loop.register_signal_callback(signal.SIGHUP, _reload)
+
+    def _finish_startup(self, scheduler_config, strategy):
+        self._profiler.finish(scheduler_config.STARTUP_BUDGET)
+        if self._profiler.profile_imports:
+            path = os.path.join(strategy.runtime_dir, "stats", f"{self._task_name}_startup_profile.json")
+            try:
+                self._profiler.dump(path)
+            except Exception as e:
+                logger.exception(f"写入启动耗时分布失败，path={path}, error={e}")
+
+    def _start_control_server(self, scheduler_config, context, strategies):
+        if not scheduler_config.CONTROL_SERVER:
+            return None
+        control = ControlServer(context, strategies, self._task_handle, self._registry.dir)
+        try:
+            control.start()
+        except Exception as e:
+            # 控制通道只用于运维，启动失败不影响策略运行
+            logger.exception(f"启动任务控制通道失败，error={e}")
+            return None
+        return control
+
+    def _dump_loop_stats(self, event_loop, strategy):
+        path = os.path.join(strategy.runtime_dir, "stats", f"{self._task_name}_loop_stats.json")
+        try:
+            event_loop.stats.dump(path)
+        except Exception as e:
+            logger.exception(f"写入事件循环统计数据失败，path={path}, error={e}")
+
+
+def get_strategy_name(code_file):
+    """ 多策略模式下的策略名称，即策略文件名（不含扩展名） """
+    return os.path.basename(code_file).split(".")[0]
+
+
+def setup_strategies(ctx, code_files, gate_factory=None):
+    """ 在同一个根上下文中加载并初始化多个策略
+
+    所有策略共享根上下文的事件循环、事件总线、调度器、线程池/进程池，以及同一个trade gate和账户同步；
+    每个策略有自己的上下文、用户命名空间（策略模块）、账户和订单
+
+    Args:
+        ctx: 根上下文
+        code_files: 策略代码路径列表
+        gate_factory: 创建真实trade gate的函数，默认按account配置的TRADE_GATE创建
+
+    Returns:
+        Strategy对象列表
+    """
+    shared = {}
+
+    def _create_trade_gate(name):
+        if "gate" not in shared:
+            from ..account.shared import SharedTradeGate
+            shared["gate"] = SharedTradeGate(ctx, gate_factory)
+        return shared["gate"].create_gate(name)
+
+    strategies = []
+    for _code_file in code_files:
+        _name = get_strategy_name(_code_file)
+        _ctx = Context(task_name=ctx.task_name,
+                       event_bus=ctx.event_bus,
+                       loop=ctx.loop,
+                       scheduler=ctx.scheduler,
+                       loader=Loader(_code_file),
+                       debug=ctx.debug,
+                       config=ctx.config,
+                       out=ctx.out,
+                       start=ctx.start,
+                       end=ctx.end,
+                       parent=ctx,
+                       strategy_name=_name)
+        _ctx.trade_gate_factory = functools.partial(_create_trade_gate, _name)
+        strategies.append(Strategy(_ctx))
+
+    # 没有切换到具体策略时（比如账户同步、trade gate内部逻辑），使用根上下文
+    Context.set_instance(ctx)
+
+    # 交易日历是进程级的，set_options设置的交易日历对所有策略的定时任务都生效，所有策略必须使用相同的交易日历
+    calendars = []
+    for _strategy in strategies:
+        logger.info(f"初始化策略：{_strategy.name}")
+        _strategy.setup()
+
+        _calendar = _strategy.options.get("trading_calendar", get_scheduler_config().TRADING_CALENDAR)
+        if calendars and _calendar != calendars[0][1]:
+            raise ConfigError(f"多策略模式下所有策略必须使用相同的交易日历，策略{_strategy.name}的交易日历"
+                              f"{_calendar}与策略{calendars[0][0]}的{calendars[0][1]}不一致")
+        calendars.append((_strategy.name, _calendar))
+    return strategies
+
+
+class MultiStrategyRunner(TaskRunner):
+    """
+    Usage:
+        在一个进程中运行多个策略，所有策略共享事件循环、定时器、trade gate和账户同步（同一时刻只读取一次交易接口），
+        每个策略有独立的用户命名空间、账户和订单，同步到的订单只分发给下单的策略
+    """
+
+    def __init__(self, code_files, out_file, task_name, env, debug=False, config=None, profiler=None):
+        names = [get_strategy_name(_code_file) for _code_file in code_files]
+        if len(set(names)) != len(names):
+            raise TaskError(f"多策略模式下策略文件名不能重复：{code_files}")
+        for _code_file in code_files[1:]:
+            if not os.path.exists(_code_file):
+                raise FileNotFoundError(f"未找到策略代码文件，path={_code_file}")
+        self._code_files = code_files
+        super(MultiStrategyRunner, self).__init__(code_files[0], out_file, task_name, env, debug, config, profiler)
+
+    def run(self):
+        logger.info(f"开始启动多策略进程。策略代码路径：{self._code_files}, 日志文件：{self._out_file}, "
+                    f"任务名称：{self._task_name}，环境变量：{self._env}, debug模式：{self._debug}")
+
+        with self._profiler.phase("初始化时钟和交易日历"):
+            scheduler_config = self._setup_env()
+
+        with self._profiler.phase("创建事件循环"):
+            event_loop = create_event_loop(scheduler_config.LOOP_BACKEND)
+            context = Context(task_name=self._task_name,
+                              event_bus=EventBus(),
+                              loop=event_loop,
+                              scheduler=EventSourceScheduler(),
+                              loader=None,
+                              debug=self._debug,
+                              config=self._config,
+                              out=self._out_file)
 
-        event_loop = EventLoop()
-        context = Context(task_name=self._task_name,
-                          event_bus=EventBus(),
-                          loop=event_loop,
-                          scheduler=EventSourceScheduler(),
-                          loader=Loader(self._code_file),
-                          debug=self._debug,
-                          config=self._config,
-                          out=self._out_file)
+        with self._profiler.phase("加载并初始化策略"):
+            strategies = setup_strategies(context, self._code_files)
+            self._register_reload(event_loop, strategies)
 
-        strategy = Strategy(context)
-        strategy.setup()
+        self._finish_startup(scheduler_config, strategies[0])
+        control = self._start_control_server(scheduler_config, context, strategies)
 
-        event_loop.run()
+        try:
+            event_loop.run()
+        finally:
+            if control:
+                control.close()
+            context.close()
+            self._dump_loop_stats(event_loop, strategies[0])
+            self._task_handle.release()
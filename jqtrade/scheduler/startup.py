@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import builtins
+import datetime
+import threading
+from contextlib import contextmanager
+
+from ..common.log import sys_logger
+
+
+logger = sys_logger.getChild("startup")
+
+
+class StartupProfiler(object):
+    """
+    Usage:
+        记录策略进程启动各阶段的耗时，启动完成（首个定时任务就绪）时输出总耗时，超出预算时告警
+
+        开启profile_imports时，同时记录启动过程中每个新导入模块的耗时（累计耗时包含其导入的子模块，
+        自身耗时不包含），结果通过dump写入json文件；python3.7+也可以使用 `python -X importtime` 查看更细的导入耗时
+    """
+
+    # dump时输出累计耗时最多的模块数量
+    TOP_IMPORTS = 50
+
+    def __init__(self, profile_imports=False):
+        self._start = time.perf_counter()
+        self._phases = []
+        self._total = None
+
+        self._profile_imports = profile_imports
+        self._imports = []
+        self._import_stack = []
+        self._orig_import = None
+        self._hooked = False
+        self._thread_id = threading.get_ident()
+        if profile_imports:
+            self._install_import_hook()
+
+    @property
+    def profile_imports(self):
+        return self._profile_imports
+
+    @contextmanager
+    def phase(self, name):
+        """ 统计with语句块的耗时，作为一个启动阶段 """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self._phases.append((name, duration))
+            logger.info(f"启动阶段[{name}]耗时{duration:.3f}秒")
+
+    def finish(self, budget=None):
+        """ 启动完成，返回启动总耗时，单位：秒
+
+        Args:
+            budget: 启动耗时预算，单位：秒，超出时记录告警日志
+        """
+        self._uninstall_import_hook()
+        self._total = time.perf_counter() - self._start
+        phases = "，".join(f"{_name}: {_duration:.3f}秒" for _name, _duration in self._phases)
+        logger.info(f"策略进程启动完成，首个定时任务已就绪，总耗时{self._total:.3f}秒（{phases}）")
+        if budget is not None and self._total > budget:
+            logger.warning(f"策略进程启动耗时{self._total:.3f}秒，超出预算{budget}秒，可以使用--profile-startup选项查看耗时分布")
+        return self._total
+
+    def _install_import_hook(self):
+        self._orig_import = builtins.__import__
+        builtins.__import__ = self._import
+        self._hooked = True
+
+    def _uninstall_import_hook(self):
+        if not self._hooked:
+            return
+        self._hooked = False
+        if builtins.__import__ == self._import:
+            builtins.__import__ = self._orig_import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        orig_import = self._orig_import
+        if level and globals:
+            # 相对导入，换算成完整的模块名
+            package = globals.get("__package__") or ""
+            base = package.rsplit(".", level - 1)[0] if level > 1 else package
+            full_name = f"{base}.{name}" if name else base
+        else:
+            full_name = name
+
+        if not self._hooked or threading.get_ident() != self._thread_id:
+            return orig_import(name, globals, locals, fromlist, level)
+
+        # 只统计首次导入的模块，包括 `from package import submodule` 导入的子模块
+        targets = [full_name] if full_name not in sys.modules else []
+        for _item in fromlist or ():
+            if _item != "*" and f"{full_name}.{_item}" not in sys.modules:
+                targets.append(f"{full_name}.{_item}")
+        if not targets:
+            return orig_import(name, globals, locals, fromlist, level)
+
+        self._import_stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return orig_import(name, globals, locals, fromlist, level)
+        finally:
+            duration = time.perf_counter() - start
+            children = self._import_stack.pop()
+            if self._import_stack:
+                self._import_stack[-1] += duration
+            imported = [_target for _target in targets if _target in sys.modules]
+            if imported:
+                self._imports.append((",".join(imported), duration, duration - children))
+
+    def report(self):
+        """ 启动耗时分布，单位：秒 """
+        imports = sorted(self._imports, key=lambda _item: _item[1], reverse=True)[:self.TOP_IMPORTS]
+        return {
+            "total": self._total,
+            "phases": [{"name": _name, "duration": _duration} for _name, _duration in self._phases],
+            "imports": [{"module": _name, "cumulative": _cumulative, "self": _self}
+                        for _name, _cumulative, _self in imports],
+        }
+
+    def dump(self, path):
+        """ 把启动耗时分布以json格式写入path """
+        dir_name = os.path.dirname(path)
+        if dir_name and not os.path.isdir(dir_name):
+            os.makedirs(dir_name)
+        data = {
+            "dump_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "unit": "s",
+        }
+        data.update(self.report())
+        with open(path, "w") as wf:
+            json.dump(data, wf, indent=2, ensure_ascii=False)
+        logger.info(f"启动耗时分布已写入：{path}")
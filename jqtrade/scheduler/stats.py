@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import datetime
+
+from ..common.log import sys_logger
+
+
+logger = sys_logger.getChild("stats")
+
+
+class Histogram(object):
+    """
+    Usage:
+        HDR风格的对数-线性直方图，记录非负整数（比如微秒），记录一次只需要计算桶下标并累加计数，
+        内存占用只和值域的数量级有关，和记录次数无关
+
+        小于 2**SUB_BITS 的值每个值一个桶（精确）；更大的值按2的幂次分段，每段再均分为 2**(SUB_BITS-1) 个桶，
+        SUB_BITS=7 时相对误差不超过 1/64（约1.6%）
+    """
+
+    SUB_BITS = 7
+    _SUB_COUNT = 1 << SUB_BITS
+    _HALF_COUNT = _SUB_COUNT >> 1
+
+    __slots__ = ("_counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self._counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def _index(cls, value):
+        if value < cls._SUB_COUNT:
+            return value
+        shift = value.bit_length() - cls.SUB_BITS
+        return cls._SUB_COUNT + (shift - 1) * cls._HALF_COUNT + (value >> shift) - cls._HALF_COUNT
+
+    @classmethod
+    def _upper_bound(cls, idx):
+        """ 桶内的最大值 """
+        if idx < cls._SUB_COUNT:
+            return idx
+        shift, mantissa = divmod(idx - cls._SUB_COUNT, cls._HALF_COUNT)
+        shift += 1
+        return ((mantissa + cls._HALF_COUNT + 1) << shift) - 1
+
+    def record(self, value):
+        value = int(value)
+        if value < 0:
+            value = 0
+        idx = self._index(value)
+        counts = self._counts
+        counts[idx] = counts.get(idx, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """ 返回percent分位数（0~100），值为所在桶的上界，不超过记录过的最大值 """
+        if not self.count:
+            return 0
+        target = max(1, int(round(self.count * percent / 100.0)))
+        accumulated = 0
+        for _idx in sorted(self._counts):
+            accumulated += self._counts[_idx]
+            if accumulated >= target:
+                return min(self._upper_bound(_idx), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def summary(self, scale=1.0):
+        """ 统计摘要，scale用于单位换算，比如微秒转毫秒传入0.001 """
+        return {
+            "count": self.count,
+            "min": (self.min or 0) * scale,
+            "mean": self.mean * scale,
+            "p50": self.percentile(50) * scale,
+            "p90": self.percentile(90) * scale,
+            "p99": self.percentile(99) * scale,
+            "p999": self.percentile(99.9) * scale,
+            "max": (self.max or 0) * scale,
+        }
+
+
+class LoopStats(object):
+    """
+    Usage:
+        事件循环按事件类统计的调度延迟（消息实际处理时间 - 消息计划时间）和回调执行耗时，单位：微秒，常开；
+        同时按消息车道汇总，用于确认critical车道的消息没有被其他车道推迟
+    """
+
+    def __init__(self):
+        # label -> (lag直方图, 耗时直方图)
+        self._hists = {}
+
+        # lane -> (lag直方图, 耗时直方图)
+        self._lane_hists = {}
+
+        # 设置了deadline的定时任务，label -> (超时时长直方图, [因上一次仍在执行而跳过的次数])
+        self._overruns = {}
+
+    def record(self, label, lag_us, duration_us, lane=None):
+        hists = self._hists.get(label)
+        if hists is None:
+            hists = self._hists[label] = (Histogram(), Histogram())
+        hists[0].record(lag_us)
+        hists[1].record(duration_us)
+
+        if lane is not None:
+            hists = self._lane_hists.get(lane)
+            if hists is None:
+                hists = self._lane_hists[lane] = (Histogram(), Histogram())
+            hists[0].record(lag_us)
+            hists[1].record(duration_us)
+
+    def get(self, label):
+        """ 返回(lag直方图, 耗时直方图)，没有记录时返回None """
+        return self._hists.get(label)
+
+    def snapshot(self):
+        """ 各事件类的统计摘要，单位：毫秒
+
+        Returns:
+            {label: {"lag": {...}, "duration": {...}}}，摘要字段见Histogram.summary
+        """
+        return {_label: {"lag": _lag.summary(0.001), "duration": _duration.summary(0.001)}
+                for _label, (_lag, _duration) in self._hists.items()}
+
+    def _get_overrun(self, label):
+        overrun = self._overruns.get(label)
+        if overrun is None:
+            overrun = self._overruns[label] = (Histogram(), [0])
+        return overrun
+
+    def record_overrun(self, label, overrun_us):
+        """ 记录一次超过截止时间的执行，overrun_us为超出的微秒数 """
+        self._get_overrun(label)[0].record(overrun_us)
+
+    def record_skip(self, label):
+        """ 记录一次因上一次仍在执行而跳过的执行 """
+        self._get_overrun(label)[1][0] += 1
+
+    def overrun_snapshot(self):
+        """ 定时任务的超时统计，单位：毫秒
+
+        Returns:
+            {label: {"overruns": 超时次数, "skipped": 跳过次数, "overrun": {...}}}，overrun为超出截止时间的时长分布，
+            字段见Histogram.summary
+        """
+        return {_label: {"overruns": _hist.count, "skipped": _skipped[0], "overrun": _hist.summary(0.001)}
+                for _label, (_hist, _skipped) in self._overruns.items()}
+
+    def get_lane(self, lane):
+        """ 返回车道的(lag直方图, 耗时直方图)，没有记录时返回None """
+        return self._lane_hists.get(lane)
+
+    def lane_snapshot(self):
+        """ 各车道的统计摘要，单位：毫秒，格式同snapshot，key是车道名称 """
+        return {_lane: {"lag": _lag.summary(0.001), "duration": _duration.summary(0.001)}
+                for _lane, (_lag, _duration) in self._lane_hists.items()}
+
+    def reset(self):
+        self._hists = {}
+        self._lane_hists = {}
+        self._overruns = {}
+
+    def dump(self, path):
+        """ 把统计摘要以json格式写入path """
+        dir_name = os.path.dirname(path)
+        if dir_name and not os.path.isdir(dir_name):
+            os.makedirs(dir_name)
+        data = {
+            "dump_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "unit": "ms",
+            "stats": self.snapshot(),
+            "lanes": self.lane_snapshot(),
+            "overruns": self.overrun_snapshot(),
+        }
+        with open(path, "w") as wf:
+            json.dump(data, wf, indent=2, ensure_ascii=False)
+        logger.info(f"事件循环统计数据已写入：{path}")
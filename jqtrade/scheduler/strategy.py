@@ -1,17 +1,22 @@
 # -*- coding: utf-8 -*-
 import os
+import asyncio
 import datetime
+from collections import OrderedDict
 
 from importlib import import_module
 
-from ..common.exceptions import InvalidCall, InvalidParam, TaskError, ConfigError
+from ..common.exceptions import InvalidCall, InvalidParam, TaskError, ConfigError, DeadlineExceeded
 from ..common.log import user_logger, sys_logger
 from ..common.utils import parse_time
 
-from .event_source import EventSource
-from .event import create_event_class, EventPriority
+from .event_source import EventSource, IntervalEventSource, TimeExprParser, CronExprParser
+from .event import create_event_class, check_coalesce, check_lane, EventPriority, CoalescePolicy
+from .message import Lane
+from .deadline import CallbackDeadline, check_deadline, deadline_remaining
 from .api import UserContext, strategy_print
 from .config import get_config
+from .trade_calendar import setup_calendar
 
 config = get_config()
 
@@ -36,6 +41,8 @@ class Strategy(object):
                     (datetime.time(9, 30), datetime.time(11, 30)),
                     (datetime.time(13, 0), datetime.time(15, 0)),
                 ]
+            "trading_calendar": str，交易日历，非交易日不触发定时任务和账户同步，支持"weekdays"或本地交易日历文件路径，
+                默认使用配置中的TRADING_CALENDAR
     """
 
     TIME_DICT = {
@@ -55,8 +62,14 @@ class Strategy(object):
 
         self._schedules = []
 
+        # 已经生效的定时任务，key: 定时任务标识（见_schedule_key），val: {"event_cls", "schedule_id", "handler"}
+        self._scheduled = OrderedDict()
+
         self._is_scheduler_allowed = False
 
+        # 是否正在重新加载策略代码
+        self._reloading = False
+
         self._schedule_count = 0
 
         self._options = {}
@@ -65,20 +78,29 @@ class Strategy(object):
         logger.info("setup strategy")
         self.make_apis()
 
-        if hasattr(self._user_module, "process_initialize"):
-            # 只允许在process_initialize中调用run_daily设置每日定时任务
-            self._is_scheduler_allowed = True
-            logger.info("执行用户process_initialize函数")
-            self._user_module.process_initialize(self._user_ctx)
-            self._is_scheduler_allowed = False
-        else:
-            raise TaskError("策略代码中未定义process_initialize函数")
+        with self._ctx.activate():
+            if hasattr(self._user_module, "process_initialize"):
+                # 只允许在process_initialize中调用run_daily设置每日定时任务
+                self._is_scheduler_allowed = True
+                logger.info("执行用户process_initialize函数")
+                self._user_module.process_initialize(self._user_ctx)
+                self._is_scheduler_allowed = False
+            else:
+                raise TaskError("策略代码中未定义process_initialize函数")
 
-        self.schedule()
+            self.schedule()
 
     def make_apis(self):
         # 调度模块相关API
         self._user_module.run_daily = self.run_daily
+        self._user_module.run_weekly = self.run_weekly
+        self._user_module.run_monthly = self.run_monthly
+        self._user_module.run_cron = self.run_cron
+        self._user_module.check_deadline = check_deadline
+        self._user_module.deadline_remaining = deadline_remaining
+        self._user_module.submit_compute = self.submit_compute
+        self._user_module.warm_up_compute = self.warm_up_compute
+        self._user_module.get_loop_stats = self.get_loop_stats
         self._user_module.log = user_logger
         self._user_module.context = self._user_ctx
         self._user_module.set_options = self.set_options
@@ -90,62 +112,462 @@ class Strategy(object):
             for _name in account_api.__all__:
                 setattr(self._user_module, _name, getattr(account_api, _name))
 
-    def wrap_user_callback(self, callback):
-        def _callback(event):
-            return callback(self._user_ctx)
-        return _callback
+    def wrap_user_callback(self, callback, timeout=None, executor=None, deadline=None, skip_if_running=False):
+        # 回调都在策略自己的上下文中执行，多策略模式下用户调用的API（下单、查询等）作用于所属策略；
+        # 线程池任务、协程任务在提交时复制当前上下文
+        ctx = self._ctx
+        name = callback.__name__
+
+        if deadline is None and not skip_if_running and executor != "thread" \
+                and not asyncio.iscoroutinefunction(callback):
+            def _callback(event):
+                with ctx.activate():
+                    return callback(self._user_ctx)
+            return _callback
+
+        # 还未结束的执行次数，线程池任务、协程任务的上一次执行可能还没有结束
+        running = [0]
+
+        def _start(event):
+            """ 开始一次执行，返回本次执行的截止时间，未设置deadline时返回None，需要跳过本次执行时返回False """
+            label = event.__class__.__name__
+            if skip_if_running and running[0]:
+                ctx.loop.stats.record_skip(label)
+                logger.warning(f"定时任务上一次执行仍未结束，跳过本次执行：strategy={self.name or ctx.task_name}, "
+                               f"func={name}, event={label}, scheduled={ctx.loop.strategy_dt}")
+                return False
+            running[0] += 1
+            if deadline is None:
+                return None
+            lag = (ctx.loop.get_current_time() - (ctx.loop.strategy_time or ctx.loop.get_current_time())) / 1000.0
+            return CallbackDeadline(name, label, deadline, lag, scheduled=ctx.loop.strategy_dt)
+
+        def _finish(token):
+            running[0] -= 1
+            if token is None:
+                return
+            token.finish()
+            if token.overrun > 0:
+                ctx.loop.stats.record_overrun(token.label, int(token.overrun * 1000000))
+                logger.warning(f"定时任务超过截止时间：strategy={self.name or ctx.task_name}, func={name}, "
+                               f"event={token.label}, scheduled={token.scheduled}, deadline={token.deadline}s, "
+                               f"elapsed={token.elapsed:.3f}s, overrun={token.overrun:.3f}s")
+
+        def _run(token):
+            try:
+                if token is None:
+                    return callback(self._user_ctx)
+                with token.activate():
+                    return callback(self._user_ctx)
+            except DeadlineExceeded as e:
+                logger.warning(f"定时任务已取消：{e}")
+            finally:
+                if token is not None:
+                    token.finish()
+
+        if executor == "thread":
+            def _run_pinned(token, snapshot):
+                if snapshot is None:
+                    return _run(token)
+                with ctx.account.pin_snapshot(snapshot):
+                    return _run(token)
+
+            # 在线程池中运行，事件循环继续处理其他事件，执行完成后结果和异常通过消息发回事件循环线程。
+            # 提交时固定账户快照，执行期间事件循环线程中的账户同步不影响函数读取到的资金、持仓、订单
+            def _thread_callback(event):
+                token = _start(event)
+                if token is False:
+                    return
+                try:
+                    with ctx.activate():
+                        snapshot = ctx.account.snapshot if ctx.use_account else None
+                        return ctx.executor.submit(_run_pinned, token, snapshot, name=name,
+                                                   on_finish=lambda _future: _finish(token))
+                except Exception:
+                    # 没有提交到线程池（比如线程池已关闭）时不会调用on_finish，需要在这里结束本次执行，
+                    # 否则skip_if_running会一直跳过后续的执行
+                    _finish(token)
+                    raise
+            return _thread_callback
+
+        if asyncio.iscoroutinefunction(callback):
+            # async def定时任务以协程任务的方式在事件循环中运行，不阻塞其他事件
+            async def _run_async(token):
+                try:
+                    if token is None:
+                        return await callback(self._user_ctx)
+                    with token.activate():
+                        return await callback(self._user_ctx)
+                except DeadlineExceeded as e:
+                    logger.warning(f"定时任务已取消：{e}")
+                finally:
+                    _finish(token)
+
+            def _async_callback(event):
+                token = _start(event)
+                if token is False:
+                    return
+                with ctx.activate():
+                    return ctx.loop.create_task(_run_async(token), timeout=timeout, name=name)
+            return _async_callback
+
+        def _sync_callback(event):
+            token = _start(event)
+            try:
+                with ctx.activate():
+                    return _run(token)
+            finally:
+                _finish(token)
+        return _sync_callback
 
     def schedule(self):
-        for _desc in self._schedules:
-            logger.info(f"设置定时任务: {_desc}")
+        for _key, _desc in self._keyed_schedules():
+            self._scheduled[_key] = self._schedule_one(_desc)
 
-            _callback = self._get_handle(_desc['name'])
-            _cls_name = f"Scheduler_{_desc['name']}_{self._schedule_count}"
+    @staticmethod
+    def _schedule_key(desc):
+        """ 定时任务标识，函数名、时间和各项参数都相同的定时任务视为同一个 """
+        return tuple(sorted(desc.items()))
 
+    def _keyed_schedules(self):
+        # 同一个函数在同一时间设置多次时，用出现次数区分
+        counts = {}
+        for _desc in self._schedules:
+            _key = self._schedule_key(_desc)
+            counts[_key] = counts.get(_key, 0) + 1
+            yield (_key, counts[_key]), _desc
+
+    def _wrap_handle(self, desc):
+        return self.wrap_user_callback(self._get_handle(desc['name']), timeout=desc.get("timeout"),
+                                       executor=desc.get("executor"), deadline=desc.get("deadline"),
+                                       skip_if_running=desc.get("skip_if_running", False))
+
+    def _schedule_one(self, desc):
+        return self._register_schedule(desc, *self._build_schedule(desc))
+
+    def _build_schedule(self, desc):
+        """ 根据定时任务描述创建事件类和事件源，不影响正在运行的定时任务，表达式等有误时抛出异常
+
+        Returns:
+            (event_cls, event_source)
+        """
+        _cls_name = self._ctx.event_name(f"Scheduler_{desc['name']}_{self._schedule_count}")
+        # 创建失败的事件类名也不再复用
+        self._schedule_count += 1
+        _event_options = {"coalesce": desc.get("coalesce", CoalescePolicy.ALWAYS),
+                          "max_delay": desc.get("max_delay"),
+                          "precise": desc.get("precise", False),
+                          "lane": desc.get("lane", Lane.NORMAL)}
+
+        schedule_type = desc.get("type", "daily")
+        step = TimeExprParser.parse_interval(desc['time']) if schedule_type == "daily" else None
+        if step:
+            event_cls = create_event_class(_cls_name, priority=EventPriority.EVERY_MINUTE, **_event_options)
+
+            market_period = self._options.get("market_period", config.MARKET_PERIOD)
+            for _period in market_period:
+                if len(_period) != 2:
+                    raise ValueError(f"market period设置错误：{_period}")
+                _start, _end = _period
+                if not (isinstance(_start, datetime.time) and isinstance(_end, datetime.time)):
+                    raise ValueError("market period设置的时间类型错误，需要是datetime.time类型。")
+            event_source = IntervalEventSource(event_cls, step, periods=market_period,
+                                               start=self._ctx.start, end=self._ctx.end)
+        else:
+            event_cls = create_event_class(_cls_name, **_event_options)
             event_source = EventSource(start=self._ctx.start, end=self._ctx.end)
-            event_source.setup()
-            if _desc['time'] == "every_minute":
-                event_cls = create_event_class(_cls_name, priority=EventPriority.EVERY_MINUTE)
-                _today = datetime.date.today()
-
-                market_period = self._options.get("market_period", config.MARKET_PERIOD)
-                for _period in market_period:
-                    if len(_period) != 2:
-                        raise ValueError(f"market period设置错误：{_period}")
-                    _start, _end = _period
-                    if not (isinstance(_start, datetime.time) and isinstance(_end, datetime.time)):
-                        raise ValueError("market period设置的时间类型错误，需要是datetime.time类型。")
-                    _start_dt = datetime.datetime.combine(_today, _start)
-                    _end_dt = datetime.datetime.combine(_today, _end)
-                    _current_dt = _start_dt
-                    while _current_dt <= _end_dt:
-                        event_source.daily(event_cls, _current_dt.strftime("%H:%M:%S"))
-                        _current_dt += datetime.timedelta(minutes=1)
+            if schedule_type == "weekly":
+                event_source.weekly(event_cls, desc["weekday"], desc["time"], force=desc["force"])
+            elif schedule_type == "monthly":
+                event_source.monthly(event_cls, desc["monthday"], desc["time"], force=desc["force"])
+            elif schedule_type == "cron":
+                event_source.cron(event_cls, desc["cron"])
             else:
-                event_cls = create_event_class(_cls_name)
-                event_source.daily(event_cls, _desc["time"])
+                event_source.daily(event_cls, desc["time"])
+        event_source.setup()
+        return event_cls, event_source
+
+    def _register_schedule(self, desc, event_cls, event_source):
+        logger.info(f"设置定时任务: {desc}")
+        handler = self._wrap_handle(desc)
+        self._ctx.event_bus.register(event_cls, handler)
+        schedule_id = self._ctx.scheduler.schedule(event_source)
+        return {"event_cls": event_cls, "schedule_id": schedule_id, "handler": handler}
+
+    def _unschedule_one(self, item):
+        logger.info(f"删除定时任务: {item['event_cls'].__name__}")
+        self._ctx.scheduler.unschedule(item["schedule_id"])
+        self._ctx.event_bus.unregister(item["event_cls"], item["handler"])
+
+    def _apply_schedules(self):
+        """ 重新加载后增量更新定时任务：删除不再设置的，新增新设置的，未变化的保留事件源，只替换为新代码中的同名函数 """
+        schedules = OrderedDict(self._keyed_schedules())
+
+        # 先创建新增定时任务的事件源、新代码的回调，任何一步失败都不修改正在运行的定时任务
+        built = {_key: self._build_schedule(_desc) for _key, _desc in schedules.items() if _key not in self._scheduled}
+        handlers = {_key: self._wrap_handle(_desc) for _key, _desc in schedules.items() if _key in self._scheduled}
+        removed = [_key for _key in self._scheduled if _key not in schedules]
+
+        scheduled = OrderedDict()
+        for _key in removed:
+            self._unschedule_one(self._scheduled[_key])
+        for _key, _desc in schedules.items():
+            if _key in built:
+                scheduled[_key] = self._register_schedule(_desc, *built[_key])
+                continue
+
+            _item = self._scheduled[_key]
+            self._ctx.event_bus.unregister(_item["event_cls"], _item["handler"])
+            self._ctx.event_bus.register(_item["event_cls"], handlers[_key])
+            _item["handler"] = handlers[_key]
+            scheduled[_key] = _item
+        self._scheduled = scheduled
+
+        logger.info(f"定时任务更新完成，新增{len(built)}个，删除{len(removed)}个，保留{len(handlers)}个")
+
+    def reload(self):
+        """ 重新加载策略代码，不重启策略进程
+
+        1. 重新导入策略模块，保留全局变量g
+        2. 策略定义了after_code_changed时执行after_code_changed，否则重新执行process_initialize，
+            其中设置的run_daily定时任务增量生效；set_options的修改不生效，需要重启策略进程
+        3. 账户、订单等状态不受影响
+
+        重新加载失败（语法错误、初始化函数抛出异常等）时，记录日志并继续使用原有的定时任务
+
+        Returns:
+            是否重新加载成功
+        """
+        logger.info(f"重新加载策略代码，strategy={self.name or self._ctx.task_name}")
+        old_schedules = self._schedules
+        # importlib.reload在原模块对象上重新执行代码，失败时需要恢复模块的全局变量，原有定时任务引用的函数才是旧代码
+        old_globals = dict(self._user_module.__dict__)
+        try:
+            self._user_module = self._ctx.loader.reload(self._user_module)
+            self.make_apis()
+
+            with self._ctx.activate():
+                init = getattr(self._user_module, "after_code_changed", None) or \
+                    getattr(self._user_module, "process_initialize", None)
+                if init is None:
+                    raise TaskError("策略代码中未定义process_initialize函数")
+
+                self._schedules = []
+                self._is_scheduler_allowed = True
+                self._reloading = True
+                try:
+                    logger.info(f"执行用户{init.__name__}函数")
+                    init(self._user_ctx)
+                finally:
+                    self._is_scheduler_allowed = False
+                    self._reloading = False
+
+                for _desc in self._schedules:
+                    if self._get_handle(_desc['name']) is None:
+                        raise TaskError(f"策略代码中未找到定时任务函数：{_desc['name']}")
+
+                self._apply_schedules()
+        except Exception as e:
+            logger.exception(f"重新加载策略代码失败，继续使用原有的定时任务，error={e}")
+            self._schedules = old_schedules
+            self._user_module.__dict__.clear()
+            self._user_module.__dict__.update(old_globals)
+            return False
+
+        logger.info("重新加载策略代码完成")
+        return True
+
+    def run_daily(self, func, time, timeout=None, executor=None, coalesce=CoalescePolicy.ALWAYS, max_delay=None,
+                  precise=False, lane=Lane.NORMAL, deadline=None, skip_if_running=False):
+        """ 设置每日定时任务
+
+        Args:
+            func: 定时任务函数，函数签名：func(context)，也可以是async def定义的协程函数，
+                协程函数以任务的方式在事件循环中运行，可以await IO、sleep等而不阻塞其他定时任务，需要使用asyncio事件循环
+            time: 定时任务时间，'HH:MM:SS'、'open+30m' 这类时间表达式，或者 'every_minute'、'every_5s'、'every_5m' 这类
+                交易时间段内固定间隔执行的表达式
+            timeout: 协程定时任务的超时时间，单位：秒，超时后任务会被取消，只对async def定时任务生效
+            executor: None: 在事件循环线程中运行；"thread": 在线程池中运行，适合耗时的阻塞函数，运行期间不阻塞账户同步等其他事件，
+                函数中读取的资金、持仓、订单固定为提交时的账户快照，只随函数自己的下单、sync_balance/sync_orders更新
+            coalesce: 事件循环落后导致定时任务积压时的处理策略，"always": 逐个补执行（默认）；"latest": 只执行最新的一次；
+                "skip_overdue": 延迟超过max_delay秒的直接跳过
+            max_delay: coalesce为"skip_overdue"时允许的最大延迟，单位：秒
+            precise: 是否精确定时，事件循环提前唤醒并自旋等待到点触发，触发误差在亚毫秒级，适合开盘下单等对时间敏感的定时任务，
+                到点前的几毫秒会占用CPU，触发误差记录在日志和get_loop_stats中
+            lane: 定时任务所在的事件循环车道，"critical": 交易关键任务，比如开盘下单，到期时先于其他车道的消息执行；
+                "normal": 默认车道；"background": 后台任务，即将有critical任务到期时推迟执行
+            deadline: 单次执行的截止时间，从计划触发时间开始计算，秒数或者 '50s'、'1m30s' 这类字符串。超时不会强制中断，
+                回调中可以调用check_deadline()协作式地结束；执行结束后超时的记录告警日志和超时统计
+            skip_if_running: 上一次执行还没有结束时是否跳过本次执行，只对executor="thread"和async def定时任务生效
+        """
+        logger.info(f"run_daily. func={func.__name__}, time={time}, timeout={timeout}, executor={executor}, "
+                    f"coalesce={coalesce}, max_delay={max_delay}, precise={precise}, lane={lane}")
+        self._add_schedule("run_daily", func, {'time': self.TIME_DICT.get(time) or time},
+                           timeout, executor, coalesce, max_delay, precise, lane, deadline, skip_if_running)
+
+    def run_weekly(self, func, weekday, time="open", force=True, timeout=None, executor=None,
+                   coalesce=CoalescePolicy.ALWAYS, max_delay=None, precise=False, lane=Lane.NORMAL, deadline=None,
+                   skip_if_running=False):
+        """ 设置每周定时任务
+
+        Args:
+            func: 定时任务函数，参考run_daily
+            weekday: 每周的第几个交易日，1表示第一个交易日，-1表示最后一个交易日
+            time: 定时任务时间，参考run_daily，不支持every_minute、every_5s这类固定间隔的时间
+            force: 当周交易日不足weekday个时（比如节假日），是否在最后一个（weekday为负数时是第一个）交易日执行，
+                为False时当周不执行
+            其他参数参考run_daily
+        """
+        logger.info(f"run_weekly. func={func.__name__}, weekday={weekday}, time={time}, force={force}")
+        self._add_schedule("run_weekly", func, {'type': "weekly", 'weekday': weekday, 'force': bool(force),
+                                                'time': self.TIME_DICT.get(time) or time},
+                           timeout, executor, coalesce, max_delay, precise, lane, deadline, skip_if_running)
+
+    def run_monthly(self, func, monthday, time="open", force=True, timeout=None, executor=None,
+                    coalesce=CoalescePolicy.ALWAYS, max_delay=None, precise=False, lane=Lane.NORMAL, deadline=None,
+                    skip_if_running=False):
+        """ 设置每月定时任务
+
+        Args:
+            func: 定时任务函数，参考run_daily
+            monthday: 每月的第几个交易日，1表示第一个交易日，-1表示最后一个交易日
+            time: 定时任务时间，参考run_daily，不支持every_minute、every_5s这类固定间隔的时间
+            force: 当月交易日不足monthday个时，是否在最后一个（monthday为负数时是第一个）交易日执行，为False时当月不执行
+            其他参数参考run_daily
+        """
+        logger.info(f"run_monthly. func={func.__name__}, monthday={monthday}, time={time}, force={force}")
+        self._add_schedule("run_monthly", func, {'type': "monthly", 'monthday': monthday, 'force': bool(force),
+                                                 'time': self.TIME_DICT.get(time) or time},
+                           timeout, executor, coalesce, max_delay, precise, lane, deadline, skip_if_running)
+
+    def run_cron(self, func, expr, timeout=None, executor=None, coalesce=CoalescePolicy.ALWAYS, max_delay=None,
+                 precise=False, lane=Lane.NORMAL, deadline=None, skip_if_running=False):
+        """ 设置cron表达式定时任务，只在交易日执行
+
+        Args:
+            func: 定时任务函数，参考run_daily
+            expr: '分 时 日 月 周' 格式的cron表达式，比如 '*/5 10-11 * * 1-5'
+            其他参数参考run_daily
+        """
+        logger.info(f"run_cron. func={func.__name__}, expr={expr}")
+        self._add_schedule("run_cron", func, {'type': "cron", 'cron': expr},
+                           timeout, executor, coalesce, max_delay, precise, lane, deadline, skip_if_running)
+
+    def _add_schedule(self, api_name, func, desc, timeout, executor, coalesce, max_delay, precise, lane, deadline,
+                      skip_if_running):
+        """ 检查定时任务的公共参数，记录定时任务描述，策略初始化完成后统一设置 """
+        if not self._is_scheduler_allowed:
+            raise InvalidCall(f'{api_name}函数只允许在process_initialize中调用')
 
-            self._ctx.event_bus.register(event_cls, self.wrap_user_callback(_callback))
-            self._ctx.scheduler.schedule(event_source)
+        if 'time' in desc and TimeExprParser.parse_interval(desc['time']) and desc.get('type') in ("weekly", "monthly"):
+            raise InvalidParam(f"{api_name}不支持固定间隔的时间：{desc['time']}")
 
-            self._schedule_count += 1
+        # 在调用处检查时间表达式，不等到设置定时任务时才发现错误
+        if desc.get('type') == "cron":
+            CronExprParser.parse(desc['cron'])
+        elif not TimeExprParser.parse_interval(desc['time']):
+            TimeExprParser.compile(desc['time'])
 
-    def run_daily(self, func, time):
-        logger.info(f"run_daily. func={func.__name__}, time={time}")
-        if not self._is_scheduler_allowed:
-            raise InvalidCall('run_daily函数只允许在process_initialize中调用')
+        check_coalesce(coalesce, max_delay)
+        check_lane(lane)
+
+        if executor not in (None, "thread"):
+            raise InvalidParam(f"executor参数错误，只支持None和'thread': {executor}")
 
-        time = self.TIME_DICT.get(time) or time
+        if asyncio.iscoroutinefunction(func):
+            if executor:
+                raise InvalidParam(f"async def定时任务{func.__name__}不支持设置executor")
+            if not self._ctx.loop.supports_coroutine:
+                raise ConfigError(f"async def定时任务{func.__name__}需要使用asyncio事件循环，"
+                                  f"请在自定义配置中设置 SCHEDULER_LOOP_BACKEND = \"asyncio\"")
+        elif timeout is not None:
+            logger.warning(f"timeout只对async def定时任务生效，定时任务{func.__name__}的timeout设置将被忽略")
+
+        if timeout is not None and timeout <= 0:
+            raise InvalidParam(f"timeout必须大于0: {timeout}")
+
+        if deadline is not None:
+            deadline = TimeExprParser.parse_duration(deadline)
+
+        if skip_if_running and executor != "thread" and not asyncio.iscoroutinefunction(func):
+            logger.warning(f"skip_if_running只对executor=\"thread\"和async def定时任务生效，"
+                           f"定时任务{func.__name__}在事件循环中执行，不会出现上一次执行未结束的情况")
 
         module, func = self._check_handle(func)
 
-        desc = {
+        desc = dict(desc)
+        desc.update({
             'module': module,
             'name': func,
-            'time': time,
-        }
+            'timeout': timeout,
+            'executor': executor,
+            'coalesce': coalesce,
+            'max_delay': max_delay,
+            'precise': bool(precise),
+            'lane': lane,
+            'deadline': deadline,
+            'skip_if_running': bool(skip_if_running),
+        })
         self._schedules.append(desc)
 
+    def submit_compute(self, func, *args, callback=None, **kwargs):
+        """ 在进程池中运行CPU密集的计算，不阻塞事件循环
+
+        Args:
+            func: 计算函数，需要定义在模块顶层，参数和返回值需要能被pickle，func(*args, **kwargs)
+            callback: 计算完成后在事件循环线程中调用的回调，函数签名：callback(context, result)；
+                计算抛出的异常和定时任务中的异常一样处理
+
+        Returns:
+            设置了callback时返回concurrent.futures.Future；
+            未设置callback时返回可以await的asyncio.Future，用于async def定时任务，计算抛出的异常在await处抛出
+        """
+        executor = self._ctx.compute_executor
+        name = getattr(func, "__name__", str(func))
+
+        if callback is not None:
+            if not callable(callback):
+                raise InvalidParam(f"callback参数错误，{callback} is not callable")
+            ctx = self._ctx
+
+            def _callback(result):
+                with ctx.activate():
+                    callback(self._user_ctx, result)
+            return executor.submit(func, *args, callback=_callback, name=name, **kwargs)
+
+        loop = self._ctx.loop
+        if not loop.supports_coroutine:
+            raise InvalidParam(f"submit_compute({name})需要设置callback，或者在asyncio事件循环的async def定时任务中await结果")
+        future = executor.submit(func, *args, name=name, raise_exception=False, **kwargs)
+        return asyncio.wrap_future(future, loop=loop.aio_loop)
+
+    def warm_up_compute(self, modules=None):
+        """ 提前启动进程池的全部工作进程，并在工作进程中导入modules，建议在process_initialize中调用，
+        避免开盘时第一次submit_compute承担创建进程、导入模块的耗时
+
+        Args:
+            modules: 工作进程中预先导入的模块名列表，比如["numpy", "pandas"]
+        """
+        logger.info(f"warm_up_compute. modules={modules}")
+        self._ctx.compute_executor.warm_up(modules)
+
+    def get_loop_stats(self, by_lane=False, overruns=False):
+        """ 获取事件循环按事件类统计的调度延迟和回调耗时，单位：毫秒
+
+        Args:
+            by_lane: 为True时按事件循环车道汇总，key是车道名称
+            overruns: 为True时返回设置了deadline的定时任务的超时次数、跳过次数和超时时长分布，见LoopStats.overrun_snapshot
+
+        Returns:
+            {事件类名: {"lag": {...}, "duration": {...}}}，lag是定时任务实际开始执行时间与计划时间的差值，
+            duration是回调执行耗时，均包含count、min、mean、p50、p90、p99、p999、max字段
+        """
+        if overruns:
+            return self._ctx.loop.stats.overrun_snapshot()
+        if by_lane:
+            return self._ctx.loop.stats.lane_snapshot()
+        return self._ctx.loop.stats.snapshot()
+
     @staticmethod
     def _check_handle(func):
         if not callable(func):
@@ -159,6 +581,19 @@ class Strategy(object):
     def user_module(self):
         return self._user_module
 
+    @property
+    def context(self):
+        return self._ctx
+
+    @property
+    def name(self):
+        """ 策略名称，多策略模式下为策略文件名，单策略模式下为None """
+        return self._ctx.strategy_name
+
+    @property
+    def runtime_dir(self):
+        return os.path.abspath(os.path.expanduser(self._options.get("runtime_dir", config.RUNTIME_DIR)))
+
     def set_options(self, **kwargs):
         if not self._is_scheduler_allowed:
             raise InvalidCall("set_options只能在process_initialize中调用")
@@ -177,6 +612,9 @@ class Strategy(object):
                 periods.append((parse_time(_start), parse_time(_end)))
             kwargs["market_period"] = periods
 
+        if "trading_calendar" in kwargs and not self._reloading:
+            setup_calendar(kwargs["trading_calendar"])
+
         # parse account options
         if "sync_balance" in kwargs:
             kwargs["sync_balance"] = bool(kwargs["sync_balance"])
@@ -197,6 +635,12 @@ class Strategy(object):
                 periods.append((parse_time(_start), parse_time(_end)))
             kwargs["sync_period"] = periods
 
+        if self._reloading:
+            if kwargs != self._options:
+                logger.warning(f"重新加载策略代码时set_options的修改不会生效，需要重启策略进程。"
+                               f"当前选项：{self._options}，新选项：{kwargs}")
+            return
+
         # set options
         self._options = kwargs
 
@@ -225,13 +669,15 @@ class Strategy(object):
             logger.info(f"account模块加载用户自定义配置：{self._ctx.config}")
             setup_account_config(self._ctx.config)
         account_config = get_account_config()
-        if not account_config.TRADE_GATE:
+        if not self._ctx.trade_gate_factory and not account_config.TRADE_GATE:
             raise ConfigError("未配置trade gate")
 
         try:
-            module_name, gate_name = account_config.TRADE_GATE.rsplit(".", 1)
-            module = import_module(module_name)
-            trade_gate = getattr(module, gate_name)()
+            if self._ctx.trade_gate_factory:
+                # 多策略模式下使用共享的trade gate
+                trade_gate = self._ctx.trade_gate_factory()
+            else:
+                trade_gate = create_trade_gate(account_config.TRADE_GATE)
         except Exception as e:
             logger.error(f"初始化trade gate失败，error={e}")
             raise
@@ -248,3 +694,10 @@ class Strategy(object):
     @property
     def options(self):
         return self._options
+
+
+def create_trade_gate(path):
+    """ 根据类路径创建trade gate实例，比如"jqtrade.account.trade_gate.AnXinDMATradeGate" """
+    module_name, gate_name = path.rsplit(".", 1)
+    module = import_module(module_name)
+    return getattr(module, gate_name)()
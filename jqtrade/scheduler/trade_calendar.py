@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import os
+import csv
+import bisect
+import datetime
+
+from ..common.exceptions import ConfigError
+from ..common.log import sys_logger
+
+
+logger = sys_logger.getChild("trade_calendar")
+
+
+class TradingCalendar(object):
+    """
+    Usage:
+        交易日历基类，EventSource通过交易日历跳过非交易日，非交易日不会生成任何事件
+    """
+
+    def is_trading_day(self, day):
+        raise NotImplementedError
+
+    def next_trading_day(self, day):
+        """ 返回 >=day 的第一个交易日，没有时返回None
+
+        Args:
+            day: datetime.date
+        """
+        raise NotImplementedError
+
+
+class AllDaysCalendar(TradingCalendar):
+    """ 每天都是交易日，不设置交易日历时默认使用 """
+
+    def is_trading_day(self, day):
+        return True
+
+    def next_trading_day(self, day):
+        return day
+
+
+class WeekdaysCalendar(TradingCalendar):
+    """ 周一到周五是交易日，不考虑节假日 """
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5
+
+    def next_trading_day(self, day):
+        weekday = day.weekday()
+        if weekday >= 5:
+            day += datetime.timedelta(days=7 - weekday)
+        return day
+
+
+class FileTradingCalendar(TradingCalendar):
+    """ 从本地文件加载的交易日历，上交所、深交所共用同一份交易日历
+
+    支持两种文件格式：
+        1. 每行一个交易日，支持 '2024-01-02'、'20240102' 两种日期格式，'#'开头的行会被忽略
+        2. 交易所交易日历csv格式，必须包含cal_date、is_open两列，is_open为1的日期是交易日，示例：
+            exchange,cal_date,is_open
+            SSE,20240101,0
+            SSE,20240102,1
+    """
+
+    def __init__(self, path):
+        self._path = os.path.abspath(os.path.expanduser(path))
+        if not os.path.exists(self._path):
+            raise ConfigError(f"找不到交易日历文件：{self._path}")
+
+        self._days = sorted(set(self._load(self._path)))
+        if not self._days:
+            raise ConfigError(f"交易日历文件中没有交易日：{self._path}")
+        self._day_set = set(self._days)
+
+        logger.info(f"加载交易日历：{self._path}，交易日区间：{self._days[0]} ~ {self._days[-1]}")
+
+    @staticmethod
+    def _parse_day(day):
+        day = day.strip()
+        fmt = "%Y-%m-%d" if "-" in day else "%Y%m%d"
+        return datetime.datetime.strptime(day, fmt).date()
+
+    @classmethod
+    def _load(cls, path):
+        with open(path, "r", encoding="utf-8-sig") as rf:
+            lines = [_line.strip() for _line in rf if _line.strip() and not _line.startswith("#")]
+
+        if lines and "cal_date" in lines[0]:
+            for _row in csv.DictReader(lines):
+                if str(_row.get("is_open", "")).strip() in ("1", "1.0", "True", "true"):
+                    yield cls._parse_day(_row["cal_date"])
+        else:
+            for _line in lines:
+                yield cls._parse_day(_line.split(",")[0])
+
+    def is_trading_day(self, day):
+        return day in self._day_set
+
+    def next_trading_day(self, day):
+        idx = bisect.bisect_left(self._days, day)
+        if idx >= len(self._days):
+            logger.error(f"{day}超出交易日历范围（最后一个交易日：{self._days[-1]}），请更新交易日历文件：{self._path}")
+            return
+        return self._days[idx]
+
+
+def create_calendar(spec=None):
+    """ 根据配置创建交易日历
+
+    Args:
+        spec: None 或 "all": 每天都是交易日；"weekdays": 周一到周五是交易日；
+            其他字符串: 交易日历文件路径；也可以直接传入TradingCalendar实例
+    """
+    if isinstance(spec, TradingCalendar):
+        return spec
+    if spec is None or spec == "all":
+        return AllDaysCalendar()
+    if spec == "weekdays":
+        return WeekdaysCalendar()
+    if isinstance(spec, str):
+        return FileTradingCalendar(spec)
+    raise ConfigError(f"不支持的交易日历配置：{spec}")
+
+
+_calendar = AllDaysCalendar()
+
+
+def get_calendar():
+    """ 获取当前进程使用的交易日历 """
+    return _calendar
+
+
+def set_calendar(calendar):
+    global _calendar
+    _calendar = calendar
+
+
+def setup_calendar(spec=None):
+    """ 根据配置创建并设置当前进程使用的交易日历 """
+    calendar = create_calendar(spec)
+    set_calendar(calendar)
+    return calendar
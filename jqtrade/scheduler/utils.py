@@ -5,7 +5,8 @@ def parse_task_info(cmd_line):
     info = {"debug": False, "env": None, "out": None}
     for _idx, _item in enumerate(cmd_line):
         if _item in ("-c", "--code"):
-            info["code"] = cmd_line[_idx+1]
+            # 多策略任务有多个-c参数
+            info["code"] = ",".join(filter(None, [info.get("code"), cmd_line[_idx+1]]))
         elif _item in ("-o", "--out"):
             info["out"] = cmd_line[_idx + 1]
         elif _item in ("-n", "--name"):
@@ -17,6 +18,10 @@ def parse_task_info(cmd_line):
     return info
 
 
+# 策略进程的进程名包含的关键字，只读取这些进程的命令行，不逐个读取机器上所有进程的命令行（windows下很慢）
+_TASK_PROCESS_NAMES = ("python", "jqtrade", "pypy")
+
+
 def get_activate_task_process():
     active_tasks = []
 
@@ -24,7 +29,10 @@ def get_activate_task_process():
     try:
         task_process = []
         parent_pid = []
-        for _p in psutil.process_iter():
+        for _p in psutil.process_iter(attrs=["name"]):
+            _name = (_p.info.get("name") or "").lower()
+            if not any(_keyword in _name for _keyword in _TASK_PROCESS_NAMES):
+                continue
             try:
                 _cmd_line = " ".join(_p.cmdline())
                 if "jqtrade" in _cmd_line and "start_task" in _cmd_line:
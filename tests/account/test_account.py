@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import datetime
+import threading
+from types import SimpleNamespace
+
+from jqtrade.account.account import Account
+from jqtrade.account.order import OrderSide, LimitOrderStyle
+
+
+class _Gate(object):
+    """ 每次同步返回的可用资金和持仓数量相同，用于检查读取到的资金和持仓是否来自同一次同步 """
+
+    def __init__(self):
+        self.count = 0
+
+    def sync_balance(self):
+        self.count += 1
+        return {
+            "cash": {"total_asset": self.count, "available_cash": self.count, "locked_cash": 0},
+            "positions": [{"code": "000001.XSHE", "amount": self.count, "available_amount": self.count,
+                           "avg_cost": 1, "side": "long"}],
+        }
+
+    def order(self, order):
+        pass
+
+
+def _create_account():
+    ctx = SimpleNamespace(trade_gate=_Gate(), current_dt=datetime.datetime(2023, 10, 30, 9, 30))
+    return Account(ctx)
+
+
+def test_snapshot():
+    account = _create_account()
+    stop = threading.Event()
+    mismatched = []
+
+    def _reader():
+        while not stop.is_set():
+            snapshot = account.snapshot
+            positions = snapshot.long_positions
+            if positions and positions["000001.XSHE"].amount != snapshot.balance[1]:
+                mismatched.append(snapshot)
+
+    reader = threading.Thread(target=_reader)
+    reader.start()
+    try:
+        for _ in range(2000):
+            account.sync_balance()
+    finally:
+        stop.set()
+        reader.join()
+
+    assert not mismatched
+    assert account.available_cash == account.long_positions["000001.XSHE"].amount == 2000
+
+
+def test_order_snapshot():
+    account = _create_account()
+    account.sync_balance()
+    before = account.snapshot
+
+    order_id = account.order("000001.XSHE", -1, LimitOrderStyle(10), OrderSide.long)
+    after = account.snapshot
+    # 订单和冻结后的持仓在同一个快照中生效，之前拿到的快照不受影响
+    assert order_id in after.orders
+    assert after.long_positions["000001.XSHE"].available_amount == 0
+    assert order_id not in before.orders
+    assert before.long_positions["000001.XSHE"].available_amount == 1
+    assert after.balance is before.balance
+
+
+def test_pin_snapshot():
+    account = _create_account()
+    account.sync_balance()
+    pinned = threading.Event()
+    synced = threading.Event()
+    result = {}
+
+    def _worker():
+        with account.pin_snapshot():
+            pinned.set()
+            synced.wait(5)
+            # 其他线程的同步不影响固定的快照
+            result["cash"] = account.available_cash
+            result["amount"] = account.long_positions["000001.XSHE"].amount
+            # 自己的同步更新固定的快照
+            account.sync_balance()
+            result["synced_cash"] = account.available_cash
+        result["after"] = account.available_cash
+
+    worker = threading.Thread(target=_worker)
+    worker.start()
+    pinned.wait(5)
+    account.sync_balance()
+    assert account.available_cash == 2
+    synced.set()
+    worker.join()
+
+    assert result == {"cash": 1, "amount": 1, "synced_cash": 3, "after": 3}
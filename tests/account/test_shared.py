@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import datetime
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from jqtrade.account.shared import SharedTradeGate, scheduled_sync
+
+
+class _Gate(object):
+    def __init__(self):
+        self.balance_count = 0
+        self.orders_count = 0
+
+    def setup(self, options):
+        pass
+
+    def sync_balance(self):
+        self.balance_count += 1
+        return {"cash": {"available_cash": self.balance_count}, "positions": []}
+
+    def sync_orders(self):
+        self.orders_count += 1
+        return []
+
+    def order(self, sys_order):
+        pass
+
+    def cancel_order(self, order_id):
+        pass
+
+
+@contextmanager
+def _activate():
+    yield
+
+
+def _create_shared(tmp_path):
+    ctx = SimpleNamespace(activate=_activate, task_name="test_shared",
+                          current_dt=datetime.datetime(2023, 10, 30, 9, 30))
+    shared = SharedTradeGate(ctx, gate_factory=_Gate)
+    for _name in ("a", "b"):
+        shared.create_gate(_name).setup({"account_no": "1", "runtime_dir": str(tmp_path)})
+    return shared
+
+
+def test_scheduled_sync(tmp_path):
+    shared = _create_shared(tmp_path)
+    gate_a, gate_b = shared.create_gate("a"), shared.create_gate("b")
+
+    # 同一轮定时同步只读取一次交易接口
+    with scheduled_sync(1):
+        gate_a.sync_balance()
+        gate_a.sync_orders()
+    with scheduled_sync(1):
+        assert gate_b.sync_balance()["cash"]["available_cash"] == 1
+        gate_b.sync_orders()
+    assert shared.gate.balance_count == 1
+    assert shared.gate.orders_count == 1
+
+    # 新的一轮重新读取
+    with scheduled_sync(2):
+        gate_a.sync_balance()
+    assert shared.gate.balance_count == 2
+
+
+def test_explicit_sync(tmp_path):
+    shared = _create_shared(tmp_path)
+    gate_a, gate_b = shared.create_gate("a"), shared.create_gate("b")
+
+    with scheduled_sync(1):
+        gate_a.sync_balance()
+
+    # 用户主动调用的同步总是读取交易接口，读到的数据同一轮内后续的定时同步复用
+    assert gate_a.sync_balance()["cash"]["available_cash"] == 2
+    assert gate_a.sync_balance()["cash"]["available_cash"] == 3
+    with scheduled_sync(1):
+        assert gate_b.sync_balance()["cash"]["available_cash"] == 3
+    assert shared.gate.balance_count == 3
+
+
+def test_order_clear_cache(tmp_path):
+    shared = _create_shared(tmp_path)
+    gate_a, gate_b = shared.create_gate("a"), shared.create_gate("b")
+
+    with scheduled_sync(1):
+        gate_a.sync_balance()
+        gate_a.sync_orders()
+
+    # 下单、撤单后同一轮的定时同步重新读取交易接口
+    gate_a.order(SimpleNamespace(order_id="1"))
+    with scheduled_sync(1):
+        gate_b.sync_balance()
+        gate_b.sync_orders()
+    assert shared.gate.balance_count == 2
+    assert shared.gate.orders_count == 2
+
+    gate_a.cancel_order("1")
+    with scheduled_sync(1):
+        gate_b.sync_balance()
+    assert shared.gate.balance_count == 3
+    assert shared.owner("1") == "a"
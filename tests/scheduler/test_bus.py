@@ -19,33 +19,77 @@ class TestEvent2(Event):
     pass
 
 
+class TestSubEvent1(TestEvent1):
+    pass
+
+
+def _recorder(calls, value):
+    return lambda e: calls.append(value)
+
+
 def test_register():
     bus = EventBus()
-    bus.register(TestEvent1, lambda e: 0, priority=0)
-    bus.register(TestEvent1, lambda e: 1, priority=1)
-    bus.register(TestEvent1, lambda e: -1, priority=-1)
-    bus.register(TestEvent1, lambda e: -3, priority=-1)
-    bus.register(TestEvent1, lambda e: -2, priority=-1)
+    calls = []
+    bus.register(TestEvent1, _recorder(calls, 0), priority=0)
+    bus.register(TestEvent1, _recorder(calls, 1), priority=1)
+    bus.register(TestEvent1, _recorder(calls, -1), priority=-1)
+    bus.register(TestEvent1, _recorder(calls, -3), priority=-1)
+    bus.register(TestEvent1, _recorder(calls, -2), priority=-1)
+
+    bus.register(TestEvent2, _recorder(calls, 10), priority=0)
+    bus.register(TestEvent2, _recorder(calls, 11), priority=1)
 
-    bus.register(TestEvent2, lambda e: 10, priority=0)
-    bus.register(TestEvent2, lambda e: 11, priority=1)
+    bus.emit(TestEvent1())
+    assert calls == [1, 0, -1, -3, -2]
 
-    assert bus.emit(TestEvent1()) == [1, 0, -1, -3, -2]
-    assert bus.emit(TestEvent2()) == [11, 10]
+    calls.clear()
+    bus.emit(TestEvent2())
+    assert calls == [11, 10]
 
 
 def test_unregister():
     bus = EventBus()
+    calls = []
 
     def func(e):
-        return -1
-    bus.register(TestEvent1, lambda e: 0, priority=0)
-    bus.register(TestEvent1, lambda e: 1, priority=1)
+        calls.append(-1)
+    bus.register(TestEvent1, _recorder(calls, 0), priority=0)
+    bus.register(TestEvent1, _recorder(calls, 1), priority=1)
     bus.register(TestEvent1, func, priority=-1)
 
-    bus.register(TestEvent2, lambda e: 10, priority=0)
-    bus.register(TestEvent2, lambda e: 11, priority=1)
+    bus.register(TestEvent2, _recorder(calls, 10), priority=0)
+    bus.register(TestEvent2, _recorder(calls, 11), priority=1)
 
+    bus.emit(TestEvent1())
+    assert calls == [1, 0, -1]
+
+    calls.clear()
     bus.unregister(TestEvent1, func)
-    assert bus.emit(TestEvent1()) == [1, 0]
-    assert bus.emit(TestEvent2()) == [11, 10]
+    bus.emit(TestEvent1())
+    assert calls == [1, 0]
+
+    calls.clear()
+    bus.emit(TestEvent2())
+    assert calls == [11, 10]
+
+
+def test_dispatch_by_mro():
+    bus = EventBus()
+    calls = []
+    bus.register(Event, _recorder(calls, "event"), priority=0)
+    bus.register(TestEvent1, _recorder(calls, "event1"), priority=-1)
+    bus.register(TestSubEvent1, _recorder(calls, "sub_event1"), priority=1)
+
+    bus.emit(TestSubEvent1())
+    assert calls == ["sub_event1", "event", "event1"]
+
+    calls.clear()
+    bus.emit(TestEvent2())
+    assert calls == ["event"]
+    assert set(bus._dispatch_cache) == {TestSubEvent1, TestEvent2}
+
+    calls.clear()
+    bus.register(TestEvent2, _recorder(calls, "event2"), priority=1)
+    assert not bus._dispatch_cache
+    bus.emit(TestEvent2())
+    assert calls == ["event2", "event"]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import time
+import pytest
+import datetime
+
+from jqtrade.common.exceptions import ConfigError
+from jqtrade.scheduler.clock import RealClock, SimulatedClock, get_clock, set_clock, setup_clock
+
+
+def test_real_clock():
+    clock = RealClock()
+    assert not clock.simulated
+    assert abs(clock.time() - int(time.time() * 1000)) < 1000
+    assert clock.today() == datetime.date.today()
+
+
+def test_real_clock_ns():
+    clock = RealClock()
+    assert abs(clock.time_ns() - time.time() * 1000000000) < 5000000
+    assert abs(clock.time_us() - time.time() * 1000000) < 5000
+
+    # 锚定后基于单调时钟递增
+    values = [clock.time_ns() for _ in range(1000)]
+    assert values == sorted(values)
+
+    # 超过锚定间隔后重新锚定到系统时间
+    clock.ANCHOR_INTERVAL = 0
+    assert abs(clock.time_ns() - time.time() * 1000000000) < 5000000
+
+
+def test_simulated_clock():
+    start = datetime.datetime(2023, 10, 30, 8, 0, 0)
+    clock = SimulatedClock(start)
+    assert clock.simulated
+    assert clock.now() == start
+
+    clock.advance_to(clock.time() + 1500)
+    assert clock.now() == datetime.datetime(2023, 10, 30, 8, 0, 1, 500000)
+
+    # 时钟不会回退
+    clock.advance_to(clock.time() - 10000)
+    assert clock.now() == datetime.datetime(2023, 10, 30, 8, 0, 1, 500000)
+    assert clock.today() == datetime.date(2023, 10, 30)
+
+
+def test_setup_clock():
+    old_clock = get_clock()
+    try:
+        clock = setup_clock("simulated", datetime.datetime(2023, 10, 30))
+        assert get_clock() is clock
+        assert clock.now() == datetime.datetime(2023, 10, 30)
+
+        assert isinstance(setup_clock("real"), RealClock)
+
+        with pytest.raises(ConfigError):
+            setup_clock("unknown")
+    finally:
+        set_clock(old_clock)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+import threading
+
+import pytest
+
+from jqtrade.scheduler.deadline import CallbackDeadline, current_deadline, deadline_remaining, check_deadline
+from jqtrade.common.exceptions import DeadlineExceeded
+
+
+def test_deadline():
+    # 没有设置deadline时不做任何事
+    assert current_deadline() is None
+    assert deadline_remaining() is None
+    check_deadline()
+
+    token = CallbackDeadline("func", "TestEvent", 10, lag=2)
+    with token.activate():
+        assert current_deadline() is token
+        assert 7.9 < deadline_remaining() <= 8
+        check_deadline()
+    assert current_deadline() is None
+    token.finish()
+    assert token.overrun == 0
+
+    # 开始执行前已经落后计划时间超过deadline
+    token = CallbackDeadline("func", "TestEvent", 1, lag=1.5)
+    with token.activate():
+        assert token.exceeded()
+        with pytest.raises(DeadlineExceeded):
+            check_deadline()
+    token.finish()
+    elapsed = token.elapsed
+    time.sleep(0.01)
+    # 结束后耗时不再变化
+    assert token.elapsed == elapsed
+    assert 0.5 <= token.overrun < 0.6
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="python3.6没有contextvars")
+def test_deadline_thread():
+    # 截止时间只在设置它的线程中生效
+    token = CallbackDeadline("func", "TestEvent", 10)
+    seen = []
+    with token.activate():
+        thread = threading.Thread(target=lambda: seen.append(current_deadline()))
+        thread.start()
+        thread.join()
+    assert seen == [None]
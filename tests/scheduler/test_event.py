@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
+import pytest
 
-from jqtrade.scheduler.event import create_event_class, EventPriority, Event, _event_classes
+from jqtrade.scheduler.event import create_event_class, EventPriority, Event, CoalescePolicy, _event_classes
+from jqtrade.common.exceptions import InvalidParam, InternalError
 
 
 def test_create_event_class():
@@ -18,3 +20,32 @@ def test_create_event_class():
 
     assert isinstance(e1, Event)
     assert isinstance(e2, Event)
+
+
+def test_create_event_class_coalesce():
+    e = create_event_class("TestCoalesceEvent1", coalesce=CoalescePolicy.LATEST)
+    assert e.coalesce == CoalescePolicy.LATEST
+    assert create_event_class("TestEvent1").coalesce == CoalescePolicy.ALWAYS
+
+    e = create_event_class("TestCoalesceEvent2", coalesce=CoalescePolicy.SKIP_OVERDUE, max_delay=5)
+    assert e.max_delay == 5
+
+    with pytest.raises(InvalidParam):
+        create_event_class("TestCoalesceEvent3", coalesce="unknown")
+
+    with pytest.raises(InvalidParam):
+        create_event_class("TestCoalesceEvent4", coalesce=CoalescePolicy.SKIP_OVERDUE)
+
+
+def test_create_event_class_options_changed():
+    e = create_event_class("TestOptionsEvent", coalesce=CoalescePolicy.LATEST, lane="critical")
+    # 选项相同时返回同一个事件类
+    assert create_event_class("TestOptionsEvent", coalesce=CoalescePolicy.LATEST, lane="critical") is e
+
+    # 选项不同时不能静默返回已有的事件类
+    for _options in ({"coalesce": CoalescePolicy.ALWAYS, "lane": "critical"},
+                     {"coalesce": CoalescePolicy.LATEST, "lane": "critical", "precise": True},
+                     {"coalesce": CoalescePolicy.LATEST},
+                     {"coalesce": CoalescePolicy.LATEST, "lane": "critical", "priority": EventPriority.EVERY_MINUTE}):
+        with pytest.raises(InternalError):
+            create_event_class("TestOptionsEvent", **_options)
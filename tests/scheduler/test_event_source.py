@@ -2,9 +2,13 @@
 import pytest
 import datetime
 
-from jqtrade.scheduler.event_source import EventSource, EventSourceScheduler, TimeExprParser
-from jqtrade.scheduler.event import Event
+from jqtrade.scheduler.event_source import EventSource, EventSourceScheduler, TimeExprParser, IntervalEventSource, \
+    CronExprParser
+from jqtrade.scheduler.trade_calendar import AllDaysCalendar, WeekdaysCalendar
+from jqtrade.scheduler.event import Event, CoalescePolicy, create_event_class
 from jqtrade.scheduler.config import get_config
+from jqtrade.common.exceptions import InvalidParam
+from jqtrade.common.utils import dt_to_milliseconds
 
 
 config = get_config()
@@ -12,9 +16,9 @@ config = get_config()
 
 def test_event_source_init():
     es = EventSource()
-    assert es._daily == []
+    assert es._entries == []
     assert es._events == []
-    assert es._days == []
+    assert es._last_day is None
     assert es._event_changed_callback == []
     assert es._need_regenerate_events
 
@@ -28,40 +32,102 @@ def test_reset_events():
     assert not es._need_regenerate_events
     es._reset_events_if_needed()
 
-    assert es._daily == []
+    assert es._entries == []
     assert es._events == []
 
-    assert len(es._days)
 
+def test_get_last_day():
+    old_cfg = bool(config.ENABLE_HISTORY_START)
 
-def test_get_days():
-    es = EventSource()
-    es.setup()
+    try:
+        config.ENABLE_HISTORY_START = False
+        es = EventSource()
+        es.setup()
+        assert es._get_last_day() is None
 
-    days = es._get_days(count=2)
+        es = EventSource(end=datetime.datetime(2023, 6, 5, 10, 0, 0))
+        es.setup()
+        assert es._get_last_day() == datetime.date(2023, 6, 5)
 
-    today = datetime.date.today()
-    assert days == [today, today + datetime.timedelta(days=1)]
+        config.ENABLE_HISTORY_START = True
+        es = EventSource(start=datetime.datetime(2023, 6, 4, 10, 0, 0))
+        es.setup()
+        assert es._get_last_day(count=2) == datetime.date(2023, 6, 5)
+    finally:
+        config.ENABLE_HISTORY_START = old_cfg
+
+
+def test_lazy_events():
+    old_cfg = bool(config.ENABLE_HISTORY_START)
+
+    try:
+        config.ENABLE_HISTORY_START = True
+        es = EventSource(start=datetime.datetime(2023, 6, 4, 10, 0, 0))
+        es.setup()
+
+        es.daily(TestEvent1, "09:30:00")
+        es.daily(TestEvent2, "10:00:00")
+
+        # 每个定时任务只保留下一次触发的事件
+        for _ in range(100):
+            assert len(es._events) <= 2
+            assert es.get_next_event() is not None
+        assert len(es._events) == 2
+    finally:
+        config.ENABLE_HISTORY_START = old_cfg
 
 
 def test_daily():
     es = EventSource()
     es.setup()
 
-    assert es._daily == []
+    assert es._entries == []
 
+    market_period = config.MARKET_PERIOD
     es.daily(Event, "09:30:00")
-    es.daily(Event, "every_minute")
-    es.daily(Event, "open-30")
-    es.daily(Event, "close-30")
-    assert es._daily == [
+    es.daily(Event, "10:00")
+    es.daily(Event, "open-30m", market_period=market_period)
+    es.daily(Event, "close+1h30s", market_period=market_period)
+    assert [(_e.time_expr, _e.event_cls) for _e in es._entries] == [
         ("09:30:00", Event),
-        ("every_minute", Event),
-        ("open-30", Event),
-        ("close-30", Event)
+        ("10:00", Event),
+        ("open-30m", Event),
+        ("close+1h30s", Event)
+    ]
+    assert [_e.offset for _e in es._entries] == [
+        datetime.timedelta(hours=9, minutes=30),
+        datetime.timedelta(hours=10),
+        datetime.timedelta(hours=9),
+        datetime.timedelta(hours=16, seconds=30),
     ]
     assert es._need_regenerate_events
 
+    # 表达式在注册时解析，错误的表达式直接报错
+    for _expr in ("every_minute", "open-30", "25:00:00", "open+"):
+        with pytest.raises(InvalidParam):
+            es.daily(Event, _expr, market_period=market_period)
+
+
+def test_parse_interval():
+    assert TimeExprParser.parse_interval("every_minute") == 60
+    assert TimeExprParser.parse_interval("every_1m") == 60
+    assert TimeExprParser.parse_interval("every_5s") == 5
+    assert TimeExprParser.parse_interval("every_15m") == 900
+    for _expr in ("open", "09:30:00", "every_5h", "every_s", "every_5ss"):
+        assert TimeExprParser.parse_interval(_expr) is None
+    with pytest.raises(InvalidParam):
+        TimeExprParser.parse_interval("every_0s")
+
+
+def test_parse_duration():
+    assert TimeExprParser.parse_duration(50) == 50
+    assert TimeExprParser.parse_duration(0.5) == 0.5
+    assert TimeExprParser.parse_duration("50s") == 50
+    assert TimeExprParser.parse_duration("1m30s") == 90
+    for _expr in (0, -1, "0s", "abc", True, None):
+        with pytest.raises(InvalidParam):
+            TimeExprParser.parse_duration(_expr)
+
 
 class TestEvent1(Event):
     pass
@@ -118,32 +184,33 @@ def test_gen_events(context):
         assert not es._events
 
         es.gen_events()
+        events = [es.get_next_event() for _ in range(6)]
     finally:
         config.ENABLE_HISTORY_START = old_cfg
 
     # open-30m
-    assert es._events[0][0] == datetime.datetime.combine(today, datetime.time(9, 0))
-    assert isinstance(es._events[0][1], TestEvent3)
+    assert events[0][0] == datetime.datetime.combine(today, datetime.time(9, 0))
+    assert isinstance(events[0][1], TestEvent3)
 
     # 09:30
-    assert es._events[1][0] == datetime.datetime.combine(today, datetime.time(9, 30))
-    assert isinstance(es._events[1][1], TestEvent1)
+    assert events[1][0] == datetime.datetime.combine(today, datetime.time(9, 30))
+    assert isinstance(events[1][1], TestEvent1)
 
     # open
-    assert es._events[2][0] == datetime.datetime.combine(today, datetime.time(9, 30))
-    assert isinstance(es._events[2][1], TestEvent2)
+    assert events[2][0] == datetime.datetime.combine(today, datetime.time(9, 30))
+    assert isinstance(events[2][1], TestEvent2)
 
     # 14:30
-    assert es._events[3][0] == datetime.datetime.combine(today, datetime.time(14, 30))
-    assert isinstance(es._events[3][1], TestEvent4)
+    assert events[3][0] == datetime.datetime.combine(today, datetime.time(14, 30))
+    assert isinstance(events[3][1], TestEvent4)
 
     # close-30m
-    assert es._events[4][0] == datetime.datetime.combine(today, datetime.time(14, 30))
-    assert isinstance(es._events[4][1], TestEvent5)
+    assert events[4][0] == datetime.datetime.combine(today, datetime.time(14, 30))
+    assert isinstance(events[4][1], TestEvent5)
 
     # close
-    assert es._events[5][0] == datetime.datetime.combine(today, datetime.time(15, 0))
-    assert isinstance(es._events[5][1], TestEvent6)
+    assert events[5][0] == datetime.datetime.combine(today, datetime.time(15, 0))
+    assert isinstance(events[5][1], TestEvent6)
 
 
 def test_start():
@@ -294,3 +361,206 @@ def test_end():
 
     finally:
         config.ENABLE_HISTORY_START = old_cfg
+
+
+def test_interval():
+    old_cfg = bool(config.ENABLE_HISTORY_START)
+
+    try:
+        config.ENABLE_HISTORY_START = True
+
+        # 不指定时间段时，从start开始每隔step触发，start本身不触发
+        es = IntervalEventSource(TestEvent1, 0.5, start=datetime.datetime(2023, 6, 4, 10, 0, 0),
+                                 end=datetime.datetime(2023, 6, 4, 10, 0, 2))
+        es.setup()
+        dts = []
+        while True:
+            dt_evt = es.get_next_event()
+            if dt_evt is None:
+                break
+            assert isinstance(dt_evt[1], TestEvent1)
+            dts.append(dt_evt[0])
+        assert dts == [datetime.datetime(2023, 6, 4, 10, 0, 0, 500000),
+                       datetime.datetime(2023, 6, 4, 10, 0, 1),
+                       datetime.datetime(2023, 6, 4, 10, 0, 1, 500000),
+                       datetime.datetime(2023, 6, 4, 10, 0, 2)]
+
+        # 指定时间段时，每天只在时间段内触发，包含时间段两端
+        periods = [(datetime.time(9, 30), datetime.time(9, 32)), (datetime.time(13, 0), datetime.time(13, 1))]
+        es = IntervalEventSource(TestEvent2, 60, periods=periods, start=datetime.datetime(2023, 6, 4, 9, 30, 30),
+                                 end=datetime.datetime(2023, 6, 5, 9, 31))
+        es.setup()
+        dts = []
+        while True:
+            dt_evt = es.get_next_event()
+            if dt_evt is None:
+                break
+            dts.append(dt_evt[0])
+        assert dts == [datetime.datetime(2023, 6, 4, 9, 31),
+                       datetime.datetime(2023, 6, 4, 9, 32),
+                       datetime.datetime(2023, 6, 4, 13, 0),
+                       datetime.datetime(2023, 6, 4, 13, 1),
+                       datetime.datetime(2023, 6, 5, 9, 30),
+                       datetime.datetime(2023, 6, 5, 9, 31)]
+
+        # 堆中只保留一个待触发事件
+        es = IntervalEventSource(TestEvent3, 1, start=datetime.datetime(2023, 6, 4))
+        es.setup()
+        for _ in range(1000):
+            es.get_next_event()
+        assert len(es._events) == 1
+        assert es.peek_next_event()[0] == datetime.datetime(2023, 6, 4, 0, 16, 41)
+    finally:
+        config.ENABLE_HISTORY_START = old_cfg
+
+
+def test_coalesce():
+    old_cfg = bool(config.ENABLE_HISTORY_START)
+
+    try:
+        config.ENABLE_HISTORY_START = True
+        start = datetime.datetime(2023, 6, 4, 10, 0, 0)
+        now = dt_to_milliseconds(datetime.datetime(2023, 6, 4, 10, 0, 3, 500000))
+
+        def _create(name, **kwargs):
+            event_cls = create_event_class(name, **kwargs)
+            es = IntervalEventSource(event_cls, 1, start=start)
+            es.setup()
+            return es
+
+        # always: 积压的事件逐个执行
+        es = _create("TestCoalesceAlways")
+        event_dt = EventSourceScheduler._coalesce(es, es.get_next_event(), now)[0]
+        assert event_dt == datetime.datetime(2023, 6, 4, 10, 0, 1)
+        assert es.peek_next_event()[0] == datetime.datetime(2023, 6, 4, 10, 0, 2)
+
+        # latest: 10:00:01 ~ 10:00:03 都已到期，只执行10:00:03的，下一个事件是未到期的10:00:04
+        es = _create("TestCoalesceLatest", coalesce=CoalescePolicy.LATEST)
+        event_dt = EventSourceScheduler._coalesce(es, es.get_next_event(), now)[0]
+        assert event_dt == datetime.datetime(2023, 6, 4, 10, 0, 3)
+        assert es.peek_next_event()[0] == datetime.datetime(2023, 6, 4, 10, 0, 4)
+
+        # skip_overdue: 延迟超过max_delay的跳过
+        es = _create("TestCoalesceSkip", coalesce=CoalescePolicy.SKIP_OVERDUE, max_delay=1)
+        assert EventSourceScheduler._coalesce(es, es.get_next_event(), now) is None
+        assert EventSourceScheduler._coalesce(es, es.get_next_event(), now) is None
+        event_dt = EventSourceScheduler._coalesce(es, es.get_next_event(), now)[0]
+        assert event_dt == datetime.datetime(2023, 6, 4, 10, 0, 3)
+    finally:
+        config.ENABLE_HISTORY_START = old_cfg
+
+
+def _collect(es):
+    dts = []
+    while True:
+        dt_evt = es.get_next_event()
+        if dt_evt is None:
+            return dts
+        dts.append(dt_evt[0])
+
+
+def test_weekly_monthly():
+    old_cfg = bool(config.ENABLE_HISTORY_START)
+
+    class _Calendar(WeekdaysCalendar):
+        # 2023-09-29、国庆假期10月2日~6日休市
+        def is_trading_day(self, day):
+            return super(_Calendar, self).is_trading_day(day) and not (
+                day == datetime.date(2023, 9, 29) or datetime.date(2023, 10, 2) <= day <= datetime.date(2023, 10, 6))
+
+        def next_trading_day(self, day):
+            while not self.is_trading_day(day):
+                day += datetime.timedelta(days=1)
+            return day
+
+    try:
+        config.ENABLE_HISTORY_START = True
+        market_period = config.MARKET_PERIOD
+
+        def _create(method, *args, start=datetime.datetime(2023, 9, 25), end=datetime.datetime(2023, 10, 21),
+                    **kwargs):
+            es = EventSource(start=start, end=end, calendar=_Calendar())
+            es.setup()
+            getattr(es, method)(TestEvent1, *args, market_period=market_period, **kwargs)
+            return es
+
+        # 每周第一个交易日，国庆假期所在的一周没有交易日
+        assert _collect(_create("weekly", 1, "open")) == [
+            datetime.datetime(2023, 9, 25, 9, 30), datetime.datetime(2023, 10, 9, 9, 30),
+            datetime.datetime(2023, 10, 16, 9, 30)]
+        # 每周最后一个交易日，9月29日休市，当周在9月28日触发
+        assert _collect(_create("weekly", -1, "close")) == [
+            datetime.datetime(2023, 9, 28, 15), datetime.datetime(2023, 10, 13, 15),
+            datetime.datetime(2023, 10, 20, 15)]
+        # 交易日不足时，force为True在最后一个交易日触发，为False时不触发
+        assert _collect(_create("weekly", 5, "10:00")) == [
+            datetime.datetime(2023, 9, 28, 10), datetime.datetime(2023, 10, 13, 10),
+            datetime.datetime(2023, 10, 20, 10)]
+        assert _collect(_create("weekly", 5, "10:00", force=False)) == [
+            datetime.datetime(2023, 10, 13, 10), datetime.datetime(2023, 10, 20, 10)]
+        # start当天已经过了触发时间，从下一周开始
+        assert _collect(_create("weekly", 1, "open", start=datetime.datetime(2023, 10, 9, 10))) == [
+            datetime.datetime(2023, 10, 16, 9, 30)]
+
+        end = datetime.datetime(2023, 11, 30, 23)
+        assert _collect(_create("monthly", 1, "open+30m", start=datetime.datetime(2023, 9, 1), end=end)) == [
+            datetime.datetime(2023, 9, 1, 10), datetime.datetime(2023, 10, 9, 10),
+            datetime.datetime(2023, 11, 1, 10)]
+        assert _collect(_create("monthly", -1, "close-1h", start=datetime.datetime(2023, 9, 1), end=end)) == [
+            datetime.datetime(2023, 9, 28, 14), datetime.datetime(2023, 10, 31, 14),
+            datetime.datetime(2023, 11, 30, 14)]
+        # 9月20个交易日、10月17个交易日、11月22个交易日
+        assert _collect(_create("monthly", 22, "open", start=datetime.datetime(2023, 9, 1), end=end)) == [
+            datetime.datetime(2023, 9, 28, 9, 30), datetime.datetime(2023, 10, 31, 9, 30),
+            datetime.datetime(2023, 11, 30, 9, 30)]
+        assert _collect(_create("monthly", 22, "open", force=False, start=datetime.datetime(2023, 9, 1), end=end)) == [
+            datetime.datetime(2023, 11, 30, 9, 30)]
+
+        for _method, _nth in (("weekly", 0), ("weekly", 8), ("monthly", -32), ("monthly", 1.5)):
+            with pytest.raises(InvalidParam):
+                _create(_method, _nth, "open")
+    finally:
+        config.ENABLE_HISTORY_START = old_cfg
+
+
+def test_cron():
+    old_cfg = bool(config.ENABLE_HISTORY_START)
+
+    try:
+        config.ENABLE_HISTORY_START = True
+
+        def _create(expr, start, end, calendar=None):
+            es = EventSource(start=start, end=end, calendar=calendar or WeekdaysCalendar())
+            es.setup()
+            es.cron(TestEvent1, expr)
+            return es
+
+        # 2023-06-05是周一，start之前的触发时间跳过
+        assert _collect(_create("*/30 10 * * 1,3", datetime.datetime(2023, 6, 5, 10, 10),
+                                datetime.datetime(2023, 6, 8))) == [
+            datetime.datetime(2023, 6, 5, 10, 30), datetime.datetime(2023, 6, 7, 10),
+            datetime.datetime(2023, 6, 7, 10, 30)]
+        # 落在周末的日期不触发
+        assert _collect(_create("0 9 1,15 * *", datetime.datetime(2023, 7, 1), datetime.datetime(2023, 8, 31))) == [
+            datetime.datetime(2023, 8, 1, 9), datetime.datetime(2023, 8, 15, 9)]
+        # 不匹配的月份直接跳过
+        assert _collect(_create("0 9 * 2 1-5", datetime.datetime(2023, 6, 1), datetime.datetime(2024, 2, 2, 10))) == [
+            datetime.datetime(2024, 2, 1, 9), datetime.datetime(2024, 2, 2, 9)]
+        # 日、周都有限制时满足其一即可
+        assert _collect(_create("0 9 11 * 5", datetime.datetime(2023, 10, 10), datetime.datetime(2023, 10, 20, 10),
+                                calendar=AllDaysCalendar())) == [
+            datetime.datetime(2023, 10, 11, 9), datetime.datetime(2023, 10, 13, 9),
+            datetime.datetime(2023, 10, 20, 9)]
+        # 日字段以'*'开头时需要同时满足
+        assert _collect(_create("0 9 */10 * 2", datetime.datetime(2023, 10, 1), datetime.datetime(2023, 10, 31, 10),
+                                calendar=AllDaysCalendar())) == [
+            datetime.datetime(2023, 10, 31, 9)]
+
+        assert CronExprParser.parse("0,30 9-10/1 * * 7")[:2] == ([0, 30], [9, 10])
+        assert CronExprParser.parse("0 9 * * 7")[4] == {0}
+        for _expr in ("* * *", "60 * * * *", "*/0 * * * *", "a * * * *", "5-1 * * * *", "0 9 31 2 *",
+                      "0 9 * 13 *"):
+            with pytest.raises(InvalidParam):
+                CronExprParser.parse(_expr)
+    finally:
+        config.ENABLE_HISTORY_START = old_cfg
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import pytest
+import threading
+
+from jqtrade.scheduler.clock import RealClock
+from jqtrade.scheduler.executor import ThreadExecutor, ProcessExecutor
+from jqtrade.scheduler.loop import create_event_loop
+from jqtrade.scheduler.message import Message
+
+
+loop_backends = pytest.mark.parametrize("loop_backend", ["pyuv", "asyncio"])
+
+
+@loop_backends
+def test_submit(loop_backend):
+    loop = create_event_loop(loop_backend, clock=RealClock())
+    executor = ThreadExecutor(loop, max_workers=2)
+    results = []
+    ticks = []
+
+    def _blocking(x):
+        time.sleep(0.2)
+        return threading.get_ident(), x * 2
+
+    def _on_result(result):
+        # 结果在事件循环线程中处理
+        assert threading.get_ident() == loop_thread_id
+        results.append(result[1])
+
+    def _tick(count):
+        ticks.append(count)
+        if count:
+            loop.push_message(Message(loop.get_current_time() + 10, _tick, callback_data={"count": count - 1}))
+
+    def _start():
+        executor.submit(_blocking, 21, callback=_on_result)
+        _tick(5)
+
+    loop_thread_id = threading.get_ident()
+    loop.push_message(Message(loop.get_current_time(), _start))
+    try:
+        loop.run()
+    finally:
+        executor.shutdown()
+
+    # 线程池任务运行期间，事件循环继续处理其他消息；事件队列为空后，等待线程池任务完成再退出
+    assert ticks == [5, 4, 3, 2, 1, 0]
+    assert results == [42]
+
+
+@loop_backends
+def test_submit_exception(loop_backend):
+    loop = create_event_loop(loop_backend, clock=RealClock())
+    executor = ThreadExecutor(loop, max_workers=1)
+
+    def _failed():
+        raise ValueError("failed")
+
+    loop.push_message(Message(loop.get_current_time(), lambda: executor.submit(_failed)))
+    try:
+        with pytest.raises(ValueError):
+            loop.run()
+    finally:
+        executor.shutdown()
+
+
+def _square(x):
+    return os.getpid(), x * x
+
+
+@loop_backends
+def test_process_executor(loop_backend):
+    loop = create_event_loop(loop_backend, clock=RealClock())
+    executor = ProcessExecutor(loop, max_workers=2)
+    results = []
+
+    def _start():
+        executor.warm_up(["json"])
+        executor.submit(_square, 7, callback=results.append)
+
+    loop.push_message(Message(loop.get_current_time(), _start))
+    try:
+        loop.run()
+    finally:
+        executor.shutdown()
+
+    assert results[0][0] != os.getpid()
+    assert results[0][1] == 49
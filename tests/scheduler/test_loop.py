@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import pytest
+import asyncio
+import threading
+
+from jqtrade.common.exceptions import ConfigError
+from jqtrade.scheduler.clock import RealClock, SimulatedClock
+from jqtrade.scheduler.loop import create_event_loop, AsyncioEventLoop
+from jqtrade.scheduler.message import Message, Lane
+
+
+loop_backends = pytest.mark.parametrize("loop_backend", ["pyuv", "asyncio"])
+
+
+def test_create_event_loop():
+    assert isinstance(create_event_loop("asyncio"), AsyncioEventLoop)
+    with pytest.raises(ConfigError):
+        create_event_loop("unknown")
+
+
+@loop_backends
+def test_defer(loop_backend):
+    loop = create_event_loop(loop_backend, clock=RealClock())
+    handled = []
+
+    loop.defer(20, handled.append, 2)
+    loop.defer(10, handled.append, 1)
+    loop.defer(0, handled.append, 0)
+    loop.run()
+    assert handled == [0, 1, 2]
+
+
+@loop_backends
+def test_push_from_other_thread(loop_backend):
+    loop = create_event_loop(loop_backend, clock=RealClock())
+    handled = []
+
+    def _callback(i):
+        handled.append(i)
+
+    def _push(count):
+        for _i in range(count):
+            loop.push_message(Message(loop.get_current_time(), _callback, callback_data={"i": _i}))
+
+    # 事件循环启动前，其他线程push的消息都在收件箱中，只会唤醒一次
+    t = threading.Thread(target=_push, args=(100, ))
+    t.start()
+    t.join()
+    assert len(loop._inbox) == 100
+    assert not any(loop.lane_sizes.values())
+    assert loop._wakeup_pending
+
+    loop.run()
+    assert handled == list(range(100))
+    assert not loop._inbox
+
+
+@loop_backends
+def test_push_while_running(loop_backend):
+    loop = create_event_loop(loop_backend, clock=RealClock())
+    handled = []
+    count = 1000
+
+    def _producer():
+        for _i in range(count):
+            loop.push_message(Message(loop.get_current_time(), _callback, callback_data={"i": _i}))
+
+    def _callback(i):
+        handled.append(i)
+        if i == count - 1:
+            loop.stop()
+
+    def _start():
+        threading.Thread(target=_producer).start()
+
+    loop.push_message(Message(loop.get_current_time(), _start))
+    # 保证生产者线程push完成前事件循环不会因为队列为空而退出
+    loop.push_message(Message(loop.get_current_time() + 10 * 1000, loop.stop))
+    loop.run()
+    assert handled == list(range(count))
+
+
+@loop_backends
+def test_simulated_clock(loop_backend):
+    clock = SimulatedClock()
+    loop = create_event_loop(loop_backend, clock=clock)
+    start = clock.time()
+    handled = []
+
+    def _callback(i):
+        handled.append((i, loop.get_current_time() - start))
+
+    # 模拟时钟下不会真实等待一天
+    for _i in range(3):
+        loop.push_message(Message(start + _i * 86400 * 1000, _callback, callback_data={"i": _i}))
+    loop.run()
+    assert handled == [(0, 0), (1, 86400 * 1000), (2, 2 * 86400 * 1000)]
+
+
+@loop_backends
+def test_lanes(loop_backend):
+    clock = SimulatedClock()
+    loop = create_event_loop(loop_backend, clock=clock)
+    start = clock.time()
+    handled = []
+
+    def _callback(name):
+        handled.append((name, loop.get_current_time() - start))
+
+    def _push(name, offset, lane):
+        loop.push_message(Message(start + offset, _callback, callback_data={"name": name}, label=name, lane=lane))
+
+    # 500毫秒后有critical消息到期，已到期的background消息推迟到critical消息之后
+    _push("background_1", 0, Lane.BACKGROUND)
+    _push("normal_1", 0, Lane.NORMAL)
+    _push("critical_1", 500, Lane.CRITICAL)
+    # 同一时刻到期时critical先执行
+    _push("normal_2", 2000, Lane.NORMAL)
+    _push("critical_2", 2000, Lane.CRITICAL)
+    # horizon（默认1秒）内没有critical消息到期时，background消息按时执行
+    _push("background_2", 5000, Lane.BACKGROUND)
+    _push("critical_3", 7000, Lane.CRITICAL)
+    assert loop.queue_size == 7
+    loop.run()
+
+    assert handled == [("normal_1", 0), ("critical_1", 500), ("background_1", 500), ("critical_2", 2000),
+                       ("normal_2", 2000), ("background_2", 5000), ("critical_3", 7000)]
+    assert loop.stats.get_lane(Lane.CRITICAL)[0].count == 3
+    assert loop.stats.get_lane(Lane.BACKGROUND)[0].max == 500 * 1000
+    assert set(loop.stats.lane_snapshot()) == set(Lane.ALL)
+
+
+@loop_backends
+def test_precise_timer(loop_backend):
+    clock = RealClock()
+    loop = create_event_loop(loop_backend, clock=clock)
+    errors = {}
+
+    def _callback(name, target):
+        errors[name] = clock.time_us() - target * 1000
+
+    target = clock.time() + 100
+    loop.push_message(Message(target, _callback, callback_data={"name": "precise", "target": target}, precise=True))
+    loop.push_message(Message(target + 100, _callback, callback_data={"name": "normal", "target": target + 100}))
+    loop.run()
+
+    # 精确定时消息不会提前触发，误差在亚毫秒级
+    assert 0 <= errors["precise"] < 1000
+    assert errors["normal"] >= 0
+
+    label = "_callback"
+    lag, _ = loop.stats.get(label)
+    assert lag.count == 2
+
+
+def test_coroutine_task():
+    loop = create_event_loop("asyncio", clock=RealClock())
+    handled = []
+
+    async def _task(i):
+        await asyncio.sleep(0.01)
+        handled.append(i)
+
+    async def _slow_task():
+        await asyncio.sleep(10)
+        handled.append("slow")
+
+    def _start():
+        loop.create_task(_task(1))
+        loop.create_task(_slow_task(), timeout=0.01)
+        handled.append(0)
+
+    # 事件队列为空后，等待协程任务完成再退出
+    loop.push_message(Message(loop.get_current_time(), _start))
+    loop.run()
+    assert handled == [0, 1]
+
+
+def test_coroutine_task_exception():
+    loop = create_event_loop("asyncio", clock=RealClock())
+
+    async def _task():
+        await asyncio.sleep(0)
+        raise ValueError("task failed")
+
+    loop.push_message(Message(loop.get_current_time(), lambda: loop.create_task(_task())))
+    loop.push_message(Message(loop.get_current_time() + 10 * 1000, loop.stop))
+    with pytest.raises(ValueError):
+        loop.run()
+
+
+def test_pyuv_not_support_coroutine():
+    loop = create_event_loop("pyuv")
+    assert not loop.supports_coroutine
+    with pytest.raises(NotImplementedError):
+        loop.create_task(None)
@@ -2,8 +2,13 @@
 import random
 from concurrent.futures import ThreadPoolExecutor
 
-from jqtrade.scheduler.queue import PriorityQueue, ThreadSafeQueue, QueueEmptyError
+import pytest
+
+from jqtrade.common.exceptions import ConfigError
+from jqtrade.scheduler.queue import PriorityQueue, ThreadSafeQueue, QueueEmptyError, TimingWheelQueue, \
+    ThreadSafeTimingWheelQueue, create_queue
 from jqtrade.scheduler.event import Event
+from jqtrade.scheduler.message import Message
 
 
 class TestEvent1(Event):
@@ -49,6 +54,99 @@ def test_priority_q():
     assert isinstance(q.pop(), TestEvent4)
 
 
+def test_push_message():
+    q = PriorityQueue()
+
+    def _cb():
+        pass
+
+    m1 = Message(2000, _cb)
+    m2 = Message(1000, _cb, priority=-1)
+    m3 = Message(1000, _cb, priority=1)
+    m4 = Message(1000, _cb, priority=1)
+    assert m3.sort_key == (1000, -1, m3.seq_number)
+    assert (m3.time, m3.priority, m3.callback, m3.callback_data) == (1000, 1, _cb, {})
+    assert not hasattr(m1, "__dict__")
+
+    q.push(m1)
+    q.push(m2)
+    q.push(m3)
+    q.push(m4)
+
+    assert q.top() is m3
+    assert [q.pop() for _ in range(4)] == [m3, m4, m2, m1]
+    assert q.empty()
+
+
+def test_timing_wheel_q():
+    q = TimingWheelQueue()
+    assert q.empty()
+    with pytest.raises(QueueEmptyError):
+        q.top()
+
+    def _cb():
+        pass
+
+    base = 1698629400000    # 2023-10-30 09:30:00
+    messages = [
+        Message(base, _cb),
+        Message(base, _cb, priority=1),
+        Message(base + 1, _cb),
+        Message(base + 60 * 1000, _cb),
+        Message(base + 3 * 3600 * 1000, _cb),
+        Message(base + 86400 * 1000, _cb),
+        Message(base + 999, _cb),
+        Message(base + 1000, _cb),
+        Message(base + 1000, _cb),
+    ]
+    for _msg in messages:
+        q.push(_msg)
+    assert len(q) == len(messages)
+
+    expected = sorted(messages)
+    assert q.top() is expected[0]
+    assert q.pop() is expected[0]
+
+    # 游标前移后再插入更早的消息
+    early = Message(base - 1000, _cb)
+    q.push(early)
+    assert q.pop() is early
+
+    assert [q.pop() for _ in range(len(messages) - 1)] == expected[1:]
+    assert q.empty()
+
+
+def test_timing_wheel_q_same_order_as_heap():
+    random.seed(0)
+
+    def _cb():
+        pass
+
+    wheel, heap = TimingWheelQueue(), PriorityQueue()
+    now = 1698629400000
+    for _ in range(20000):
+        if random.random() < 0.6:
+            span = random.choice([1, 1000, 60 * 1000, 3600 * 1000, 86400 * 1000])
+            msg = Message(now + random.randint(-1, 30) * span, _cb, priority=random.randint(-1, 1))
+            wheel.push(msg)
+            heap.push(msg)
+        elif not heap.empty():
+            msg = heap.pop()
+            assert wheel.pop() is msg
+            now = max(now, msg.time)
+    while not heap.empty():
+        assert wheel.pop() is heap.pop()
+    assert wheel.empty()
+
+
+def test_create_queue():
+    assert isinstance(create_queue(), ThreadSafeQueue)
+    assert isinstance(create_queue("timing_wheel"), ThreadSafeTimingWheelQueue)
+    assert type(create_queue("timing_wheel", thread_safe=False)) is TimingWheelQueue
+    with pytest.raises(ConfigError):
+        create_queue("unknown")
+
+
 def test_thread_safe_q():
     q = ThreadSafeQueue()
     assert q.empty()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+
+import pytest
+
+from jqtrade.common.exceptions import TaskError
+from jqtrade.scheduler.registry import TaskRegistry
+
+
+def test_register(tmp_path):
+    registry = TaskRegistry(str(tmp_path))
+    assert registry.get_tasks() == []
+    assert not registry.is_running("demo")
+
+    handle = registry.register("demo", code=["demo.py"], out=None)
+    assert registry.is_running("demo")
+    assert handle.info["pid"] == os.getpid()
+
+    tasks = registry.get_tasks()
+    assert len(tasks) == 1
+    assert tasks[0]["name"] == "demo"
+    assert tasks[0]["pid"] == os.getpid()
+    assert tasks[0]["code"] == ["demo.py"]
+
+    # 同名任务不能重复注册
+    with pytest.raises(TaskError):
+        registry.register("demo")
+
+    handle.update(ctl_address="127.0.0.1:1234")
+    assert registry.get_task("demo")["ctl_address"] == "127.0.0.1:1234"
+
+    # 任务信息中有控制通道的authkey，只有任务所属用户可以读取
+    if os.name == "posix":
+        assert os.stat(registry.dir).st_mode & 0o777 == 0o700
+        assert os.stat(os.path.join(registry.dir, "demo.json")).st_mode & 0o777 == 0o600
+
+    # 不同名称互不影响，名称中的特殊字符不影响文件名
+    other = registry.register("a/b c")
+    assert sorted(_task["name"] for _task in registry.get_tasks()) == ["a/b c", "demo"]
+    other.release()
+
+    handle.release()
+    assert not registry.is_running("demo")
+    assert registry.get_tasks() == []
+
+    # 释放后可以重新注册
+    registry.register("demo").release()
+
+
+def test_stale_task(tmp_path):
+    registry = TaskRegistry(str(tmp_path))
+    handle = registry.register("demo")
+
+    # 模拟进程被强制杀掉：锁被系统释放，注册信息残留
+    info_path = os.path.join(registry.dir, "demo.json")
+    with open(info_path) as rf:
+        info = json.load(rf)
+    registry._unlock(handle._fp)
+    handle._fp = None
+    assert os.path.exists(info_path)
+
+    assert registry.get_task("demo") is None
+    assert not os.path.exists(info_path)
+    assert registry.get_tasks() == []
+
+    handle = registry.register("demo")
+    assert registry.get_task("demo")["start_time"] >= info["start_time"]
+    handle.release()
+
+
+def test_runner_registry_dir(tmp_path, monkeypatch):
+    from jqtrade.scheduler.config import get_config
+    from jqtrade.scheduler.runner import TaskRunner
+
+    config = get_config()
+    monkeypatch.setattr(config, "RUNTIME_DIR", config.RUNTIME_DIR)
+    monkeypatch.setattr("jqtrade.scheduler.runner.setup_logger", lambda *args, **kwargs: None)
+
+    runtime_dir = tmp_path / "runtime"
+    config_file = tmp_path / "config.py"
+    config_file.write_text(f"SCHEDULER_RUNTIME_DIR = {str(runtime_dir)!r}\n")
+    code_file = tmp_path / "demo.py"
+    code_file.write_text("")
+
+    # 注册任务前加载自定义配置，任务注册表位于配置的运行时目录下
+    runner = TaskRunner(str(code_file), None, "demo", None, config=str(config_file))
+    try:
+        assert runner._registry.dir == os.path.join(str(runtime_dir), "tasks")
+        assert TaskRegistry(str(runtime_dir)).is_running("demo")
+    finally:
+        runner._task_handle.release()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import sys
+import json
+import builtins
+
+from jqtrade.scheduler.startup import StartupProfiler
+
+
+def test_phases():
+    profiler = StartupProfiler()
+    with profiler.phase("a"):
+        pass
+    with profiler.phase("b"):
+        pass
+    total = profiler.finish(budget=10)
+
+    report = profiler.report()
+    assert [_phase["name"] for _phase in report["phases"]] == ["a", "b"]
+    assert report["total"] == total
+    assert report["imports"] == []
+
+
+def test_profile_imports(tmp_path):
+    pkg = tmp_path / "startup_pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("from . import child\n")
+    (pkg / "child.py").write_text("import json\n")
+    sys.path.insert(0, str(tmp_path))
+
+    orig_import = builtins.__import__
+    try:
+        profiler = StartupProfiler(profile_imports=True)
+        assert builtins.__import__ != orig_import
+        import startup_pkg     # noqa: F401
+        profiler.finish()
+        assert builtins.__import__ == orig_import
+
+        imports = {_item["module"]: _item for _item in profiler.report()["imports"]}
+        assert "startup_pkg" in imports
+        assert "startup_pkg.child" in imports
+        assert imports["startup_pkg"]["cumulative"] >= imports["startup_pkg.child"]["cumulative"]
+        assert imports["startup_pkg"]["self"] <= imports["startup_pkg"]["cumulative"]
+
+        path = tmp_path / "stats" / "startup.json"
+        profiler.dump(str(path))
+        data = json.loads(path.read_text())
+        assert data["unit"] == "s"
+        assert data["total"] == profiler.report()["total"]
+    finally:
+        builtins.__import__ = orig_import
+        sys.path.remove(str(tmp_path))
+        sys.modules.pop("startup_pkg", None)
+        sys.modules.pop("startup_pkg.child", None)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+
+from jqtrade.scheduler.clock import SimulatedClock
+from jqtrade.scheduler.loop import create_event_loop
+from jqtrade.scheduler.message import Message
+from jqtrade.scheduler.stats import Histogram, LoopStats
+
+
+def test_histogram():
+    h = Histogram()
+    assert h.percentile(50) == 0
+
+    values = [random.randint(0, 10000000) for _ in range(10000)] + [0, 5, 127, 128]
+    for _v in values:
+        h.record(_v)
+
+    values.sort()
+    assert h.count == len(values)
+    assert h.min == values[0]
+    assert h.max == values[-1]
+    assert h.percentile(100) == values[-1]
+    for _p in (50, 90, 99):
+        expected = values[int(round(len(values) * _p / 100.0)) - 1]
+        # 分位数取桶上界，相对误差不超过1/64
+        assert expected <= h.percentile(_p) <= expected * (1 + 1 / 64.0)
+
+    # 小值精确记录
+    h = Histogram()
+    for _v in range(100):
+        h.record(_v)
+    assert h.percentile(50) == 49
+
+
+def test_bucket_bounds():
+    for _v in list(range(1000)) + [random.randint(0, 1 << 40) for _ in range(1000)]:
+        idx = Histogram._index(_v)
+        assert _v <= Histogram._upper_bound(idx)
+        assert Histogram._index(Histogram._upper_bound(idx)) == idx
+        assert Histogram._index(Histogram._upper_bound(idx) + 1) == idx + 1
+
+
+def test_loop_stats(tmp_path):
+    clock = SimulatedClock()
+    loop = create_event_loop("asyncio", clock=clock)
+
+    def _on_event():
+        pass
+
+    now = clock.time()
+    for _i in range(3):
+        loop.push_message(Message(now + _i * 1000, _on_event, label="TestEvent"))
+    loop.push_message(Message(now, _on_event))
+    loop.run()
+
+    snapshot = loop.stats.snapshot()
+    assert snapshot["TestEvent"]["lag"]["count"] == 3
+    # 模拟时钟下准时触发
+    assert snapshot["TestEvent"]["lag"]["max"] == 0
+    assert snapshot["_on_event"]["duration"]["count"] == 1
+
+    path = tmp_path / "stats" / "loop_stats.json"
+    loop.stats.dump(str(path))
+    data = json.loads(path.read_text())
+    assert data["stats"]["TestEvent"]["lag"]["count"] == 3
+    # 默认在normal车道
+    assert data["lanes"]["normal"]["lag"]["count"] == 4
+
+    stats = LoopStats()
+    stats.record("a", 1000, 10)
+    lag, duration = stats.get("a")
+    assert lag.max == 1000 and duration.max == 10
+    assert stats.get_lane("critical") is None
+    stats.record("b", 2000, 20, "critical")
+    assert stats.get_lane("critical")[0].max == 2000
+    assert list(stats.lane_snapshot()) == ["critical"]
+
+    stats.record_overrun("c", 1500)
+    stats.record_overrun("c", 500)
+    stats.record_skip("c")
+    stats.record_skip("d")
+    overruns = stats.overrun_snapshot()
+    assert overruns["c"]["overruns"] == 2 and overruns["c"]["skipped"] == 1
+    assert overruns["c"]["overrun"]["max"] == 1.5
+    assert overruns["d"] == {"overruns": 0, "skipped": 1, "overrun": overruns["d"]["overrun"]}
+    stats.reset()
+    assert stats.overrun_snapshot() == {}
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import pytest
+import datetime
+
+from jqtrade.common.exceptions import ConfigError
+from jqtrade.scheduler.config import get_config
+from jqtrade.scheduler.event import Event
+from jqtrade.scheduler.event_source import EventSource, IntervalEventSource
+from jqtrade.scheduler.trade_calendar import AllDaysCalendar, WeekdaysCalendar, FileTradingCalendar, \
+    create_calendar
+
+
+config = get_config()
+
+
+def test_all_days_calendar():
+    cal = AllDaysCalendar()
+    day = datetime.date(2023, 10, 1)
+    assert cal.is_trading_day(day)
+    assert cal.next_trading_day(day) == day
+
+
+def test_weekdays_calendar():
+    cal = WeekdaysCalendar()
+    assert not cal.is_trading_day(datetime.date(2023, 10, 7))
+    assert cal.next_trading_day(datetime.date(2023, 10, 6)) == datetime.date(2023, 10, 6)
+    assert cal.next_trading_day(datetime.date(2023, 10, 7)) == datetime.date(2023, 10, 9)
+    assert cal.next_trading_day(datetime.date(2023, 10, 8)) == datetime.date(2023, 10, 9)
+
+
+def test_file_calendar(tmp_path):
+    path = tmp_path / "days.txt"
+    path.write_text("# 交易日\n2023-09-28\n20231009\n2023-10-10\n")
+    cal = FileTradingCalendar(str(path))
+    assert cal.is_trading_day(datetime.date(2023, 10, 9))
+    assert not cal.is_trading_day(datetime.date(2023, 10, 1))
+    assert cal.next_trading_day(datetime.date(2023, 9, 29)) == datetime.date(2023, 10, 9)
+    assert cal.next_trading_day(datetime.date(2023, 10, 10)) == datetime.date(2023, 10, 10)
+    assert cal.next_trading_day(datetime.date(2023, 10, 11)) is None
+
+    path = tmp_path / "trade_cal.csv"
+    path.write_text("exchange,cal_date,is_open\nSSE,20230929,0\nSSE,20231008,0\nSSE,20231009,1\n")
+    cal = FileTradingCalendar(str(path))
+    assert cal.next_trading_day(datetime.date(2023, 9, 29)) == datetime.date(2023, 10, 9)
+
+
+def test_create_calendar(tmp_path):
+    assert isinstance(create_calendar(), AllDaysCalendar)
+    assert isinstance(create_calendar("weekdays"), WeekdaysCalendar)
+
+    cal = WeekdaysCalendar()
+    assert create_calendar(cal) is cal
+
+    with pytest.raises(ConfigError):
+        create_calendar(str(tmp_path / "not_exists.csv"))
+
+
+def test_event_source_skip_non_trading_days():
+    old_cfg = bool(config.ENABLE_HISTORY_START)
+
+    try:
+        config.ENABLE_HISTORY_START = True
+
+        es = EventSource(start=datetime.datetime(2023, 10, 6), end=datetime.datetime(2023, 10, 10, 15),
+                         calendar=WeekdaysCalendar())
+        es.setup()
+        es.daily(Event, "09:30:00")
+        dts = []
+        while es.peek_next_event():
+            dts.append(es.get_next_event()[0])
+        assert dts == [datetime.datetime(2023, 10, 6, 9, 30),
+                       datetime.datetime(2023, 10, 9, 9, 30),
+                       datetime.datetime(2023, 10, 10, 9, 30)]
+
+        es = IntervalEventSource(Event, 3600 * 6, start=datetime.datetime(2023, 10, 6, 6),
+                                 end=datetime.datetime(2023, 10, 9, 12), calendar=WeekdaysCalendar())
+        es.setup()
+        dts = []
+        while es.peek_next_event():
+            dts.append(es.get_next_event()[0])
+        assert dts == [datetime.datetime(2023, 10, 6, 12),
+                       datetime.datetime(2023, 10, 6, 18),
+                       datetime.datetime(2023, 10, 9, 0),
+                       datetime.datetime(2023, 10, 9, 6),
+                       datetime.datetime(2023, 10, 9, 12)]
+    finally:
+        config.ENABLE_HISTORY_START = old_cfg
@@ -0,0 +1,24 @@
+# -#- coding: utf-8 -*-
+from jqtrade.scheduler.context import Context
+
+
+__options__ = {
+    "start": "2023-10-30 08:00:00",
+    "end": "2023-10-30 09:00:00",
+    "use_account": True,
+}
+
+
+def process_initialize(context):
+    log.info("process_initialize run")
+    run_daily(check_portfolio, "08:30:00")
+
+
+def check_portfolio(context):
+    assert context.portfolio.available_cash == 5000
+    assert context.portfolio.positions["000001.XSHE"].total_amount == 1000
+
+
+def process_exit(context):
+    # setup时同步一次，之后每5秒同步一次，共 1 + 3600 / 5 次
+    assert Context.get_instance().trade_gate.sync_balance_count == 1 + 720
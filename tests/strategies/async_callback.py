@@ -0,0 +1,67 @@
+# -#- coding: utf-8 -*-
+import os
+import asyncio
+
+
+__options__ = {
+    "start": "2023-10-30 08:00:00",
+    "end": "2023-10-30 09:00:00",
+    "use_account": True,
+    "loop_backend": "asyncio",
+}
+
+
+g = {}
+
+
+def process_initialize(context):
+    run_daily(fetch_data, "08:10:00")
+    run_daily(slow_task, "08:20:00", timeout=0.05)
+    run_daily(trade, "08:30:00")
+    run_daily(compute, "08:40:00")
+    run_daily(check, "08:50:00")
+
+
+async def fetch_data(context):
+    await asyncio.sleep(0.01)
+    g["fetched"] = True
+
+
+async def slow_task(context):
+    await asyncio.sleep(10)
+    g["slow_task_finished"] = True
+
+
+async def trade(context):
+    order_id = order("000001.XSHE", 100)
+    # 订单状态在下一次账户同步时更新为filled，等待期间其他定时任务正常运行
+    user_order = await wait_order(order_id, timeout=5)
+    g["order_status"] = user_order.status
+
+
+def calc(x):
+    if x < 0:
+        raise ValueError("x must be positive")
+    return os.getpid(), x * x
+
+
+async def compute(context):
+    g["computed"] = await submit_compute(calc, 3)
+    try:
+        await submit_compute(calc, -1)
+    except ValueError:
+        g["compute_error"] = True
+
+
+def check(context):
+    g["checked"] = True
+
+
+def process_exit(context):
+    assert g["fetched"]
+    assert g["checked"]
+    assert g["order_status"] == "filled"
+    assert g["computed"][0] != os.getpid() and g["computed"][1] == 9
+    assert g["compute_error"]
+    # 超时的协程任务被取消
+    assert "slow_task_finished" not in g
@@ -0,0 +1,40 @@
+# -#- coding: utf-8 -*-
+import os
+
+
+__options__ = {
+    "start": "2023-10-30 09:00:00",
+    "end": "2023-10-30 10:00:00",
+    "use_account": False,
+}
+
+
+g = {}
+
+
+def process_initialize(context):
+    warm_up_compute(["json"])
+    run_daily(market_open, "09:30:00")
+
+
+def calc_signals(codes, factor=1):
+    return os.getpid(), {_code: len(_code) * factor for _code in codes}
+
+
+def market_open(context):
+    submit_compute(calc_signals, ["000001.XSHE", "600000.XSHG"], callback=on_signals, factor=2)
+
+
+def on_signals(context, result):
+    g["pid"], g["signals"] = result
+
+
+def process_exit(context):
+    # 在其他进程中计算，结果在事件循环中回调
+    assert g["pid"] != os.getpid()
+    assert g["signals"] == {"000001.XSHE": 22, "600000.XSHG": 22}
+
+    # 定时任务按事件类统计了调度延迟和执行耗时
+    stats = get_loop_stats()
+    label = [_label for _label in stats if _label.startswith("Scheduler_market_open")][0]
+    assert stats[label]["lag"]["count"] == 1
@@ -0,0 +1,85 @@
+# -#- coding: utf-8 -*-
+import time
+import threading
+
+
+__options__ = {
+    "start": "2023-10-30 09:00:00",
+    "end": "2023-10-30 09:40:30",
+    "use_account": False,
+}
+
+
+g = {
+    "slow": 0,
+    "cooperative": [],
+    "blocking": [],
+    "release": threading.Event(),
+}
+
+
+def process_initialize(context):
+    run_daily(slow, "09:10:00", deadline=0.05)
+    run_daily(cooperative, "09:20:00", deadline="1s")
+    run_daily(fast, "09:25:00", deadline=60)
+    run_daily(blocking, "every_1m", executor="thread", skip_if_running=True)
+    run_daily(release, "09:35:30")
+
+
+def slow(context):
+    assert 0 < deadline_remaining() <= 0.05
+    time.sleep(0.1)
+    g["slow"] += 1
+
+
+def cooperative(context):
+    # 超时后check_deadline抛出DeadlineExceeded，由框架捕获，不会继续执行
+    while True:
+        g["cooperative"].append(deadline_remaining())
+        check_deadline()
+        time.sleep(0.05)
+
+
+def fast(context):
+    check_deadline()
+    g["fast_remaining"] = deadline_remaining()
+
+
+def blocking(context):
+    # 第一次执行一直阻塞到09:35:30，期间的执行都被跳过
+    g["blocking"].append(context.strategy_dt)
+    g["release"].wait(10)
+
+
+def release(context):
+    assert deadline_remaining() is None
+    check_deadline()
+    g["release"].set()
+
+
+def _find(stats, name):
+    for _label, _stats in stats.items():
+        if f"_{name}_" in _label:
+            return _stats
+    return None
+
+
+def process_exit(context):
+    overruns = get_loop_stats(overruns=True)
+
+    assert g["slow"] == 1
+    assert _find(overruns, "slow")["overruns"] == 1
+    assert _find(overruns, "slow")["overrun"]["min"] > 0
+
+    assert g["cooperative"][-1] <= 0
+    assert len(g["cooperative"]) > 1
+    assert _find(overruns, "cooperative")["overruns"] == 1
+
+    assert 59 < g["fast_remaining"] <= 60
+    assert _find(overruns, "fast") is None
+
+    # 09:30触发的第一次执行结束前，09:31到09:35的5次执行被跳过
+    assert g["blocking"][0].strftime("%H:%M") == "09:30"
+    assert all(_dt.strftime("%H:%M") >= "09:36" for _dt in g["blocking"][1:])
+    assert _find(overruns, "blocking")["skipped"] == 5
+    assert _find(overruns, "blocking")["overruns"] == 0
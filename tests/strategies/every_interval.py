@@ -0,0 +1,43 @@
+# -#- coding: utf-8 -*-
+import datetime
+
+__options__ = {
+    "start": "2023-10-09",
+    "end": "2023-10-11",
+}
+
+
+g = {
+    "func_every_15s": [],
+    "func_every_5m": [],
+}
+
+
+def process_initialize(context):
+    set_options(use_account=False)
+    run_daily(func_every_15s, "every_15s")
+    run_daily(func_every_5m, "every_5m")
+
+
+def func_every_15s(context):
+    g["func_every_15s"].append(context.strategy_dt)
+
+
+def func_every_5m(context):
+    g["func_every_5m"].append(context.strategy_dt)
+
+
+def _in_market(dt):
+    return datetime.time(9, 30) <= dt.time() <= datetime.time(11, 30) or \
+        datetime.time(13) <= dt.time() <= datetime.time(15)
+
+
+def process_exit(context):
+    # 每个交易时间段从开始时间起每隔固定时间触发一次，包含时间段两端
+    assert len(g["func_every_15s"]) == (480 + 1) * 2 * 2
+    assert len(g["func_every_5m"]) == (24 + 1) * 2 * 2
+    assert all(_in_market(_dt) and _dt.second % 15 == 0 for _dt in g["func_every_15s"])
+    assert all(_in_market(_dt) and _dt.minute % 5 == 0 and _dt.second == 0 for _dt in g["func_every_5m"])
+    assert g["func_every_5m"][:3] == [datetime.datetime(2023, 10, 9, 9, 30), datetime.datetime(2023, 10, 9, 9, 35),
+                                      datetime.datetime(2023, 10, 9, 9, 40)]
+    assert g["func_every_5m"][-1] == datetime.datetime(2023, 10, 10, 15)
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from jqtrade.scheduler.context import Context
+
+
+g = {}
+
+
+def process_initialize(context):
+    set_options(use_account=True, account_no="test")
+    run_daily(market_open, "08:30:00")
+
+
+def market_open(context):
+    assert Context.get_instance().strategy_name == "multi_a"
+    g["order_id"] = order("000001.XSHE", 100)
+
+
+def process_exit(context):
+    # 只能看到本策略的订单，不包含其他策略的订单和非jqtrade下的订单
+    orders = get_orders()
+    assert list(orders) == [g["order_id"]]
+    assert orders[g["order_id"]].status == "filled"
+    assert context.portfolio.positions["000001.XSHE"].total_amount == 1000
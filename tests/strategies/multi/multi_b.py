@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from jqtrade.scheduler.context import Context
+
+
+g = {}
+
+
+def process_initialize(context):
+    set_options(use_account=True, account_no="test")
+    # 和multi_a同名的定时任务
+    run_daily(market_open, "08:30:00")
+    run_daily(market_open, "08:40:00")
+
+
+def market_open(context):
+    assert Context.get_instance().strategy_name == "multi_b"
+    g.setdefault("order_ids", []).append(order("600000.XSHG", -200))
+
+
+def process_exit(context):
+    orders = get_orders()
+    assert sorted(orders) == sorted(g["order_ids"])
+    assert len(orders) == 2
+    assert all(_order.status == "filled" for _order in orders.values())
@@ -0,0 +1,68 @@
+# -#- coding: utf-8 -*-
+import os
+import datetime
+
+__options__ = {
+    "start": "2023-10-01",
+    "end": "2023-11-01 23:00:00",
+}
+
+
+g = {
+    "weekly_first": [],
+    "weekly_last": [],
+    "monthly_first": [],
+    "monthly_last": [],
+    "cron_weekdays": [],
+    "cron_day": [],
+}
+
+
+def process_initialize(context):
+    set_options(use_account=False,
+                trading_calendar=os.path.join(os.path.dirname(os.path.abspath(__file__)), "trade_cal.csv"))
+    run_weekly(weekly_first, 1, "open")
+    run_weekly(weekly_last, -1, "close-5m")
+    run_monthly(monthly_first, 1, "open+30m")
+    run_monthly(monthly_last, -1, "14:00")
+    run_cron(cron_weekdays, "0 10 * * 1,5")
+    run_cron(cron_day, "*/30 13-14 16 10 *")
+
+
+def weekly_first(context):
+    g["weekly_first"].append(context.strategy_dt)
+
+
+def weekly_last(context):
+    g["weekly_last"].append(context.strategy_dt)
+
+
+def monthly_first(context):
+    g["monthly_first"].append(context.strategy_dt)
+
+
+def monthly_last(context):
+    g["monthly_last"].append(context.strategy_dt)
+
+
+def cron_weekdays(context):
+    g["cron_weekdays"].append(context.strategy_dt)
+
+
+def cron_day(context):
+    g["cron_day"].append(context.strategy_dt)
+
+
+def _dts(*items):
+    return [datetime.datetime(2023, *_item) for _item in items]
+
+
+def process_exit(context):
+    # 国庆假期所在的一周没有交易日，不触发
+    assert g["weekly_first"] == _dts((10, 9, 9, 30), (10, 16, 9, 30), (10, 23, 9, 30), (10, 30, 9, 30))
+    assert g["weekly_last"] == _dts((10, 13, 14, 55), (10, 20, 14, 55), (10, 27, 14, 55))
+    assert g["monthly_first"] == _dts((10, 9, 10, 0), (11, 1, 10, 0))
+    assert g["monthly_last"] == _dts((10, 31, 14, 0))
+    assert g["cron_weekdays"] == _dts((10, 9, 10), (10, 13, 10), (10, 16, 10), (10, 20, 10), (10, 23, 10),
+                                      (10, 27, 10), (10, 30, 10))
+    assert g["cron_day"] == _dts((10, 16, 13, 0), (10, 16, 13, 30), (10, 16, 14, 0), (10, 16, 14, 30))
@@ -0,0 +1,42 @@
+# -#- coding: utf-8 -*-
+import time
+import threading
+
+from jqtrade.scheduler.context import Context
+
+
+__options__ = {
+    "start": "2023-10-30 08:00:00",
+    "end": "2023-10-30 09:00:00",
+    "use_account": True,
+}
+
+
+g = {}
+
+
+def process_initialize(context):
+    run_daily(download_factors, "08:10:00", executor="thread")
+
+
+def download_factors(context):
+    g["thread"] = threading.get_ident()
+    trade_gate = Context.get_instance().trade_gate
+    start_count = trade_gate.sync_balance_count
+
+    # 模拟耗时的数据下载，期间账户同步照常进行
+    deadline = time.time() + 5
+    while trade_gate.sync_balance_count == start_count and time.time() < deadline:
+        time.sleep(0.01)
+    g["sync_while_running"] = trade_gate.sync_balance_count > start_count
+
+    # 线程中读取到的是一致的快照
+    g["available_cash"] = context.portfolio.available_cash
+    g["total_amount"] = context.portfolio.positions["000001.XSHE"].total_amount
+
+
+def process_exit(context):
+    assert g["thread"] != threading.get_ident()
+    assert g["sync_while_running"]
+    assert g["available_cash"] == 5000
+    assert g["total_amount"] == 1000
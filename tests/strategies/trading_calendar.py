@@ -0,0 +1,37 @@
+# -#- coding: utf-8 -*-
+import os
+
+__options__ = {
+    "start": "2023-10-01",
+    "end": "2023-11-01",
+}
+
+
+g = {
+    "func_open": 0,
+    "func_every_minute": 0,
+}
+
+
+def process_initialize(context):
+    set_options(use_account=False,
+                trading_calendar=os.path.join(os.path.dirname(os.path.abspath(__file__)), "trade_cal.csv"))
+    run_daily(func_open, "open")
+    run_daily(func_every_minute, "every_minute")
+
+
+def func_open(context):
+    g["func_open"] += 1
+    # 国庆假期和周末不触发
+    assert context.strategy_dt.weekday() < 5
+    assert context.strategy_dt.day > 6
+
+
+def func_every_minute(context):
+    g["func_every_minute"] += 1
+
+
+def process_exit(context):
+    # 2023年10月共17个交易日
+    assert g["func_open"] == 17
+    assert g["func_every_minute"] == 242 * 17
@@ -3,6 +3,8 @@ import os
 import sys
 import datetime
 
+import pytest
+
 from importlib import import_module
 
 from jqtrade.scheduler.config import get_config as get_scheduler_config
@@ -44,10 +46,13 @@ def parse_dt(dt):
 class FakeTradeGate(AbsTradeGate):
     def setup(self, options):
         logger.info("setup")
-        super(FakeTradeGate, self).setup(options)
+        self._options = options
+        self.sync_balance_count = 0
+        self._orders = []
 
     def order(self, req):
         logger.info("order. req=%s" % req)
+        self._orders.append(req)
 
     def cancel_order(self, req):
         logger.info("cancel_order. req=%s" % req)
@@ -66,6 +71,7 @@ class FakeTradeGate(AbsTradeGate):
 
     def sync_balance(self):
         logger.info("sync_balance run")
+        self.sync_balance_count += 1
         ret = \
             {
                 "cash":
@@ -111,18 +117,30 @@ class FakeTradeGate(AbsTradeGate):
                     "avg_cost": datetime.datetime(2023, 11, 6, 10, 30, 34),          # 可选字段，成交均价
                 }
             ]
+
+        # 策略提交的订单在下一次同步时全部成交
+        for _order in self._orders:
+            ret.append({
+                "order_id": _order.order_id,
+                "code": _order.code,
+                "price": _order.price,
+                "amount": _order.amount,
+                "action": _order.action.value,
+                "status": "filled",
+                "style": _order.style.value,
+                "create_time": _order.create_time,
+                "filled_amount": _order.amount,
+            })
         return ret
 
 
-def run_strategy(path):
-    from jqtrade.scheduler.loop import EventLoop
-    from jqtrade.scheduler.bus import EventBus
-    from jqtrade.scheduler.event_source import EventSourceScheduler
-    from jqtrade.scheduler.loader import Loader
-    from jqtrade.scheduler.context import Context
-    from jqtrade.scheduler.strategy import Strategy
+def run_strategy(path, loop_backend="pyuv"):
+    from jqtrade.scheduler.clock import get_clock, set_clock, SimulatedClock
+    from jqtrade.scheduler.trade_calendar import get_calendar, set_calendar
 
     options = get_setting(path, "__options__")
+    if options.get("loop_backend", loop_backend) != loop_backend:
+        pytest.skip(f"策略只在{options['loop_backend']}事件循环下运行")
 
     start = options.get("start", None)
     if start:
@@ -132,7 +150,29 @@ def run_strategy(path):
     if end:
         end = parse_dt(end)
 
-    event_loop = EventLoop()
+    # 使用模拟时钟回放历史事件，不再按物理时间等待
+    old_clock = get_clock()
+    old_calendar = get_calendar()
+    set_clock(SimulatedClock(start))
+    try:
+        _run_strategy(path, options, start, end, loop_backend)
+    finally:
+        set_clock(old_clock)
+        set_calendar(old_calendar)
+
+
+def _run_strategy(path, options, start, end, loop_backend):
+    from jqtrade.scheduler.loop import create_event_loop
+    from jqtrade.scheduler.bus import EventBus
+    from jqtrade.scheduler.event_source import EventSourceScheduler
+    from jqtrade.scheduler.loader import Loader
+    from jqtrade.scheduler.context import Context
+    from jqtrade.scheduler.strategy import Strategy
+
+    # 同一个策略会在不同的事件循环下各跑一次，需要重新导入策略模块，重置模块级别的状态
+    sys.modules.pop(os.path.basename(path).split(".")[0], None)
+
+    event_loop = create_event_loop(loop_backend)
     context = Context(event_bus=EventBus(),
                       loop=event_loop,
                       scheduler=EventSourceScheduler(),
@@ -148,6 +188,7 @@ def run_strategy(path):
         from jqtrade.account.account import Account
         from jqtrade.account.portfolio import Portfolio
 
+        context.use_account = True
         context.trade_gate = FakeTradeGate()
 
         account = Account(context)
@@ -162,12 +203,378 @@ def run_strategy(path):
     strategy = Strategy(context)
     strategy.setup()
 
-    event_loop.run()
+    try:
+        event_loop.run()
+    finally:
+        context.close()
 
     if hasattr(strategy.user_module, "process_exit"):
         getattr(strategy.user_module, "process_exit")(strategy.user_module.context)
 
 
+@pytest.mark.parametrize("loop_backend", ["pyuv", "asyncio"])
+def test_multi_strategies(tmp_path, loop_backend):
+    from jqtrade.scheduler.clock import get_clock, set_clock, SimulatedClock
+    from jqtrade.scheduler.loop import create_event_loop
+    from jqtrade.scheduler.bus import EventBus
+    from jqtrade.scheduler.event_source import EventSourceScheduler
+    from jqtrade.scheduler.context import Context
+    from jqtrade.scheduler.runner import setup_strategies
+
+    this_dir = os.path.abspath(os.path.dirname(__file__))
+    code_files = [os.path.join(this_dir, "strategies", "multi", _name) for _name in ("multi_a.py", "multi_b.py")]
+    for _code_file in code_files:
+        sys.modules.pop(os.path.basename(_code_file).split(".")[0], None)
+
+    start = parse_dt("2023-10-30 08:00:00")
+    end = parse_dt("2023-10-30 09:00:00")
+
+    old_clock = get_clock()
+    old_runtime_dir = scheduler_config.RUNTIME_DIR
+    set_clock(SimulatedClock(start))
+    scheduler_config.RUNTIME_DIR = str(tmp_path)
+    try:
+        event_loop = create_event_loop(loop_backend)
+        context = Context(event_bus=EventBus(),
+                          loop=event_loop,
+                          scheduler=EventSourceScheduler(),
+                          loader=None,
+                          debug=False,
+                          start=start,
+                          end=end,
+                          task_name="test_multi",
+                          config=None,
+                          out=None)
+        strategies = setup_strategies(context, code_files, gate_factory=FakeTradeGate)
+        try:
+            event_loop.run()
+        finally:
+            context.close()
+
+        for _strategy in strategies:
+            with _strategy.context.activate():
+                _strategy.user_module.process_exit(_strategy.user_module.context)
+
+        # 两个策略共享定时账户同步：setup时各策略各同步一次，之后每5秒同步一次
+        gate = strategies[0].context.trade_gate._shared.gate
+        assert gate.sync_balance_count == 2 + 720
+        assert os.path.exists(os.path.join(str(tmp_path), "data", "test_multi_20231030_strategy_orders.json"))
+    finally:
+        set_clock(old_clock)
+        scheduler_config.RUNTIME_DIR = old_runtime_dir
+
+
+def test_multi_strategies_sync_aligned(tmp_path, monkeypatch):
+    from jqtrade.common.utils import dt_to_milliseconds
+    from jqtrade.scheduler.clock import get_clock, set_clock, SimulatedClock
+    from jqtrade.scheduler.loop import create_event_loop
+    from jqtrade.scheduler.bus import EventBus
+    from jqtrade.scheduler.event_source import EventSourceScheduler
+    from jqtrade.scheduler.context import Context
+    from jqtrade.scheduler.strategy import Strategy
+    from jqtrade.scheduler.runner import setup_strategies
+
+    this_dir = os.path.abspath(os.path.dirname(__file__))
+    code_files = [os.path.join(this_dir, "strategies", "multi", _name) for _name in ("multi_a.py", "multi_b.py")]
+    for _code_file in code_files:
+        sys.modules.pop(os.path.basename(_code_file).split(".")[0], None)
+
+    start = parse_dt("2023-10-30 08:00:00")
+    clock = SimulatedClock(start)
+
+    # 和实盘一样，根上下文不指定start，事件源从setup时的当前时间开始生成事件；每个策略setup耗时1.234秒
+    orig_setup = Strategy.setup
+
+    def _setup(self):
+        orig_setup(self)
+        clock.advance_to(clock.time() + 1234)
+
+    monkeypatch.setattr(Strategy, "setup", _setup)
+    monkeypatch.setattr(scheduler_config, "ENABLE_HISTORY_START", False)
+    monkeypatch.setattr(scheduler_config, "RUNTIME_DIR", str(tmp_path))
+
+    old_clock = get_clock()
+    set_clock(clock)
+    try:
+        event_loop = create_event_loop("asyncio")
+        context = Context(event_bus=EventBus(),
+                          loop=event_loop,
+                          scheduler=EventSourceScheduler(),
+                          loader=None,
+                          debug=False,
+                          end=parse_dt("2023-10-30 08:01:00"),
+                          task_name="test_multi_aligned",
+                          config=None,
+                          out=None)
+        strategies = setup_strategies(context, code_files, gate_factory=FakeTradeGate)
+        try:
+            event_loop.run()
+        finally:
+            context.close()
+
+        # 两个策略的定时账户同步时间对齐，同一时刻只读取一次交易接口：setup时各策略各同步一次，之后每5秒同步一次
+        gate = strategies[0].context.trade_gate._shared.gate
+        assert clock.time() == dt_to_milliseconds(parse_dt("2023-10-30 08:01:00"))
+        assert gate.sync_balance_count == 2 + 12
+    finally:
+        set_clock(old_clock)
+
+
+_CALENDAR_STRATEGY = """
+def process_initialize(context):
+    set_options(use_account=False%s)
+"""
+
+
+def test_multi_strategies_calendar(tmp_path):
+    from jqtrade.common.exceptions import ConfigError
+    from jqtrade.scheduler.clock import get_clock, set_clock, SimulatedClock
+    from jqtrade.scheduler.loop import create_event_loop
+    from jqtrade.scheduler.bus import EventBus
+    from jqtrade.scheduler.event_source import EventSourceScheduler
+    from jqtrade.scheduler.context import Context
+    from jqtrade.scheduler.trade_calendar import get_calendar, set_calendar
+    from jqtrade.scheduler.runner import setup_strategies
+
+    code_files = []
+    for _name, _option in (("calendar_a", ', trading_calendar="weekdays"'), ("calendar_b", "")):
+        code_files.append(os.path.join(str(tmp_path), f"{_name}.py"))
+        with open(code_files[-1], "w") as wf:
+            wf.write(_CALENDAR_STRATEGY % _option)
+        sys.modules.pop(_name, None)
+
+    old_clock = get_clock()
+    old_calendar = get_calendar()
+    set_clock(SimulatedClock(parse_dt("2023-10-30 08:00:00")))
+    try:
+        context = Context(event_bus=EventBus(),
+                          loop=create_event_loop("asyncio"),
+                          scheduler=EventSourceScheduler(),
+                          loader=None,
+                          debug=False,
+                          task_name="test_multi_calendar",
+                          config=None,
+                          out=None)
+        # 交易日历是进程级的，不允许各策略不同
+        with pytest.raises(ConfigError):
+            setup_strategies(context, code_files)
+        context.close()
+    finally:
+        set_clock(old_clock)
+        set_calendar(old_calendar)
+        for _name in ("calendar_a", "calendar_b"):
+            sys.modules.pop(_name, None)
+
+
+_RELOAD_STRATEGY_V1 = """
+g = {}
+
+
+def process_initialize(context):
+    g.setdefault("calls", [])
+    run_daily(kept, "08:10:00")
+    run_daily(kept, "08:30:00")
+    run_daily(removed, "08:20:00")
+
+
+def kept(context):
+    g["calls"].append(("v1", context.strategy_dt.strftime("%H:%M")))
+
+
+def removed(context):
+    g["calls"].append(("removed", context.strategy_dt.strftime("%H:%M")))
+"""
+
+_RELOAD_STRATEGY_V2 = """
+g = {}
+
+
+def process_initialize(context):
+    run_daily(kept, "08:10:00")
+    run_daily(kept, "08:30:00")
+    run_daily(added, "08:40:00")
+
+
+def kept(context):
+    g["calls"].append(("v2", context.strategy_dt.strftime("%H:%M")))
+
+
+def added(context):
+    g["calls"].append(("added", context.strategy_dt.strftime("%H:%M")))
+"""
+
+# 时间格式错误、交易日序号错误，都在修改定时任务之前失败
+_RELOAD_STRATEGY_BAD_TIME = _RELOAD_STRATEGY_V2.replace('run_daily(added, "08:40:00")', 'run_daily(added, "8点半")')
+_RELOAD_STRATEGY_BAD_WEEKDAY = _RELOAD_STRATEGY_V2.replace('run_daily(added, "08:40:00")',
+                                                           'run_weekly(added, 9, "08:40:00")')
+
+
+@pytest.mark.parametrize("loop_backend", ["pyuv", "asyncio"])
+def test_reload_strategy(tmp_path, loop_backend):
+    from jqtrade.common.utils import dt_to_milliseconds
+    from jqtrade.scheduler.clock import get_clock, set_clock, SimulatedClock
+    from jqtrade.scheduler.loop import create_event_loop
+    from jqtrade.scheduler.bus import EventBus
+    from jqtrade.scheduler.event_source import EventSourceScheduler
+    from jqtrade.scheduler.loader import Loader
+    from jqtrade.scheduler.context import Context
+    from jqtrade.scheduler.message import Message
+    from jqtrade.scheduler.strategy import Strategy
+
+    path = os.path.join(str(tmp_path), "reload_strategy.py")
+    with open(path, "w") as wf:
+        wf.write(_RELOAD_STRATEGY_V1)
+    sys.modules.pop("reload_strategy", None)
+
+    start = parse_dt("2023-10-30 08:00:00")
+    end = parse_dt("2023-10-30 09:00:00")
+
+    old_clock = get_clock()
+    set_clock(SimulatedClock(start))
+    try:
+        event_loop = create_event_loop(loop_backend)
+        context = Context(event_bus=EventBus(),
+                          loop=event_loop,
+                          scheduler=EventSourceScheduler(),
+                          loader=Loader(path),
+                          debug=False,
+                          start=start,
+                          end=end,
+                          task_name="test_reload",
+                          config=None,
+                          out=None)
+        strategy = Strategy(context)
+        strategy.setup()
+
+        results = []
+
+        def _reload(source):
+            with open(path, "w") as wf:
+                wf.write(source)
+            results.append(strategy.reload())
+
+        for _time, _source in (("08:15:00", _RELOAD_STRATEGY_V2), ("08:35:00", "def broken(:\n"),
+                               ("08:36:00", _RELOAD_STRATEGY_BAD_TIME), ("08:37:00", _RELOAD_STRATEGY_BAD_WEEKDAY)):
+            event_loop.push_message(Message(dt_to_milliseconds(parse_dt(f"2023-10-30 {_time}")), _reload,
+                                            callback_data={"source": _source}))
+
+        try:
+            event_loop.run()
+        finally:
+            context.close()
+    finally:
+        set_clock(old_clock)
+        sys.modules.pop("reload_strategy", None)
+
+    # 语法错误、定时任务参数错误的代码重新加载失败，继续使用之前的定时任务和代码
+    assert results == [True, False, False, False]
+    # g在重新加载后保留；未变化的定时任务换成新代码，删除的不再触发，新增的开始触发
+    assert strategy.user_module.g["calls"] == [("v1", "08:10"), ("v2", "08:30"), ("added", "08:40")]
+    assert len(strategy._scheduled) == len(strategy._schedules) == 3
+    # 未变化的两个定时任务沿用原有事件源，只为新增的定时任务创建事件源，创建失败的事件类名不再复用
+    assert strategy._schedule_count == 5
+
+
+_CONTROL_STRATEGY = """
+def process_initialize(context):
+    set_options(use_account=True, account_no="test", runtime_dir=%r)
+"""
+
+
+def test_control_server(tmp_path):
+    import threading
+    from jqtrade.scheduler.clock import get_clock, set_clock, RealClock
+    from jqtrade.scheduler.loop import create_event_loop
+    from jqtrade.scheduler.bus import EventBus
+    from jqtrade.scheduler.event_source import EventSourceScheduler
+    from jqtrade.scheduler.loader import Loader
+    from jqtrade.scheduler.context import Context
+    from jqtrade.scheduler.strategy import Strategy
+    from jqtrade.scheduler.registry import TaskRegistry
+    from multiprocessing.connection import Client
+    from jqtrade.common.exceptions import TaskError
+    from jqtrade.scheduler.control import ControlServer, send_command
+
+    path = os.path.join(str(tmp_path), "control_strategy.py")
+    with open(path, "w") as wf:
+        wf.write(_CONTROL_STRATEGY % str(tmp_path))
+    sys.modules.pop("control_strategy", None)
+
+    old_clock = get_clock()
+    set_clock(RealClock())
+    registry = TaskRegistry(str(tmp_path))
+    handle = registry.register("test_ctl")
+    try:
+        event_loop = create_event_loop("asyncio")
+        context = Context(event_bus=EventBus(),
+                          loop=event_loop,
+                          scheduler=EventSourceScheduler(),
+                          loader=Loader(path),
+                          debug=False,
+                          task_name="test_ctl",
+                          config=None,
+                          out=None)
+        context.trade_gate_factory = FakeTradeGate
+        strategy = Strategy(context)
+        strategy.setup()
+
+        control = ControlServer(context, [strategy], handle, registry.dir)
+        control.RECV_TIMEOUT = 0.2
+        control.start()
+
+        # 事件循环未运行，等待超时的命令被取消，事件循环启动后不会再执行
+        control.TIMEOUT = 0.05
+        assert "已取消" in control._handle_request({"command": "stop"})["error"]
+        del control.TIMEOUT
+
+        results = {}
+
+        def _client():
+            task_info = registry.get_task("test_ctl")
+            try:
+                # 只连接不发送数据的客户端不会阻塞控制通道
+                silent = Client(task_info["ctl_address"], task_info["ctl_family"])
+                # authkey错误
+                try:
+                    send_command(dict(task_info, ctl_authkey="00" * 16), "status")
+                except TaskError as e:
+                    results["bad_authkey"] = e
+                silent.close()
+
+                for _command in ("status", "sync_now", "stats", "dump_orders", "unknown"):
+                    try:
+                        results[_command] = send_command(task_info, _command)
+                    except Exception as e:
+                        results[_command] = e
+            finally:
+                results["stop"] = send_command(task_info, "stop")
+
+        client = threading.Thread(target=_client)
+        client.start()
+        try:
+            event_loop.run()
+        finally:
+            control.close()
+            context.close()
+        client.join()
+    finally:
+        set_clock(old_clock)
+        handle.release()
+        sys.modules.pop("control_strategy", None)
+
+    assert "认证失败" in str(results["bad_authkey"])
+    assert results["status"]["name"] == "test_ctl"
+    assert results["status"]["accounts"]["test_ctl"]["orders"] == 1
+    assert results["sync_now"] == {"synced": ["test_ctl"]}
+    assert context.trade_gate.sync_balance_count == 2
+    assert results["stats"]["sync"]["test_ctl"]["sync_balance"]["count"] == 2
+    assert results["stats"]["loop"]["ControlCommand"]["duration"]["count"] >= 2
+    assert [_order["order_id"] for _order in results["dump_orders"]["test_ctl"]] == ["1234"]
+    assert "unknown" in str(results["unknown"])
+    assert results["stop"] == {"stopping": True}
+    assert not os.path.exists(control.address)
+
+
 def create_tests():
     this_dir = os.path.abspath(os.path.dirname(__file__))
     tests_dir = os.path.join(this_dir, "strategies")
@@ -187,8 +594,9 @@ def create_test_func(path):
 
     func_name = "test_" + strategy.replace(".py", "")
 
-    def func():
-        run_strategy(path)
+    @pytest.mark.parametrize("loop_backend", ["pyuv", "asyncio"])
+    def func(loop_backend):
+        run_strategy(path, loop_backend)
 
     func.__name__ = func_name
     func.__doc__ = func_name